@@ -0,0 +1,196 @@
+# alert_engine.py
+import time
+from typing import Dict, List, Optional, Tuple
+
+# 时间窗口划分的桶数：过期精度为窗口长度的 1/60
+_BUCKETS_PER_WINDOW = 60
+
+
+def window_label(seconds: int = 0, count: int = 0) -> str:
+    if count:
+        return f"最近{count}次"
+    if seconds % 3600 == 0:
+        return f"{seconds // 3600}小时"
+    if seconds % 60 == 0:
+        return f"{seconds // 60}分钟"
+    return f"{seconds}秒"
+
+
+class TimeWindowCounter:
+    """
+    时间窗口内的成功 / 失败计数
+
+    窗口按固定宽度分桶组成环形数组，维护窗口内的累计值：记录为 O(1)，
+    时间前进时只清理过期的桶（每个桶过期一次），查询为 O(1) 均摊
+    """
+
+    def __init__(self, seconds: float, buckets: int = _BUCKETS_PER_WINDOW):
+        self.seconds = seconds
+        self.label = window_label(int(seconds))
+        self._width = seconds / buckets
+        self._success = [0] * buckets
+        self._failure = [0] * buckets
+        self._current: Optional[int] = None  # 最近一次更新所在桶的绝对序号
+        self.success = 0
+        self.failure = 0
+
+    def _advance(self, now: float):
+        index = int(now // self._width)
+        if self._current is None:
+            self._current = index
+            return
+        steps = index - self._current
+        if steps <= 0:
+            return
+        n = len(self._success)
+        for k in range(1, min(steps, n) + 1):
+            slot = (self._current + k) % n
+            self.success -= self._success[slot]
+            self.failure -= self._failure[slot]
+            self._success[slot] = self._failure[slot] = 0
+        self._current = index
+
+    def record(self, success: bool, now: float):
+        self._advance(now)
+        slot = self._current % len(self._success)
+        if success:
+            self._success[slot] += 1
+            self.success += 1
+        else:
+            self._failure[slot] += 1
+            self.failure += 1
+
+    def counts(self, now: float) -> Tuple[int, int]:
+        self._advance(now)
+        return self.success, self.failure
+
+
+class CountWindowCounter:
+    """最近 N 次结果中的成功 / 失败计数（环形字节数组，记录为 O(1)）"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.label = window_label(count=size)
+        self._ring = bytearray(size)
+        self._next = 0
+        self._filled = 0
+        self.success = 0
+        self.failure = 0
+
+    def record(self, success: bool, now: float = 0):
+        if self._filled == self.size:
+            if self._ring[self._next]:
+                self.success -= 1
+            else:
+                self.failure -= 1
+        else:
+            self._filled += 1
+        self._ring[self._next] = 1 if success else 0
+        if success:
+            self.success += 1
+        else:
+            self.failure += 1
+        self._next = (self._next + 1) % self.size
+
+    def counts(self, now: float = 0) -> Tuple[int, int]:
+        return self.success, self.failure
+
+
+class AlertRule:
+    """
+    告警规则：任一窗口满足条件即触发
+
+    metric:
+        "failures"      窗口内失败次数 ≥ threshold
+        "success_rate"  窗口内成功率 < threshold（样本数不少于 min_samples 时才判断）
+    """
+
+    def __init__(self, name: str, metric: str, threshold: float, windows=(), count_windows=(), min_samples: int = 1):
+        if metric not in ("failures", "success_rate"):
+            raise ValueError(f"未知的告警指标: {metric}")
+        if not windows and not count_windows:
+            raise ValueError(f"告警规则 {name} 未配置窗口")
+        self.name = name
+        self.metric = metric
+        self.threshold = threshold
+        self.windows = [("time", int(seconds)) for seconds in windows] + [("count", int(n)) for n in count_windows]
+        self.min_samples = max(1, min_samples)
+
+    def check(self, counters: Dict[Tuple[str, int], object], now: float) -> Optional[dict]:
+        """返回第一个满足条件的窗口的统计，均不满足时返回 None"""
+        for key in self.windows:
+            counter = counters[key]
+            success, failure = counter.counts(now)
+            total = success + failure
+            rate = success / total if total else 1.0
+            if self.metric == "failures":
+                tripped = failure >= self.threshold
+            else:
+                tripped = total >= self.min_samples and rate < self.threshold
+            if tripped:
+                return {'window': counter.label, 'success': success, 'failures': failure, 'total': total,
+                        'success_rate': rate}
+        return None
+
+
+class SlidingWindowAlerts:
+    """
+    滑动窗口告警引擎
+
+    - 每条结果只更新一次各个窗口计数器（多个规则共用同一窗口时只维护一份），记录为 O(窗口数)
+    - 告警在任一窗口满足条件时触发一次，所有窗口恢复后自动解除，之后可再次触发；
+      故障发生后最迟一个窗口长度内触发，旧的故障在滑出窗口后不再影响判断
+    """
+
+    def __init__(self, rules: Dict[str, dict]):
+        self.rules = [AlertRule(name, **spec) for name, spec in rules.items()]
+        self._counters: Dict[Tuple[str, int], object] = {}
+        for rule in self.rules:
+            for kind, size in rule.windows:
+                if (kind, size) not in self._counters:
+                    self._counters[(kind, size)] = TimeWindowCounter(size) if kind == "time" else CountWindowCounter(size)
+        self.active: Dict[str, dict] = {}  # 规则名 -> 触发时的窗口统计
+
+    def record(self, success: bool, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        for counter in self._counters.values():
+            counter.record(success, now)
+
+    def evaluate(self, now: Optional[float] = None) -> Tuple[List[Tuple[str, dict]], List[str]]:
+        """
+        评估所有规则
+
+        Returns:
+            (新触发的 [(规则名, 窗口统计)], 新解除的 [规则名])
+        """
+        now = time.time() if now is None else now
+        fired, cleared = [], []
+        for rule in self.rules:
+            detail = rule.check(self._counters, now)
+            if detail is not None and rule.name not in self.active:
+                self.active[rule.name] = detail
+                fired.append((rule.name, detail))
+            elif detail is None and rule.name in self.active:
+                del self.active[rule.name]
+                cleared.append(rule.name)
+        return fired, cleared
+
+    def window_labels(self, rule: AlertRule) -> List[str]:
+        return [self._counters[key].label for key in rule.windows]
+
+    def is_active(self, name: str) -> bool:
+        return name in self.active
+
+    def snapshot(self, now: Optional[float] = None) -> Dict[str, dict]:
+        """各窗口当前的成功 / 失败计数"""
+        now = time.time() if now is None else now
+        result = {}
+        for counter in self._counters.values():
+            success, failure = counter.counts(now)
+            total = success + failure
+            result[counter.label] = {
+                'success': success,
+                'failures': failure,
+                'success_rate': f"{success / total:.2%}" if total else "-",
+            }
+        return result
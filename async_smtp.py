@@ -0,0 +1,408 @@
+# async_smtp.py
+import asyncio
+import base64
+import re
+import ssl
+import time
+from typing import Dict, List, Optional, Tuple
+
+from logger_config import logger
+from config import SMTP_POOL_SIZE, SMTP_TIMEOUT, SMTP_KEEPALIVE_INTERVAL, SMTP_MAX_IDLE_SECONDS
+from config_email import SMTP_SERVER, SMTP_PORT, SMTP_USE_SSL, SMTP_STARTTLS, EMAIL_USER, EMAIL_PASSWORD
+
+
+class AsyncSMTPError(Exception):
+    """SMTP 服务器返回了错误响应"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"{code} {message}")
+        self.code = code
+        self.message = message
+
+
+class AsyncSMTPAuthenticationError(AsyncSMTPError):
+    """SMTP 认证失败"""
+
+
+class AsyncSMTPConnectError(Exception):
+    """建立连接 / TLS / 握手阶段失败（此时邮件一定尚未投递，可安全回退）"""
+
+
+class AsyncSMTPRecipientsRefused(AsyncSMTPError):
+    """所有收件人都被拒绝"""
+
+    def __init__(self, refused: Dict[str, Tuple[int, str]]):
+        super().__init__(550, f"所有收件人被拒绝: {list(refused)}")
+        self.refused = refused
+
+
+async def _within(awaitable, timeout: float):
+    """
+    带超时等待
+
+    Python 3.11+ 使用 asyncio.timeout：asyncio.wait_for 在内部操作恰好已完成时会吞掉外部的取消，
+    被取消的发送会继续执行下去
+    """
+    if hasattr(asyncio, "timeout"):
+        async with asyncio.timeout(timeout):
+            return await awaitable
+    return await asyncio.wait_for(awaitable, timeout=timeout)
+
+
+def _quote_data(data: bytes) -> bytes:
+    """统一换行为 CRLF，并对以 '.' 开头的行做点填充"""
+    data = re.sub(rb'(?:\r\n|\n|\r(?!\n))', b'\r\n', data)
+    data = re.sub(rb'(?m)^\.', b'..', data)
+    if not data.endswith(b'\r\n'):
+        data += b'\r\n'
+    return data
+
+
+class AsyncSMTPConnection:
+    """单条异步 SMTP 连接（SSL / STARTTLS / AUTH / PIPELINING）"""
+
+    def __init__(self, host: str, port: int, timeout: float,
+                 use_ssl: bool, starttls: bool, ssl_context: Optional[ssl.SSLContext] = None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.use_ssl = use_ssl
+        self.starttls = starttls
+        self.ssl_context = ssl_context
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.extensions: Dict[str, str] = {}
+        self.last_used = time.time()
+
+    @property
+    def is_connected(self) -> bool:
+        return self.writer is not None and not self.writer.is_closing()
+
+    # ------------------------------------------------------------------
+    # 底层收发
+    # ------------------------------------------------------------------
+    async def _read_reply(self) -> Tuple[int, str]:
+        """读取一条（可能多行的）响应"""
+        lines = []
+        while True:
+            line = await _within(self.reader.readline(), self.timeout)
+            if not line:
+                raise ConnectionResetError("SMTP 服务器关闭了连接")
+            text = line.decode("utf-8", errors="replace").rstrip("\r\n")
+            code, sep, rest = text[:3], text[3:4], text[4:]
+            lines.append(rest)
+            if sep != "-":
+                return int(code), "\n".join(lines)
+
+    async def _write(self, data: bytes):
+        self.writer.write(data)
+        await _within(self.writer.drain(), self.timeout)
+
+    async def command(self, cmd: str, expect: Tuple[int, ...] = (250,)) -> Tuple[int, str]:
+        await self._write(cmd.encode("utf-8") + b"\r\n")
+        code, message = await self._read_reply()
+        if code not in expect:
+            raise AsyncSMTPError(code, message)
+        return code, message
+
+    # ------------------------------------------------------------------
+    # 连接与认证
+    # ------------------------------------------------------------------
+    async def connect(self):
+        try:
+            ssl_context = self.ssl_context
+            if ssl_context is None and (self.use_ssl or self.starttls):
+                ssl_context = ssl.create_default_context()
+            self.reader, self.writer = await _within(
+                asyncio.open_connection(self.host, self.port, ssl=ssl_context if self.use_ssl else None),
+                self.timeout
+            )
+            code, message = await self._read_reply()
+            if code != 220:
+                raise AsyncSMTPError(code, message)
+            await self.ehlo()
+
+            if self.starttls:
+                if not hasattr(self.writer, "start_tls"):
+                    raise AsyncSMTPConnectError("当前 Python 版本不支持异步 STARTTLS")
+                await self.command("STARTTLS", expect=(220,))
+                await _within(self.writer.start_tls(ssl_context, server_hostname=self.host), self.timeout)
+                await self.ehlo()
+        except AsyncSMTPConnectError:
+            self.close()
+            raise
+        except (OSError, asyncio.TimeoutError, AsyncSMTPError) as e:
+            self.close()
+            raise AsyncSMTPConnectError(f"连接 {self.host}:{self.port} 失败: {e}") from e
+
+    async def ehlo(self):
+        _, message = await self.command("EHLO localhost")
+        self.extensions = {}
+        for line in message.split("\n")[1:]:
+            name, _, params = line.partition(" ")
+            self.extensions[name.upper()] = params.upper()
+
+    async def login(self, user: str, password: str):
+        mechanisms = self.extensions.get("AUTH", "").split()
+        try:
+            if "PLAIN" in mechanisms or not mechanisms:
+                token = base64.b64encode(f"\0{user}\0{password}".encode("utf-8")).decode("ascii")
+                await self.command(f"AUTH PLAIN {token}", expect=(235,))
+            else:
+                await self.command("AUTH LOGIN", expect=(334,))
+                await self.command(base64.b64encode(user.encode("utf-8")).decode("ascii"), expect=(334,))
+                await self.command(base64.b64encode(password.encode("utf-8")).decode("ascii"), expect=(235,))
+        except AsyncSMTPError as e:
+            raise AsyncSMTPAuthenticationError(e.code, e.message) from e
+
+    async def noop(self) -> bool:
+        try:
+            await self.command("NOOP")
+            return True
+        except Exception:
+            return False
+
+    # ------------------------------------------------------------------
+    # 发送
+    # ------------------------------------------------------------------
+    async def sendmail(self, from_addr: str, to_addrs: List[str], msg: bytes) -> Dict[str, Tuple[int, str]]:
+        """
+        发送一封邮件，返回被拒绝的收件人
+
+        服务器支持 PIPELINING 时，MAIL / RCPT / DATA 在一次往返内批量发送。
+        """
+        refused: Dict[str, Tuple[int, str]] = {}
+
+        if "PIPELINING" in self.extensions:
+            batch = [f"MAIL FROM:<{from_addr}>"]
+            batch += [f"RCPT TO:<{addr}>" for addr in to_addrs]
+            batch.append("DATA")
+            await self._write("".join(cmd + "\r\n" for cmd in batch).encode("utf-8"))
+
+            mail_code, mail_message = await self._read_reply()
+            for addr in to_addrs:
+                code, message = await self._read_reply()
+                if code not in (250, 251):
+                    refused[addr] = (code, message)
+            data_code, data_message = await self._read_reply()
+
+            if mail_code != 250:
+                await self._reset_after_failure(data_code)
+                raise AsyncSMTPError(mail_code, mail_message)
+            if len(refused) == len(to_addrs):
+                await self._reset_after_failure(data_code)
+                raise AsyncSMTPRecipientsRefused(refused)
+            if data_code != 354:
+                await self._rset()
+                raise AsyncSMTPError(data_code, data_message)
+        else:
+            await self.command(f"MAIL FROM:<{from_addr}>")
+            for addr in to_addrs:
+                await self._write(f"RCPT TO:<{addr}>\r\n".encode("utf-8"))
+                code, message = await self._read_reply()
+                if code not in (250, 251):
+                    refused[addr] = (code, message)
+            if len(refused) == len(to_addrs):
+                await self._rset()
+                raise AsyncSMTPRecipientsRefused(refused)
+            await self.command("DATA", expect=(354,))
+
+        await self._write(_quote_data(msg) + b".\r\n")
+        code, message = await self._read_reply()
+        if code != 250:
+            raise AsyncSMTPError(code, message)
+
+        self.last_used = time.time()
+        return refused
+
+    async def _reset_after_failure(self, data_code: int):
+        # DATA 意外被接受时，必须先结束数据段才能 RSET
+        if data_code == 354:
+            await self._write(b".\r\n")
+            await self._read_reply()
+        await self._rset()
+
+    async def _rset(self):
+        try:
+            await self.command("RSET")
+        except Exception:
+            self.close()
+
+    async def quit(self):
+        if not self.is_connected:
+            return
+        try:
+            await asyncio.wait_for(self.command("QUIT", expect=(221,)), timeout=5)
+        except Exception:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        if self.writer is not None:
+            try:
+                self.writer.close()
+            except Exception:
+                pass
+        self.writer = None
+        self.reader = None
+
+
+class AsyncSMTPClient:
+    """
+    异步 SMTP 客户端（不占用线程池）
+
+    - 最多保持 max_size 条已认证连接，空闲过久先 NOOP 探测
+    - 复用的连接失效时透明重连一次
+    - 被取消时直接关闭当前连接，不会把半完成的会话放回连接池
+    """
+
+    def __init__(self, host: str, port: int, user: str = "", password: str = "",
+                 max_size: int = 2, timeout: float = 30,
+                 use_ssl: Optional[bool] = None, starttls: Optional[bool] = None,
+                 keepalive_interval: float = 60, max_idle_seconds: float = 600,
+                 ssl_context: Optional[ssl.SSLContext] = None):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        # 与 SMTPConnectionPool 相同：未指定时 587 端口使用 STARTTLS，其余端口使用隐式 SSL
+        if use_ssl is None:
+            use_ssl = not starttls and port != 587
+        self.use_ssl = use_ssl
+        self.starttls = (not use_ssl) if starttls is None else starttls
+        self.ssl_context = ssl_context  # 为空时使用系统证书校验服务器
+        self.keepalive_interval = keepalive_interval
+        self.max_idle_seconds = max_idle_seconds
+
+        self._idle: List[AsyncSMTPConnection] = []
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        # 统计信息
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.reconnects = 0
+        self.send_count = 0
+        self.send_failures = 0
+        self.cancelled_sends = 0
+        self.total_send_latency = 0.0
+        self.max_send_latency = 0.0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # 延迟创建，保证绑定到实际运行的事件循环
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_size)
+        return self._semaphore
+
+    async def _connect(self) -> AsyncSMTPConnection:
+        conn = AsyncSMTPConnection(self.host, self.port, self.timeout, self.use_ssl, self.starttls, self.ssl_context)
+        await conn.connect()
+        try:
+            if self.user and self.password:
+                await conn.login(self.user, self.password)
+        except BaseException:
+            conn.close()
+            raise
+        self.connections_created += 1
+        logger.debug(f"📮 新建异步SMTP连接: {self.host}:{self.port}")
+        return conn
+
+    async def _take_idle(self) -> Optional[AsyncSMTPConnection]:
+        while self._idle:
+            conn = self._idle.pop()
+            idle_time = time.time() - conn.last_used
+            if not conn.is_connected or idle_time > self.max_idle_seconds:
+                await conn.quit()
+                continue
+            if idle_time > self.keepalive_interval and not await conn.noop():
+                conn.close()
+                continue
+            return conn
+        return None
+
+    def _release(self, conn: AsyncSMTPConnection):
+        if conn.is_connected and len(self._idle) < self.max_size:
+            conn.last_used = time.time()
+            self._idle.append(conn)
+        else:
+            conn.close()
+
+    async def sendmail(self, from_addr: str, to_addrs: List[str], msg: bytes) -> Dict[str, Tuple[int, str]]:
+        start = time.perf_counter()
+        try:
+            async with self._get_semaphore():
+                for attempt in range(2):
+                    conn = await self._take_idle()
+                    reused = conn is not None
+                    if conn is None:
+                        conn = await self._connect()
+                    else:
+                        self.connections_reused += 1
+
+                    try:
+                        refused = await conn.sendmail(from_addr, to_addrs, msg)
+                    except AsyncSMTPError:
+                        # 服务器拒绝，但连接仍可用
+                        self._release(conn)
+                        raise
+                    except (OSError, asyncio.TimeoutError) as e:
+                        conn.close()
+                        if attempt == 0 and reused:
+                            self.reconnects += 1
+                            logger.info(f"🔄 复用的异步SMTP连接已失效，重新连接: {e}")
+                            continue
+                        raise
+                    except BaseException:
+                        # 包括 CancelledError：会话状态未知，直接丢弃连接
+                        conn.close()
+                        raise
+
+                    self._release(conn)
+                    return refused
+        except asyncio.CancelledError:
+            self.cancelled_sends += 1
+            raise
+        except BaseException:
+            self.send_failures += 1
+            raise
+        finally:
+            latency = time.perf_counter() - start
+            self.send_count += 1
+            self.total_send_latency += latency
+            self.max_send_latency = max(self.max_send_latency, latency)
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            await conn.quit()
+
+    def get_stats(self) -> dict:
+        acquisitions = self.connections_created + self.connections_reused
+        reuse_rate = self.connections_reused / acquisitions if acquisitions else 0
+        avg_latency = self.total_send_latency / self.send_count if self.send_count else 0
+        return {
+            'idle_connections': len(self._idle),
+            'connections_created': self.connections_created,
+            'connections_reused': self.connections_reused,
+            'reuse_rate': f"{reuse_rate:.2%}",
+            'reconnects': self.reconnects,
+            'send_count': self.send_count,
+            'send_failures': self.send_failures,
+            'cancelled_sends': self.cancelled_sends,
+            'avg_send_latency': f"{avg_latency:.3f}s",
+            'max_send_latency': f"{self.max_send_latency:.3f}s",
+        }
+
+
+# 全局实例
+async_smtp_client = AsyncSMTPClient(
+    SMTP_SERVER, SMTP_PORT, EMAIL_USER, EMAIL_PASSWORD,
+    max_size=SMTP_POOL_SIZE,
+    timeout=SMTP_TIMEOUT,
+    use_ssl=SMTP_USE_SSL,
+    starttls=SMTP_STARTTLS,
+    keepalive_interval=SMTP_KEEPALIVE_INTERVAL,
+    max_idle_seconds=SMTP_MAX_IDLE_SECONDS,
+)
@@ -0,0 +1,63 @@
+# benchmark_html.py
+# 邮件发送前 HTML 处理的微基准：python benchmark_html.py [每项重复次数]
+# 对比原先每封邮件都执行的 BeautifulSoup 解析+序列化，与现在的校验 / 流式改写
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+import email_templates
+from html_utils import needs_url_normalization, normalize_image_urls
+
+EMOJI = '<img class="emoji" src="//i0.hdslb.com/bfs/emote/{:040x}.png" alt="[doge]">'
+RAW_COMMENT_HTML = "<p>" + "".join("置顶评论内容" * 5 + EMOJI.format(i) for i in range(30)) + "</p>"
+SAMPLE_TIME = "2025-01-01 12:00:00"
+
+
+def beautifulsoup_pass(html: str) -> str:
+    """原 send_email 中的处理方式"""
+    soup = BeautifulSoup(html, "html.parser")
+    for img in soup.find_all("img"):
+        src = img.get("src", "")
+        if src.startswith("//"):
+            img["src"] = "https:" + src
+    return str(soup)
+
+
+def current_pass(html: str) -> str:
+    """现在 send_email 中的处理方式"""
+    return normalize_image_urls(html) if needs_url_normalization(html) else html
+
+
+BODIES = {
+    "comment_email": email_templates.render_comment_change_email(
+        "test_name", "1234567890", RAW_COMMENT_HTML, ["//i0.hdslb.com/bfs/new_dyn/a.jpg"] * 6, RAW_COMMENT_HTML,
+        [], SAMPLE_TIME, "#FF5252", "#4CAF50"
+    ),
+    "performance_report": email_templates.render_performance_report(
+        8000, 17.8, 7900, 100, 0.9875, 3.1, 2.8, 449.4, "✅ 正常", "✅ 正常", 8000
+    ),
+    "raw_comment_html": RAW_COMMENT_HTML,  # 未经渲染器处理的 HTML，走流式改写
+}
+
+
+def _time(func, html: str, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(html)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    print(f"每项重复 {iterations} 次")
+    print(f"{'HTML':<20}{'大小(字节)':>12}{'BS4(µs)':>12}{'现在(µs)':>12}{'加速':>10}")
+    for name, html in BODIES.items():
+        assert current_pass(html).count("//i0.hdslb.com") == current_pass(html).count("https://i0.hdslb.com")
+        old = _time(beautifulsoup_pass, html, iterations)
+        new = _time(current_pass, html, iterations)
+        print(f"{name:<20}{len(html.encode('utf-8')):>12}{old:>12.1f}{new:>12.1f}{old / new:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# benchmark_templates.py
+# 邮件模板渲染微基准：python benchmark_templates.py [每个模板的渲染次数] [--baseline [git版本]]
+# --baseline 从 git 历史加载预编译模板之前的 f-string 渲染（默认为引入 email_templates.py 之前的版本），
+# 对评论和直播邮件给出改造前后的对比
+import argparse
+import subprocess
+import time
+import types
+from pathlib import Path
+
+from color_config import ColorConfig
+import email_templates
+
+REPO_DIR = Path(__file__).resolve().parent
+
+SAMPLE_COMMENT_HTML = "<p>" + "今天的置顶评论内容，包含一些文字和表情。" * 20 + "</p>"
+SAMPLE_IMAGES = [f"//i0.hdslb.com/bfs/new_dyn/{i:032x}.jpg" for i in range(6)]
+SAMPLE_TIME = "2025-01-01 12:00:00"
+
+
+def _comment_cases(color_pairs):
+    """轮换 ColorConfig 中的全部配色，覆盖配色缓存命中与未命中"""
+    def render(i):
+        primary, secondary = color_pairs[i % len(color_pairs)]
+        return email_templates.render_comment_change_email(
+            "test_name", "1234567890", SAMPLE_COMMENT_HTML, SAMPLE_IMAGES, SAMPLE_COMMENT_HTML[:200],
+            SAMPLE_IMAGES[:2], SAMPLE_TIME, primary, secondary
+        )
+    return render
+
+
+CASES = {
+    "comment_change": None,  # 运行时按配色生成
+    "live_start": lambda i: email_templates.render_live_email(
+        "test_name", "🎉", "开播啦", "测试直播标题", "", "https://i0.hdslb.com/bfs/live/cover.jpg", 6, SAMPLE_TIME
+    ),
+    "live_title_change": lambda i: email_templates.render_live_email(
+        "test_name", "✏️", "标题更新", "新标题", "旧标题", None, 6, SAMPLE_TIME
+    ),
+    "no_update_alert": lambda i: email_templates.render_no_update_alert(28, SAMPLE_TIME, 42, "3天4小时", SAMPLE_TIME),
+    "p1_alert": lambda i: email_templates.render_p1_alert(
+        "1小时", 1000, 120, 0.88, 3.2, 2.9, ["12:00:01", "11:59:40", "11:58:02", "11:50:13", "11:42:55"],
+        100, 0.8, "🚨 已触发", "✅ 正常"
+    ),
+    "p2_alert": lambda i: email_templates.render_p2_alert(
+        "5分钟", 0.75, 0.6, 250, 3.4, 4.1, 100, 0.8, "✅ 正常", "⚠️ 已触发"
+    ),
+    "performance_report": lambda i: email_templates.render_performance_report(
+        8000, 17.8, 7900, 100, 0.9875, 3.1, 2.8, 449.4, "✅ 正常", "✅ 正常", 8000
+    ),
+}
+
+
+def _git(*args: str) -> str:
+    return subprocess.run(["git", *args], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout
+
+
+def _load_baseline_module(rev: str, name: str) -> types.ModuleType:
+    """从 git 历史中加载旧版模块（只执行其源码，不影响当前导入的同名模块）"""
+    module = types.ModuleType(f"baseline_{name}")
+    exec(compile(_git("show", f"{rev}:{name}.py"), f"{rev}:{name}.py", "exec"), module.__dict__)
+    return module
+
+
+def _baseline_cases(rev: str) -> dict:
+    """改造前的渲染路径：评论邮件由 EmailRenderer 渲染，直播邮件为 LiveMonitor 中的 f-string（不依赖实例状态）"""
+    if rev == "auto":
+        added = _git("log", "--diff-filter=A", "--format=%H", "--", "email_templates.py").split()
+        if not added:
+            raise SystemExit("未找到引入 email_templates.py 的提交，请用 --baseline <git版本> 指定")
+        rev = f"{added[-1]}^"
+    renderer = _load_baseline_module(rev, "email_renderer").EmailRenderer(ColorConfig())
+    live = _load_baseline_module(rev, "live_monitor").LiveMonitor
+    live_info = {"room_id": 6, "title": "测试直播标题", "cover": "https://i0.hdslb.com/bfs/live/cover.jpg"}
+    print(f"基线版本: {rev}")
+    return {
+        "comment_change": lambda i: renderer.render_email_content(
+            "1234567890", SAMPLE_COMMENT_HTML, SAMPLE_IMAGES, SAMPLE_COMMENT_HTML[:200], SAMPLE_IMAGES[:2],
+            SAMPLE_TIME
+        ),
+        "live_start": lambda i: live.format_email_content(None, {**live_info, "change_type": "live_start"})[1],
+        "live_title_change": lambda i: live.format_email_content(
+            None, {**live_info, "change_type": "title_change", "cover": None, "title": "新标题",
+                   "previous_title": "旧标题"}
+        )[1],
+    }
+
+
+def _measure(render, iterations: int):
+    """返回 (首次耗时, 平均耗时, 输出字节数)，单位为微秒"""
+    start = time.perf_counter()
+    output = render(0)
+    first = (time.perf_counter() - start) * 1e6
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        render(i)
+    average = (time.perf_counter() - start) / iterations * 1e6
+    return first, average, len(output.encode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="邮件模板渲染微基准")
+    parser.add_argument("iterations", nargs="?", type=int, default=2000, help="每个模板的渲染次数")
+    parser.add_argument("--baseline", nargs="?", const="auto", metavar="REV",
+                        help="与该 git 版本中的旧渲染路径对比（不指定版本时自动查找）")
+    args = parser.parse_args()
+
+    color_pairs = ColorConfig().color_gradients
+    CASES["comment_change"] = _comment_cases(color_pairs)
+    baseline = _baseline_cases(args.baseline) if args.baseline else {}
+
+    print(f"每个模板渲染 {args.iterations} 次（评论模板轮换 {len(color_pairs)} 种配色）")
+    header = f"{'模板':<20}{'首次(µs)':>12}{'平均(µs)':>12}{'输出(字节)':>12}"
+    if baseline:
+        header += f"{'基线平均(µs)':>14}{'基线输出(字节)':>16}{'加速比':>10}"
+    print(header)
+    for name, render in CASES.items():
+        first, average, size = _measure(render, args.iterations)
+        row = f"{name:<20}{first:>12.1f}{average:>12.1f}{size:>12}"
+        if name in baseline:
+            _, old_average, old_size = _measure(baseline[name], args.iterations)
+            row += f"{old_average:>14.1f}{old_size:>16}{old_average / average:>9.2f}x"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -19,6 +19,13 @@ LOG_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
 MAX_LOG_SIZE_MB = 5
 LOG_BACKUP_COUNT = 1
 
+# 结构化事件日志（JSONL，一行一个事件，用 python event_log.py 查询）
+EVENT_LOG_ENABLED = True
+EVENT_LOG_STAGES = True  # 同时记录 tracing 的分阶段耗时（每轮十余条）
+EVENT_LOG_FILE = LOG_DIR / "events.jsonl"
+EVENT_LOG_MAX_MB = 20  # 单个文件大小上限，超出后轮转
+EVENT_LOG_BACKUP_COUNT = 10  # 保留的轮转文件数（总占用约 EVENT_LOG_MAX_MB × (EVENT_LOG_BACKUP_COUNT + 1)）
+
 # ===== 直播监控配置 =====
 LIVE_ROOM_ID = 6  # 直播间房间号
 LIVE_CHECK_INTERVAL = 15  # 直播检查间隔（秒）
@@ -57,7 +64,42 @@ BROWSER_CONFIG = {
 BROWSER_RESTART_INTERVAL = 10  # 每10次循环重启浏览器
 HEALTH_CHECK_INTERVAL = 15  # 每15次循环进行健康检查
 TASK_TIMEOUT = 30  # 单个任务超时时间(秒)
-MEMORY_THRESHOLD_MB = 500  # 内存阈值(MB)
+MEMORY_THRESHOLD_MB = 1024  # 内存阈值(MB)，按 Python + Chromium 整个进程树计算（有 PSS 时用 PSS）
+
+# ===== 按需性能分析（kill -USR2 <pid> 或 POST /debug/profile 触发，结果写入 logs/profile-*） =====
+PROFILING_ENABLED = True  # 注册 SIGUSR2 触发；未触发时没有任何开销
+PROFILING_HTTP_ENABLED = True  # 在指标服务上开放 /debug/profile（仅在 METRICS_HOST 为本机地址时建议开启）
+PROFILE_DEFAULT_SECONDS = 30  # 单次分析时长（秒）
+PROFILE_MAX_SECONDS = 300  # HTTP 请求可指定的最长时长
+PROFILE_DEFAULT_MODES = ("sample", "memory")  # 默认模式；cprofile 开销较大，需要时通过 HTTP 参数指定
+PROFILE_SAMPLE_INTERVAL = 0.01  # 调用栈采样间隔（秒）
+PROFILE_TRACEMALLOC_FRAMES = 10  # tracemalloc 每次分配保留的调用栈深度
+PROFILE_TOP_N = 5  # 日志摘要中列出的热点数
+
+# ===== 后台任务监督 =====
+TASK_RESTART_BASE_DELAY = 5  # 服务任务异常退出后的首次重启等待（秒），之后每次翻倍
+TASK_RESTART_MAX_DELAY = 300  # 重启等待上限（秒）
+TASK_RESTART_RESET_AFTER = 600  # 服务任务稳定运行超过该时间后再崩溃，重启等待从头计算
+TASK_HUNG_SECONDS = 300  # 一次性后台任务运行超过该时间视为可能挂起，记录其挂起位置
+TASK_LEAK_THRESHOLD = 50  # 同时未完成的一次性后台任务超过该数量时告警
+TASK_AUDIT_INTERVAL = 60  # 巡检间隔（秒）
+TASK_SHUTDOWN_TIMEOUT = 10  # 关闭时等待进行中的后台任务（如告警发送）的最长时间（秒）
+
+# ===== 浏览器健康探测（分级，逐级加重，只在必要时完整加载页面） =====
+HEALTH_PROBE_TTL = 60  # 探测通过后的结果缓存时间（秒），期间的健康检查直接复用
+HEALTH_PROBE_BUDGETS = {  # 各级探测的耗时上限（秒）
+    "js": 3,  # 浏览器已连接，且能在空白页中执行 JS
+    "fetch": 5,  # 用浏览器上下文（同一 Cookie）请求一个很小的 B 站接口
+    "navigate": 20,  # 完整加载页面，仅在上一级失败或最近一次抓取失败时执行
+}
+HEALTH_PROBE_FETCH_URL = "https://api.bilibili.com/x/web-interface/nav"  # 轻量接口，返回几百字节 JSON
+HEALTH_PROBE_PAGE_URL = "https://www.bilibili.com"
+
+# ===== 进程树资源采样 =====
+PROCESS_SAMPLE_INTERVAL = 10  # 采样结果缓存时间（秒），期间的调用共用一次采样
+PROCESS_SAMPLE_PSS = True  # 采样 PSS（读取 smaps，开销略高；共享内存不重复计算）
+BROWSER_RECYCLE_MEMORY_MB = 800  # Chromium 进程合计内存超过该值时提前重启浏览器
+BROWSER_MAX_RENDERERS = 8  # 渲染进程数超过该值（页面泄漏）时提前重启浏览器
 
 # ===== 状态监控配置 =====
 STATUS_MONITOR_INTERVAL = 7200  # 状态检查间隔（秒），2小时
@@ -65,11 +107,37 @@ NO_UPDATE_ALERT_HOURS = 28      # 无更新提醒阈值（小时）
 
 # ===== 性能监控配置 =====
 PERFORMANCE_REPORT_CYCLE_INTERVAL = 8000  # 8000轮发送一次报告
+PERFORMANCE_HISTORY_CAPACITY = 8192  # 每轮耗时记录的环形缓冲区容量（超出后覆盖最旧记录，内存固定）
+# 每轮结果持久化到二进制指标日志，重启后恢复累计计数和滑动窗口；原始记录 / 分钟汇总 / 小时汇总分层保留
+METRICS_STORE_DIR = BASE_DIR / "metrics_store"
+METRICS_RAW_RETENTION_DAYS = 1  # 原始记录保留天数（滑动窗口恢复最多回溯这么久）
+METRICS_MINUTE_RETENTION_DAYS = 31  # 分钟汇总保留天数
+METRICS_HOUR_RETENTION_DAYS = 366  # 小时汇总保留天数（累计计数按此范围统计）
+TRACING_ENABLED = True  # 分阶段耗时追踪（页面加载、滚动、解析、通知等），结果写入定期性能摘要和 /metrics
+
+# ===== 事件循环看门狗 =====
+LOOP_WATCHDOG_ENABLED = True
+LOOP_WATCHDOG_INTERVAL = 0.1  # 心跳间隔（秒）
+LOOP_LAG_THRESHOLD = 0.25  # 调度延迟超过该值（秒）时抓取阻塞事件循环的调用栈
+LOOP_WATCHDOG_TOP_N = 5  # 定期性能摘要中列出的阻塞调用点数量
 
 # ===== 告警阈值配置 =====
 P1_TOTAL_FAILURE_THRESHOLD = 100  # 失败次数阈值（P1告警）
 P2_SUCCESS_RATE_THRESHOLD = 0.8  # 成功率阈值（80%）
 
+# ===== 滑动窗口告警配置 =====
+# 告警按最近的时间窗口（秒，windows）/ 次数窗口（count_windows）评估，而不是自启动以来的累计值：
+# 任一窗口满足条件即触发，全部窗口恢复后解除；metric 为 failures（失败次数 ≥ 阈值）或 success_rate（成功率 < 阈值）
+PERFORMANCE_ALERT_RULES = {
+    "P1": {"metric": "failures", "threshold": P1_TOTAL_FAILURE_THRESHOLD, "windows": [3600]},
+    "P2": {"metric": "success_rate", "threshold": P2_SUCCESS_RATE_THRESHOLD, "windows": [300, 3600, 86400],
+           "min_samples": 10},
+}
+LIVE_ALERT_RULES = {
+    "P2": {"metric": "success_rate", "threshold": LIVE_SUCCESS_RATE_THRESHOLD, "windows": [300, 3600, 86400],
+           "count_windows": [100], "min_samples": 10},
+}
+
 # ===== 系统状态检查间隔 =====
 SYSTEM_STATUS_CHECK_INTERVAL = 3600  # 系统状态检查间隔（秒）
 
@@ -93,6 +161,96 @@ for dir_path in [MAIL_SAVE_DIR, LOG_DIR]:
 # 直接从独立的配置文件导入，不设置默认值
 from config_email import SMTP_SERVER, SMTP_PORT, EMAIL_USER, EMAIL_PASSWORD, TO_EMAILS, STATUS_MONITOR_EMAILS
 
+# ===== SMTP连接池配置 =====
+SMTP_POOL_SIZE = 2  # 保持的已认证连接数上限
+SMTP_TIMEOUT = 30  # 单次SMTP操作超时时间（秒）
+SMTP_KEEPALIVE_INTERVAL = 60  # 空闲连接发送NOOP保活的间隔（秒）
+SMTP_MAX_IDLE_SECONDS = 600  # 空闲超过该时长的连接直接关闭（秒）
+EMAIL_ASYNC_TRANSPORT_ENABLED = True  # 使用原生asyncio SMTP发送（失败时回退到阻塞发送）
+EMAIL_BCC_BATCH_SIZE = 20  # 单次SMTP事务的收件人数上限；多个收件人时以密送方式分批并行发送
+EMAIL_SEND_DEADLINE = 90  # 一封邮件各分批的发送期限（秒），到期未完成的分批记为临时失败，只对这些收件人重试
+
+# ===== 邮件图片内嵌配置 =====
+# B站图床有防盗链，收件人客户端直接加载外链图片经常失败；下载后作为 CID 附件内嵌
+EMAIL_INLINE_IMAGES_ENABLED = True
+EMAIL_INLINE_IMAGE_HOSTS = ["hdslb.com"]  # 只内嵌这些域名（含子域名）的图片
+EMAIL_INLINE_MAX_IMAGES = 40  # 单封邮件最多内嵌的图片数，超出部分保留外链
+EMAIL_INLINE_TIMEOUT = 30  # 下载内嵌图片的总时限（秒），超时则整封邮件使用原图片地址
+IMAGE_CACHE_DIR = BASE_DIR / "image_cache"  # 内容寻址的图片缓存目录
+IMAGE_CACHE_MAX_MB = 200  # 图片缓存总大小上限（MB），超出时淘汰最久未使用的图片
+IMAGE_MAX_DOWNLOAD_MB = 10  # 单张图片下载大小上限（MB）
+IMAGE_MAX_WIDTH = 600  # 宽度超过该值的图片缩放到邮件宽度（需要安装 Pillow，未安装时内嵌原图）
+IMAGE_FETCH_TIMEOUT = 15  # 单张图片下载超时（秒）
+IMAGE_FETCH_CONCURRENCY = 4  # 同时下载的图片数
+IMAGE_FAILURE_TTL = 300  # 下载失败的图片在该时间内不再重试（秒），保留原地址
+IMAGE_CACHE_FLUSH_DELAY = 5  # 索引、访问时间和淘汰的文件延迟该时间后在线程中批量写盘（秒）
+
+# ===== 通知发件箱配置 =====
+OUTBOX_DB_FILE = BASE_DIR / "notification_outbox.db"  # 发件箱日志（SQLite）
+OUTBOX_MAX_ATTEMPTS = 5  # 单条通知最大投递次数，超过后标记为死信
+OUTBOX_RETRY_BASE_DELAY = 5  # 重试基础延迟（秒），按指数退避
+OUTBOX_RETRY_MAX_DELAY = 300  # 重试最大延迟（秒）
+OUTBOX_DEDUPE_WINDOW_SECONDS = 600  # 去重窗口：相同去重键在该时间内只入队一次
+OUTBOX_RETENTION_HOURS = 72  # 已完成/死信记录保留时长（小时）
+OUTBOX_WORKER_ERROR_DELAY = 5  # worker 遇到异常（如数据库暂时不可用）后等待多久再继续（秒）
+NOTIFY_CHANNEL_TIMEOUTS = {  # 各通道单次投递超时（秒），互不影响
+    "email": 180,  # 仅作兜底：应大于 EMAIL_INLINE_TIMEOUT + EMAIL_SEND_DEADLINE，超时会对所有收件人重发
+    "qq": 30,
+}
+
+# ===== 通知合并配置 =====
+# 窗口外的事件立即发出；窗口内的后续事件合并，窗口结束时发出一条“首→尾”通知
+NOTIFY_COALESCE_RULES = {  # 事件类型: {"window": 合并窗口（秒）, "max_delay": 挂起事件最大延迟（秒）}
+    "comment_change": {"window": 60, "max_delay": 180},
+    "live_start": {"window": 60, "max_delay": 60},
+    "live_end": {"window": 30, "max_delay": 60},
+    "title_change": {"window": 30, "max_delay": 90},
+}
+NOTIFY_COALESCE_BYPASS = ["live_start"]  # 始终立即发出的事件类型（仍会为后续事件打开合并窗口）
+
 # ===== QQ推送配置 =====
 # 直接从独立的配置文件导入，不设置默认值
 from config_qq import QQ_GROUP_IDS, QQ_PUSH_ENABLED
+
+# ===== QQ机器人传输配置 =====
+QQ_TRANSPORT = "auto"  # auto: ws:// 地址走 WebSocket，http:// 地址走 HTTP；也可强制为 "ws" 或 "http"
+QQ_ACTION_TIMEOUT = 10  # 单次 OneBot 动作调用超时（秒）
+QQ_WS_HEARTBEAT_INTERVAL = 30  # WebSocket 心跳（ping）间隔（秒）
+QQ_WS_RECONNECT_MAX_DELAY = 60  # WebSocket 断线重连最大退避时间（秒）
+
+# ===== QQ发送调度（令牌桶限流）=====
+QQ_GLOBAL_RATE = 3  # 全局发送速率（条/秒）
+QQ_GLOBAL_BURST = 6  # 全局令牌桶容量（允许的突发条数）
+QQ_GROUP_RATE = 0.5  # 单群发送速率（条/秒）
+QQ_GROUP_BURST = 2  # 单群令牌桶容量
+QQ_SEND_CONCURRENCY = 4  # 同时在途的发送动作数
+QQ_SEND_MAX_RETRIES = 3  # 普通失败的最大尝试次数（被限流不计入）
+QQ_THROTTLE_BASE_DELAY = 2  # 被限流且未返回 retry_after 时的基础冷却时间（秒），连续限流时翻倍
+QQ_THROTTLE_MAX_DELAY = 120  # 限流冷却最大时间（秒），retry_after 也不超过该值
+QQ_THROTTLE_DEFER_AFTER = 10  # 剩余冷却时间超过该值（秒）时消息退回发件箱延后投递，不计入尝试次数；应小于 QQ 通道投递超时
+QQ_RATE_LIMIT_RETCODES = [429]  # 视为限流的 OneBot retcode
+
+# ===== QQ长消息配置 =====
+QQ_FORWARD_ENABLED = True  # 超长或多图消息打包为合并转发（框架不支持时自动改为分段发送）
+QQ_FORWARD_IMAGE_THRESHOLD = 3  # 图片数达到该值时即使未超长也使用合并转发
+QQ_FORWARD_NODE_NAME = "动态推送"  # 合并转发节点显示的发送者名称
+QQ_FORWARD_NODE_UIN = ""  # 合并转发节点的QQ号，留空时通过 get_login_info 获取机器人自身QQ号
+
+# ===== QQ图片处理配置 =====
+# CQ码中的远程图片下载一次、缩小后按内容哈希缓存，机器人不再为每个群从CDN拉取原图
+QQ_IMAGE_STAGE_ENABLED = True
+QQ_IMAGE_DELIVERY = "auto"  # auto: 机器人地址为本机时用 file://，否则用 base64://（未安装 Pillow 时保留原地址）；也可强制为 "file"/"base64"/"url"（保留原地址）
+QQ_IMAGE_CACHE_DIR = BASE_DIR / "image_cache_qq"  # QQ图片缓存目录
+QQ_IMAGE_CACHE_MAX_MB = 200  # QQ图片缓存总大小上限（MB）
+QQ_IMAGE_MAX_WIDTH = 1280  # 宽度超过该值的图片缩小到该宽度（需要安装 Pillow）
+QQ_IMAGE_QUALITY = 80  # 缩小后重新编码的 JPEG 质量
+QQ_IMAGE_BASE64_MAX_KB = 512  # base64 内联的单张图片上限（KB），更大的图片（未能缩小的原图、动图）保留原地址
+
+# ===== 指标与健康检查接口 =====
+# 内嵌 HTTP 服务：/metrics 为 Prometheus 文本格式，/healthz 为 JSON 就绪检查（不健康时返回 503）
+METRICS_ENABLED = True
+METRICS_HOST = "127.0.0.1"  # 监听地址，需要从其他机器抓取时改为 0.0.0.0
+METRICS_PORT = 9108  # 监听端口
+HEALTH_CYCLE_STALE_SECONDS = 300  # 动态监控超过该时间没有完成一轮时视为不健康
+HEALTH_LIVE_STALE_SECONDS = 180  # 直播监控超过该时间没有成功检查时视为不健康
+HEALTH_OUTBOX_MAX_PENDING_AGE = 600  # 发件箱中最早待投递通知的等待时间上限（秒）
@@ -22,6 +22,11 @@ SMTP_SERVER = "smtp.qq.com"
 # 推荐使用SSL加密（端口465）或TLS加密（端口587）
 SMTP_PORT = 465
 
+# 连接加密方式（None 表示自动：587 端口使用 STARTTLS，其余端口一律使用 SSL）
+# 服务商使用非标准端口时可显式指定；只有两项都设为 False 才会明文发送（仅限本地测试）
+SMTP_USE_SSL = None
+SMTP_STARTTLS = None
+
 # ===== 发件人邮箱账号配置 =====
 # 发件人邮箱地址（必须与SMTP服务器匹配）
 # 例如：QQ邮箱用户应使用@qq.com结尾的邮箱
@@ -25,7 +25,7 @@ QQ_GROUP_IDS = [
 ]
 
 # ===== 消息格式配置 =====
-# 消息最大长度（避免消息过长被截断）
+# 单条消息最大长度（超过时按CQ码边界拆分为多段或合并转发，不会截断）
 MAX_MESSAGE_LENGTH = 500
 
 # 是否启用推送（可以临时关闭）
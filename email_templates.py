@@ -0,0 +1,579 @@
+# email_templates.py
+import re
+from functools import lru_cache
+from string import Formatter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from html_utils import normalize_url, normalize_image_urls
+
+# 可以内联的选择器：标签名或单个类名；带伪类、后代、分组的选择器只保留在 <style> 中
+_INLINE_SELECTOR = re.compile(r"^(?:[a-z][a-z0-9]*|\.[\w-]+)$")
+_OPENING_TAG = re.compile(r"<([a-zA-Z][a-zA-Z0-9]*)\b([^>]*)>")
+_CLASS_ATTR = re.compile(r'\bclass="([^"]*)"')
+
+Stylesheet = Sequence[Tuple[str, str]]
+
+
+class EmailTemplate:
+    """
+    预编译的邮件模板
+
+    - 构造时解析一次：样式表中可内联的规则写入各元素的 style 属性（邮件客户端常会丢弃 <style>），
+      模板拆分为字面量和占位符
+    - 每种配色的 CSS 只计算一次（lru_cache），并直接合并进相邻的字面量
+    - 渲染时只格式化动态字段，与预先合并好的字面量一次 join；
+      重复片段（图片、列表项）同样逐项渲染后 join，不做字符串累加
+    """
+
+    def __init__(self, source: str, stylesheet: Stylesheet = ()):
+        stylesheet = [(selector, " ".join(declarations.split())) for selector, declarations in stylesheet]
+        inline_rules = [rule for rule in stylesheet if _INLINE_SELECTOR.match(rule[0])]
+        self._block_rules = [rule for rule in stylesheet if not _INLINE_SELECTOR.match(rule[0])]
+
+        source, self._style_fields = self._inline_styles(source, inline_rules)
+        self._parts = [
+            (literal, field, spec)
+            for literal, field, spec, _ in Formatter().parse(source)
+        ]
+        self._specialize = lru_cache(maxsize=128)(self._build)
+
+    @staticmethod
+    def _inline_styles(source: str, rules: Stylesheet) -> Tuple[str, Dict[str, str]]:
+        """为匹配样式规则的元素加上 style 占位符，返回 (新模板, {占位符: 声明})"""
+        fields: Dict[str, str] = {}
+        names: Dict[str, str] = {}
+
+        def replace(match):
+            tag, attrs = match.group(1), match.group(2)
+            class_attr = _CLASS_ATTR.search(attrs)
+            classes = class_attr.group(1).split() if class_attr else []
+            declarations = [
+                declaration for selector, declaration in rules
+                if selector == tag.lower() or (selector[0] == "." and selector[1:] in classes)
+            ]
+            if not declarations:
+                return match.group(0)
+
+            css = " ".join(d if d.endswith(";") else d + ";" for d in declarations)
+            name = names.get(css)
+            if name is None:
+                name = names[css] = f"_style_{len(names)}"
+                fields[name] = css
+
+            closing = ""
+            if attrs.rstrip().endswith("/"):
+                attrs, closing = attrs.rstrip()[:-1].rstrip(), " /"
+            return f'<{tag}{attrs} style="{{{name}}}"{closing}>'
+
+        return _OPENING_TAG.sub(replace, source), fields
+
+    def _build(self, palette: Tuple[Tuple[str, str], ...]) -> Tuple[Tuple[str, ...], Tuple[Tuple[str, str], ...]]:
+        """按配色生成样式并与相邻字面量合并，只剩动态字段之间的字面量；结果按配色缓存"""
+        colors = dict(palette)
+        constants = {name: css.format_map(colors) for name, css in self._style_fields.items()}
+        constants["_css"] = "\n".join(
+            f"{selector} {{ {declarations.format_map(colors)} }}" for selector, declarations in self._block_rules
+        )
+
+        literals: List[str] = []
+        fields: List[Tuple[str, str]] = []
+        buffer: List[str] = []
+        for literal, field, spec in self._parts:
+            buffer.append(literal)
+            if field is None:
+                continue
+            if field in constants:
+                buffer.append(constants[field])
+                continue
+            literals.append("".join(buffer))
+            buffer = []
+            fields.append((field, spec))
+        literals.append("".join(buffer))
+        return tuple(literals), tuple(fields)
+
+    def render(self, palette: Optional[Dict[str, str]] = None, **values) -> str:
+        literals, fields = self._specialize(tuple(palette.items()) if palette else ())
+        out = [literals[0]]
+        for (field, spec), literal in zip(fields, literals[1:]):
+            value = values[field]
+            out.append(value if not spec and type(value) is str else format(value, spec))
+            out.append(literal)
+        return "".join(out)
+
+    def render_each(self, rows: Iterable[Dict[str, object]], palette: Optional[Dict[str, str]] = None) -> str:
+        """逐行渲染重复片段（图片、列表项），所有行共用一个缓冲区，最后一次 join"""
+        literals, fields = self._specialize(tuple(palette.items()) if palette else ())
+        tail = literals[1:]
+        out = []
+        for values in rows:
+            out.append(literals[0])
+            for (field, spec), literal in zip(fields, tail):
+                value = values[field]
+                out.append(value if not spec and type(value) is str else format(value, spec))
+                out.append(literal)
+        return "".join(out)
+
+
+# ======================================================================
+# 置顶评论更新（随机对比色）
+# ======================================================================
+_COMMENT_STYLES = [
+    ("body", "font-family: 'Microsoft YaHei', Arial, sans-serif; margin: 0; padding: 20px; background-color: #f5f5f5;"),
+    (".container", """max-width: 600px; margin: 0 auto; background-color: white; border-radius: 10px;
+                      box-shadow: 0 2px 10px rgba(0,0,0,0.1); overflow: hidden;"""),
+    (".header", """background-color: {primary}; background: linear-gradient(135deg, {primary}, {secondary});
+                   color: white; padding: 20px; text-align: center;"""),
+    (".header-title", "margin: 0; font-size: 24px; text-shadow: 1px 1px 3px rgba(0,0,0,0.2);"),
+    (".header-gradient-bar", """height: 5px; background-color: {secondary};
+                                background: linear-gradient(90deg, {primary}, {secondary}); margin-top: 10px;"""),
+    (".content", "padding: 30px;"),
+    (".info-section", """background-color: #f9f9f9; padding: 20px; border-radius: 8px; margin-bottom: 20px;
+                         border-left: 4px solid {primary}; border-right: 4px solid {secondary};"""),
+    (".comment-content", """border: 1px solid #ddd; padding: 15px; border-radius: 5px; white-space: pre-wrap;
+                            word-break: break-all; margin-top: 10px; line-height: 1.5;"""),
+    (".current-comment", "background-color: #f0f8ff; border-left: 4px solid {primary}; border-right: 4px solid {secondary};"),
+    (".previous-comment", "background-color: #f0f0f0; border-left: 4px solid {primary}; border-right: 4px solid {secondary};"),
+    (".images-container", "margin-top: 10px;"),
+    (".image-item", """max-width: 300px; max-height: 300px; border-radius: 5px; border: 1px solid #ddd;
+                       margin: 0 10px 10px 0; vertical-align: top;"""),
+    (".btn", """display: inline-block; margin-top: 10px; background-color: {primary};
+                background: linear-gradient(135deg, {primary}, {secondary}); color: #fff; padding: 12px 24px;
+                border-radius: 5px; text-decoration: none; font-weight: bold; border: none;
+                box-shadow: 0 2px 5px rgba(0,0,0,0.2);"""),
+    (".btn:hover", "transform: translateY(-2px); box-shadow: 0 4px 8px rgba(0,0,0,0.2);"),
+    (".action-section", """text-align: center; padding: 25px; background-color: #f9f9f9;
+                           background: linear-gradient(135deg, #f9f9f9, #f0f0f0); border-radius: 8px; margin: 20px 0;
+                           border: 2px solid {primary}; border-image: linear-gradient(135deg, {primary}, {secondary});
+                           border-image-slice: 1;"""),
+    (".action-text", "font-size: 16px; margin-bottom: 15px; color: #333;"),
+    (".footer", "text-align: center; color: #999; font-size: 12px; margin-top: 20px; padding: 20px; border-top: 1px solid #eee;"),
+    (".time-badge", """display: inline-block; background-color: {primary};
+                       background: linear-gradient(135deg, {primary}, {secondary}); color: white; padding: 4px 8px;
+                       border-radius: 3px; font-size: 12px; margin-left: 5px;"""),
+    (".key-badge", """display: inline-block; background-color: {primary};
+                      background: linear-gradient(135deg, {primary}, {secondary}); color: white; padding: 4px 8px;
+                      border-radius: 3px; font-size: 16px; margin-left: 5px;"""),
+]
+
+COMMENT_CHANGE_TEMPLATE = EmailTemplate("""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="UTF-8">
+<title>{up_name} 动态置顶评论更新通知</title>
+<style>
+{_css}
+</style>
+</head>
+<body>
+<div class="container">
+    <div class="header">
+        <h1 class="header-title">{up_name} 动态置顶评论更新通知</h1>
+        <div class="header-gradient-bar"></div>
+    </div>
+
+    <div class="content">
+        <div class="info-section">
+            <p><span class="time-badge">📱 监测动态：</span></p>
+            <p><a href="https://t.bilibili.com/{dynamic_id}">https://t.bilibili.com/{dynamic_id}</a></p>
+            <p><span class="time-badge">⏰ 检测时间：</span> {current_time}</p>
+        </div>
+
+        <div class="info-section">
+            <p><span class="key-badge">✨ 新置顶评论： ✨</span></p>
+            <div class="comment-content current-comment">
+                {current_html}
+            </div>
+            {current_images}
+        </div>
+
+        <div class="info-section">
+            <p><span class="key-badge">📄 原置顶评论： 📄</span></p>
+            <div class="comment-content previous-comment">
+                {last_html}
+            </div>
+            {last_images}
+        </div>
+
+        <!-- 独立的按钮区域 -->
+        <div class="action-section">
+            <p class="action-text">点击下方按钮查看最新动态：</p>
+            <a class="btn" href="https://t.bilibili.com/{dynamic_id}?comment_on=1" target="_blank">
+                🔍 前往B站查看动态
+            </a>
+        </div>
+    </div>
+
+    <div class="footer">
+        <p>此邮件由动态监控系统自动发送，请勿回复</p>
+        <p>检测时间: {current_time}</p>
+        <p>本次随机主题色: {primary_color} → {secondary_color}</p>
+    </div>
+</div>
+</body>
+</html>
+""", _COMMENT_STYLES)
+
+_IMAGE_ITEM = EmailTemplate('<img class="image-item" src="{src}" alt="{alt}">', _COMMENT_STYLES)
+_IMAGES_CONTAINER = EmailTemplate('<div class="images-container">{items}</div>', _COMMENT_STYLES)
+
+
+def _render_images(images: Sequence[str], alt: str, palette: Dict[str, str]) -> str:
+    if not images:
+        return ""
+    items = _IMAGE_ITEM.render_each(({"src": normalize_url(url), "alt": alt} for url in images), palette)
+    return _IMAGES_CONTAINER.render(palette, items=items)
+
+
+def render_comment_change_email(up_name: str, dynamic_id: str, current_html: str, current_images: Sequence[str],
+                                last_html: str, last_images: Sequence[str], current_time: str,
+                                primary_color: str, secondary_color: str) -> str:
+    palette = {"primary": primary_color, "secondary": secondary_color}
+    return COMMENT_CHANGE_TEMPLATE.render(
+        palette,
+        up_name=up_name,
+        dynamic_id=dynamic_id,
+        current_time=current_time,
+        # 评论 HTML 中的表情图片为 // 地址，在渲染时一次性补全，发送时无需再处理
+        current_html=normalize_image_urls(current_html) if current_html else "无置顶评论",
+        current_images=_render_images(current_images, "评论图片", palette),
+        last_html=normalize_image_urls(last_html) if last_html else "无原置顶评论",
+        last_images=_render_images(last_images, "原评论图片", palette),
+        primary_color=primary_color,
+        secondary_color=secondary_color,
+    )
+
+
+# ======================================================================
+# 直播状态变化
+# ======================================================================
+LIVE_TEMPLATE = EmailTemplate("""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="UTF-8">
+</head>
+<body>
+<div class="container">
+  <div class="header">
+    <h2>{icon} {up_name} 直播提醒</h2>
+  </div>
+
+  {cover}
+
+  <div class="content">
+    <div class="status">{text}</div>
+    <div class="info">
+      <p><b>标题：</b>{title}</p>
+      {previous_title}
+      <p><b>时间：</b>{current_time}</p>
+    </div>
+    <div style="text-align:center">
+      <a class="btn" href="https://live.bilibili.com/{room_id}">
+        进入直播间
+      </a>
+    </div>
+  </div>
+
+  <div class="footer">
+    <p>此邮件由直播监控系统自动发送，请勿回复</p>
+    <p>监控时间：{current_time}</p>
+  </div>
+</div>
+</body>
+</html>
+""", [
+    ("body", "background:#f5f5f5; font-family:Microsoft YaHei; padding:20px"),
+    (".container", "max-width:600px; margin:auto; background:#fff; border-radius:10px; overflow:hidden"),
+    (".header", "background-color:#ff3366; background:linear-gradient(135deg,#ff6699,#ff3366); color:#fff; padding:20px; text-align:center"),
+    (".cover-image", "width:100%; display:block"),
+    (".content", "padding:24px"),
+    (".status", "text-align:center; font-size:20px; color:#ff3366; font-weight:bold"),
+    (".info", "background:#f9f9f9; padding:15px; border-radius:8px; margin-top:15px"),
+    (".btn", "display:inline-block; margin-top:20px; background:#ff3366; color:#fff; padding:10px 20px; border-radius:5px; text-decoration:none"),
+    (".footer", "text-align:center; font-size:12px; color:#999; padding:20px"),
+])
+
+_LIVE_COVER = EmailTemplate('<div class="cover"><img class="cover-image" src="{cover}"></div>', [
+    (".cover-image", "width:100%; display:block"),
+])
+
+
+def render_live_email(up_name: str, icon: str, text: str, title: str, previous_title: str,
+                      cover: Optional[str], room_id, current_time: str) -> str:
+    return LIVE_TEMPLATE.render(
+        icon=icon,
+        up_name=up_name,
+        text=text,
+        title=title,
+        previous_title=f"<p><b>原标题：</b>{previous_title}</p>" if previous_title else "",
+        cover=_LIVE_COVER.render(cover=normalize_url(cover)) if cover else "",
+        room_id=room_id,
+        current_time=current_time,
+    )
+
+
+# ======================================================================
+# 长时间无更新提醒
+# ======================================================================
+NO_UPDATE_ALERT_TEMPLATE = EmailTemplate("""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="UTF-8">
+<title>监控提醒</title>
+</head>
+<body>
+
+<div class="alert">
+<h2>⚠️ 监控系统提醒</h2>
+<p>已超过 <strong>{hours} 小时</strong> 未检测到动态置顶评论更新。</p>
+</div>
+
+<div class="info">
+<h3>📊 监控信息</h3>
+<p>最后更新时间：{last_update_time}</p>
+<p>累计变化次数：{total_changes}</p>
+<p>系统运行时长：{runtime}</p>
+<p>当前系统时间：{current_time}</p>
+</div>
+
+<div class="info">
+<h3>🔍 建议操作</h3>
+<ol>
+<li>确认 UP 主近期是否确实无更新</li>
+<li>检查动态链接是否仍有效</li>
+<li>如已人工确认无异常，可忽略本提醒</li>
+<li>如修改配置或修复问题，请重启程序</li>
+</ol>
+</div>
+
+</body>
+</html>
+""", [
+    ("body", "font-family: Arial, sans-serif; margin: 20px;"),
+    (".alert", "background-color: #fff3cd; border: 1px solid #ffeaa7; padding: 15px; border-radius: 5px;"),
+    (".info", "background-color: #d1ecf1; border: 1px solid #bee5eb; padding: 10px; margin-top: 10px; border-radius: 5px;"),
+])
+
+
+def render_no_update_alert(hours: int, last_update_time: str, total_changes: int, runtime: str,
+                           current_time: str) -> str:
+    return NO_UPDATE_ALERT_TEMPLATE.render(
+        hours=hours,
+        last_update_time=last_update_time,
+        total_changes=total_changes,
+        runtime=runtime,
+        current_time=current_time,
+    )
+
+
+# ======================================================================
+# 性能告警 / 报告（卡片式）
+# ======================================================================
+#| 邮件类型      | 主题语义    | 主色            |
+#| --------- | ------- | ------------- |
+#| **P1 告警** | 严重 / 紧急 | 深橙色 `#E65100` |
+#| **P2 告警** | 警告 / 风险 | 琥珀色 `#F9A825` |
+#| **性能报告**  | 稳定 / 中性 | 青绿色 `#00796B` |
+def _card_styles(theme: str, theme_dark: str, stat_background: str, th_background: str,
+                 max_width: int, cell_padding: int) -> List[Tuple[str, str]]:
+    return [
+        ("body", "font-family:'Microsoft YaHei', Arial; background:#f5f5f5; padding:20px;"),
+        (".card", f"max-width:{max_width}px; margin:auto; background:#fff; border-radius:10px; "
+                  "box-shadow:0 4px 12px rgba(0,0,0,0.1); overflow:hidden;"),
+        (".header", f"background-color:{theme}; background:linear-gradient(135deg,{theme},{theme_dark}); "
+                    "color:white; padding:20px; text-align:center;"),
+        (".content", "padding:24px;"),
+        (".stat", f"background:{stat_background}; padding:12px; border-radius:6px; margin-bottom:10px;"),
+        ("table", "width:100%; border-collapse:collapse; margin-top:15px;"),
+        ("th", f"border:1px solid #ddd; padding:{cell_padding}px; text-align:left; background:{th_background};"),
+        ("td", f"border:1px solid #ddd; padding:{cell_padding}px; text-align:left;"),
+        ("ul", "padding-left:18px;"),
+    ]
+
+
+_ALERT_STATUS_TABLE = """<h4>告警状态</h4>
+                    <table>
+                        <tr><th>类型</th><th>阈值</th><th>当前</th><th>状态</th></tr>
+                        <tr><td>P1累计失败</td><td>{p1_threshold}</td><td>{failure_count}</td><td>{p1_status}</td></tr>
+                        <tr><td>P2成功率</td><td>{p2_threshold:.0%}</td><td>{success_rate:.2%}</td><td>{p2_status}</td></tr>
+                    </table>"""
+
+P1_ALERT_TEMPLATE = EmailTemplate("""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="UTF-8">
+</head>
+<body>
+    <div class="card">
+        <div class="header">
+            <h2>🚨 P1 严重告警</h2>
+            <p>{window}内失败次数超出安全阈值</p>
+        </div>
+        <div class="content">
+            <div class="stat"><strong>失败次数（{window}）：</strong>{failure_count}</div>
+            <div class="stat"><strong>当前轮次：</strong>{total_cycles}</div>
+            <div class="stat"><strong>成功率（{window}）：</strong>{success_rate:.1%}</div>
+            <div class="stat"><strong>平均耗时：</strong>{avg_duration:.1f}s, 最近10轮平均：{recent_avg:.1f}s</div>
+
+            <h4>最近失败时间</h4>
+            <ul>
+                {recent_failures}
+            </ul>
+
+            """ + _ALERT_STATUS_TABLE + """
+
+            <p><strong>⚠️ 请立即检查系统运行状态！</strong></p>
+        </div>
+    </div>
+</body>
+</html>
+""", _card_styles("#E65100", "#BF360C", "#fff3e0", "#FFE0B2", 700, 8))
+
+P2_ALERT_TEMPLATE = EmailTemplate("""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="UTF-8">
+</head>
+<body>
+    <div class="card">
+        <div class="header">
+            <h2>⚠️ P2 性能告警</h2>
+            <p>{window}内成功率低于预期阈值</p>
+        </div>
+        <div class="content">
+            <div class="stat"><strong>成功率（{window}）：</strong>{success_rate:.2%}</div>
+            <div class="stat"><strong>最近10轮成功率：</strong>{recent_rate:.2%}</div>
+            <div class="stat"><strong>失败轮次（{window}）：</strong>{failure_count}</div>
+            <div class="stat"><strong>平均耗时：</strong>{avg_duration:.1f}s, 最近10轮平均：{recent_avg:.1f}s</div>
+
+            """ + _ALERT_STATUS_TABLE + """
+
+            <h4>建议排查项</h4>
+            <ul>
+                <li>Cookie 是否失效</li>
+                <li>网络波动</li>
+                <li>反爬策略变化</li>
+                <li>浏览器实例稳定性</li>
+            </ul>
+        </div>
+    </div>
+</body>
+</html>
+""", _card_styles("#F9A825", "#F57F17", "#fffde7", "#FFF9C4", 700, 8))
+
+_REPORT_STYLES = _card_styles("#00796B", "#004D40", "#e0f2f1", "#B2DFDB", 750, 10)
+
+PERFORMANCE_REPORT_TEMPLATE = EmailTemplate("""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="UTF-8">
+</head>
+<body>
+    <div class="card">
+        <div class="header">
+            <h2>📊 性能运行报告 - 第{total_cycles}轮</h2>
+            <p>系统运行时间: {uptime_hours:.1f} 小时</p>
+        </div>
+        <div class="content">
+            <table>
+                <tr><th>指标</th><th>数值</th></tr>
+                <tr><td>总轮次数</td><td>{total_cycles}</td></tr>
+                <tr><td>成功轮次</td><td>{success}</td></tr>
+                <tr><td>失败轮次</td><td>{failure}</td></tr>
+                <tr><td>成功率</td><td>{success_rate:.2%}</td></tr>
+                <tr><td>平均耗时</td><td>{avg_duration:.1f}s</td></tr>
+                <tr><td>最近10轮平均耗时</td><td>{recent_avg:.1f}s</td></tr>
+                <tr><td>运行频率</td><td>{cycles_per_hour:.1f} 轮/小时</td></tr>
+                <tr><td>内存峰值（含浏览器）</td><td>{memory_peak:.1f} MB</td></tr>
+                <tr><td>P1告警状态</td><td colspan="2">{p1_status}</td></tr>
+                <tr><td>P2告警状态</td><td colspan="2">{p2_status}</td></tr>
+            </table>
+            {trend_table}
+            {process_table}
+            <p><em>报告间隔: 每 {report_interval} 轮发送一次</em></p>
+        </div>
+    </div>
+</body>
+</html>
+""", _REPORT_STYLES)
+
+_LIST_ITEM = EmailTemplate("<li>{text}</li>")
+
+_TREND_TABLE = EmailTemplate("""<h4>长期趋势（跨重启）</h4>
+            <table>
+                <tr><th>时间范围</th><th>轮次</th><th>成功率</th><th>平均耗时</th><th>最大耗时</th></tr>
+                {rows}
+            </table>""", _REPORT_STYLES)
+_TREND_ROW = EmailTemplate(
+    "<tr><td>{window}</td><td>{cycles}</td><td>{success_rate:.2%}</td><td>{avg_duration:.1f}s</td>"
+    "<td>{max_duration:.1f}s</td></tr>",
+    _REPORT_STYLES
+)
+_PROCESS_TABLE = EmailTemplate("""<h4>进程资源（Python + Chromium）</h4>
+            <table>
+                <tr><th>角色</th><th>进程数</th><th>RSS</th><th>PSS</th><th>CPU时间</th><th>文件描述符</th></tr>
+                {rows}
+            </table>""", _REPORT_STYLES)
+_PROCESS_ROW = EmailTemplate(
+    "<tr><td>{role}</td><td>{count}</td><td>{rss_mb:.1f} MB</td><td>{pss_mb:.1f} MB</td>"
+    "<td>{cpu_time:.1f}s</td><td>{fds}</td></tr>",
+    _REPORT_STYLES
+)
+
+
+def render_p1_alert(window: str, total_cycles: int, failure_count: int, success_rate: float, avg_duration: float,
+                    recent_avg: float, recent_failures: Sequence[str], p1_threshold: int, p2_threshold: float,
+                    p1_status: str, p2_status: str) -> str:
+    return P1_ALERT_TEMPLATE.render(
+        window=window,
+        total_cycles=total_cycles,
+        failure_count=failure_count,
+        success_rate=success_rate,
+        avg_duration=avg_duration,
+        recent_avg=recent_avg,
+        recent_failures=_LIST_ITEM.render_each({"text": t} for t in recent_failures),
+        p1_threshold=p1_threshold,
+        p2_threshold=p2_threshold,
+        p1_status=p1_status,
+        p2_status=p2_status,
+    )
+
+
+def render_p2_alert(window: str, success_rate: float, recent_rate: float, failure_count: int, avg_duration: float,
+                    recent_avg: float, p1_threshold: int, p2_threshold: float,
+                    p1_status: str, p2_status: str) -> str:
+    return P2_ALERT_TEMPLATE.render(
+        window=window,
+        success_rate=success_rate,
+        recent_rate=recent_rate,
+        failure_count=failure_count,
+        avg_duration=avg_duration,
+        recent_avg=recent_avg,
+        p1_threshold=p1_threshold,
+        p2_threshold=p2_threshold,
+        p1_status=p1_status,
+        p2_status=p2_status,
+    )
+
+
+def render_performance_report(total_cycles: int, uptime_hours: float, success: int, failure: int,
+                              success_rate: float, avg_duration: float, recent_avg: float,
+                              cycles_per_hour: float, p1_status: str, p2_status: str,
+                              report_interval: int, memory_peak: float = 0.0,
+                              process_rows: Sequence[Dict[str, object]] = (),
+                              trend_rows: Sequence[Dict[str, object]] = ()) -> str:
+    return PERFORMANCE_REPORT_TEMPLATE.render(
+        total_cycles=total_cycles,
+        uptime_hours=uptime_hours,
+        success=success,
+        failure=failure,
+        success_rate=success_rate,
+        avg_duration=avg_duration,
+        recent_avg=recent_avg,
+        cycles_per_hour=cycles_per_hour,
+        p1_status=p1_status,
+        p2_status=p2_status,
+        report_interval=report_interval,
+        memory_peak=memory_peak,
+        trend_table=_TREND_TABLE.render(rows=_TREND_ROW.render_each(trend_rows)) if trend_rows else "",
+        process_table=_PROCESS_TABLE.render(rows=_PROCESS_ROW.render_each(process_rows)) if process_rows else "",
+    )
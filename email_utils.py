@@ -1,50 +1,321 @@
 # email_utils.py
+import asyncio
 import smtplib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from email.mime.image import MIMEImage
+from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.header import Header
-from bs4 import BeautifulSoup
 from logger_config import logger
-from config_email import SMTP_SERVER, SMTP_PORT, EMAIL_USER, EMAIL_PASSWORD, TO_EMAILS
+from config import (
+    EMAIL_ASYNC_TRANSPORT_ENABLED, EMAIL_INLINE_IMAGES_ENABLED, EMAIL_INLINE_IMAGE_HOSTS, EMAIL_INLINE_MAX_IMAGES,
+    EMAIL_INLINE_TIMEOUT, EMAIL_BCC_BATCH_SIZE, EMAIL_SEND_DEADLINE, SMTP_POOL_SIZE
+)
+from config_email import EMAIL_USER, TO_EMAILS
+from smtp_pool import smtp_pool
+from html_utils import needs_url_normalization, normalize_image_urls, image_sources, replace_image_sources
+from image_cache import image_cache, is_inline_candidate
+from async_smtp import (
+    async_smtp_client, AsyncSMTPError, AsyncSMTPAuthenticationError, AsyncSMTPConnectError, AsyncSMTPRecipientsRefused
+)
 
-def send_email(subject: str, content: str, to_emails: list = None) -> bool:
+
+# 内嵌图片附件: (Content-ID, 图片字节, MIME 子类型, 文件名)
+InlineImage = Tuple[str, bytes, str, str]
+
+
+async def _inline_images(content: str) -> Tuple[str, List[InlineImage]]:
+    """
+    把邮件中的B站图片替换为 cid: 引用，返回 (新的 HTML, 内嵌图片列表)
+
+    图片经由内容寻址缓存获取，重复发送同一封面或图片时直接复用磁盘上的字节；
+    下载失败的图片保留原地址
+    """
+    if not EMAIL_INLINE_IMAGES_ENABLED:
+        return content, []
+    urls = [url for url in image_sources(content) if is_inline_candidate(url, EMAIL_INLINE_IMAGE_HOSTS)]
+    if not urls:
+        return content, []
+
+    cached = await image_cache.get_many(urls[:EMAIL_INLINE_MAX_IMAGES])
+    # 不同地址的相同图片共用一个附件
+    unique = {image.digest: image for image in cached.values()}
+
+    def load():
+        parts = {}
+        for digest, image in unique.items():
+            try:
+                parts[digest] = (digest, image.read(), image.subtype, image.path.name)
+            except OSError:
+                pass  # 刚被淘汰，保留原地址
+        return parts
+
+    parts = await asyncio.to_thread(load)
+    mapping = {url: f"cid:{image.digest}" for url, image in cached.items() if image.digest in parts}
+    return replace_image_sources(content, mapping), list(parts.values())
+
+
+def _build_message(subject: str, content: str, to_emails: list = None, inline_images: List[InlineImage] = None):
+    """
+    构建 MIME 邮件，返回 (邮件文本, 收件人列表)；有内嵌图片时为 multipart/related
+
+    多个收件人时以密送方式发送：收件人只出现在 SMTP 信封中，To 头为 undisclosed-recipients，
+    订阅者之间互相不可见，且同一份邮件文本可用于所有分批
+    """
+    # 渲染器输出的 HTML 已补全图片地址，原样发送；
+    # 其他来源的 HTML 若仍含 // 图片地址，用流式改写补全（不构建文档树）
+    if needs_url_normalization(content):
+        logger.debug("邮件 HTML 含协议相对的图片地址，已补全为 https://")
+        content = normalize_image_urls(content)
+
+    msg = MIMEText(content, "html", "utf-8")
+    if inline_images:
+        html_part, msg = msg, MIMEMultipart("related")
+        msg.attach(html_part)
+        for cid, data, subtype, filename in inline_images:
+            image_part = MIMEImage(data, subtype)
+            image_part["Content-ID"] = f"<{cid}>"
+            image_part.add_header("Content-Disposition", "inline", filename=filename)
+            msg.attach(image_part)
+
+    msg["Subject"] = Header(subject, "utf-8")
+    msg["From"] = EMAIL_USER
+
+    # 使用指定的收件人列表，如果为None则使用默认的TO_EMAILS
+    recipients = list(to_emails if to_emails is not None else TO_EMAILS)
+    msg["To"] = recipients[0] if len(recipients) == 1 else "undisclosed-recipients:;"
+
+    return msg.as_string(), recipients
+
+
+# ======================================================================
+# 分批密送与逐收件人结果
+# ======================================================================
+class EmailDeliveryReport:
+    """
+    一封邮件的逐收件人投递结果
+
+    - delivered: 已被服务器接收
+    - failed: 临时失败（4xx、连接/认证失败），可以只对这些收件人重试
+    - rejected: 永久拒绝（5xx，如地址不存在），重试无意义
+    """
+
+    def __init__(self):
+        self.delivered: List[str] = []
+        self.failed: Dict[str, str] = {}
+        self.rejected: Dict[str, str] = {}
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed and not self.rejected
+
+    def add_batch(self, batch: List[str], refused: Dict[str, Tuple[int, object]]):
+        """记录一批的发送结果：refused 为被拒绝的收件人 -> (状态码, 消息)，其余视为已送达"""
+        for addr in batch:
+            if addr not in refused:
+                self.delivered.append(addr)
+                continue
+            code, message = refused[addr]
+            if isinstance(message, bytes):
+                message = message.decode("utf-8", "replace")
+            target = self.rejected if 500 <= code < 600 else self.failed
+            target[addr] = f"{code} {message}".strip()
+
+    def fail_batch(self, batch: List[str], error: str, code: int = 0):
+        """整批失败（无逐收件人结果时）：5xx 为永久拒绝，其余为临时失败"""
+        target = self.rejected if 500 <= code < 600 else self.failed
+        for addr in batch:
+            target[addr] = error
+
+    def merge(self, other: "EmailDeliveryReport"):
+        self.delivered.extend(other.delivered)
+        self.failed.update(other.failed)
+        self.rejected.update(other.rejected)
+
+    def summary(self) -> str:
+        return f"送达 {len(self.delivered)}, 临时失败 {len(self.failed)}, 永久拒绝 {len(self.rejected)}"
+
+
+# 收件人 -> {'delivered', 'failed', 'rejected', 'last_error'}，累计统计
+recipient_stats: Dict[str, Dict[str, object]] = {}
+
+
+def _account(subject: str, report: EmailDeliveryReport):
+    """累计逐收件人统计并记录日志"""
+    for addr in report.delivered:
+        recipient_stats.setdefault(addr, {'delivered': 0, 'failed': 0, 'rejected': 0, 'last_error': None})
+        recipient_stats[addr]['delivered'] += 1
+    for kind, failures in (('failed', report.failed), ('rejected', report.rejected)):
+        for addr, error in failures.items():
+            recipient_stats.setdefault(addr, {'delivered': 0, 'failed': 0, 'rejected': 0, 'last_error': None})
+            recipient_stats[addr][kind] += 1
+            recipient_stats[addr]['last_error'] = error
+
+    if report.ok:
+        logger.info(f"📧 邮件发送成功: {subject} ({len(report.delivered)} 位收件人)")
+        return
+    if report.rejected:
+        logger.error(f"❌ 邮件被永久拒绝的收件人: {report.rejected}")
+    if report.failed:
+        logger.warning(f"⚠️ 邮件临时失败的收件人: {list(report.failed)}")
+    logger.warning(f"⚠️ 邮件部分发送: {subject} ({report.summary()})")
+
+
+def _batches(recipients: List[str]) -> List[List[str]]:
+    size = max(1, EMAIL_BCC_BATCH_SIZE)
+    return [recipients[i:i + size] for i in range(0, len(recipients), size)]
+
+
+def _send_batch(message: str, batch: List[str], report: EmailDeliveryReport, deadline: Optional[float] = None):
+    """通过阻塞连接池发送一批；deadline（time.monotonic()）已过时不再开始发送，该批记为临时失败"""
+    if deadline is not None and time.monotonic() > deadline:
+        report.fail_batch(batch, f"发送超时（>{EMAIL_SEND_DEADLINE}秒）")
+        return
+    try:
+        report.add_batch(batch, smtp_pool.sendmail(EMAIL_USER, batch, message))
+    except smtplib.SMTPRecipientsRefused as e:
+        report.add_batch(batch, e.recipients)
+    except smtplib.SMTPAuthenticationError:
+        logger.error("❌ 邮件认证失败（账号或密码错误）")
+        report.fail_batch(batch, "认证失败")
+    except smtplib.SMTPResponseException as e:
+        report.fail_batch(batch, f"{e.smtp_code} {e.smtp_error!r}", e.smtp_code)
+    except Exception as e:
+        report.fail_batch(batch, str(e))
+
+
+async def _send_batch_async(message: str, batch: List[str], report: EmailDeliveryReport):
+    """通过原生 asyncio 客户端发送一批；连接阶段失败（必定未投递）时该批回退到阻塞连接池"""
+    try:
+        report.add_batch(batch, await async_smtp_client.sendmail(EMAIL_USER, batch, message.encode("ascii")))
+    except AsyncSMTPRecipientsRefused as e:
+        report.add_batch(batch, e.refused)
+    except AsyncSMTPAuthenticationError:
+        logger.error("❌ 邮件认证失败（账号或密码错误）")
+        report.fail_batch(batch, "认证失败")
+    except AsyncSMTPConnectError as e:
+        logger.warning(f"⚠️ 异步SMTP连接失败，回退到阻塞发送: {e}")
+        # 线程无法取消：结果先写入单独的报告，超过期限后线程里迟到的结果不会混入本次报告
+        fallback = EmailDeliveryReport()
+        await asyncio.to_thread(_send_batch, message, batch, fallback)
+        report.merge(fallback)
+    except AsyncSMTPError as e:
+        report.fail_batch(batch, f"{e.code} {e.message}", e.code)
+    except Exception as e:
+        report.fail_batch(batch, str(e))
+
+
+async def _send_batch_within(message: str, batch: List[str], report: EmailDeliveryReport, deadline: float):
+    """
+    在期限内发送一批；到期未完成（包括等待空闲连接）的批记为临时失败，已完成的批不受影响
+
+    到期时若服务器恰好已接收该批，重试会使这一批收件人重复收到，但不会波及其他批
+    """
+    try:
+        await asyncio.wait_for(_send_batch_async(message, batch, report), max(0.0, deadline - time.monotonic()))
+    except asyncio.TimeoutError:
+        report.fail_batch(batch, f"发送超时（>{EMAIL_SEND_DEADLINE}秒）")
+
+
+def send_email_report(subject: str, content: str, to_emails: list = None,
+                      inline_images: List[InlineImage] = None, deadline: Optional[float] = None) -> EmailDeliveryReport:
+    """
+    发送 HTML 邮件并返回逐收件人结果（阻塞函数，外层应通过 asyncio.to_thread 调用）
+
+    收件人按 EMAIL_BCC_BATCH_SIZE 分批密送，各批在连接池的多个连接上并行发送；
+    某个地址被拒绝或服务商限制单封收件人数时，只影响对应的收件人；
+    deadline（time.monotonic()）之后尚未开始的批记为临时失败
+    """
+    report = EmailDeliveryReport()
+    try:
+        message, recipients = _build_message(subject, content, to_emails, inline_images)
+    except Exception as e:
+        logger.error(f"❌ 邮件构建失败: {e}")
+        report.fail_batch(list(to_emails if to_emails is not None else TO_EMAILS), str(e))
+        return report
+
+    batches = _batches(recipients)
+    if len(batches) == 1:
+        _send_batch(message, batches[0], report, deadline)
+    else:
+        with ThreadPoolExecutor(max_workers=min(len(batches), SMTP_POOL_SIZE)) as executor:
+            list(executor.map(lambda batch: _send_batch(message, batch, report, deadline), batches))
+
+    _account(subject, report)
+    return report
+
+
+def send_email(subject: str, content: str, to_emails: list = None, inline_images: List[InlineImage] = None) -> bool:
     """
-    发送 HTML 邮件（阻塞函数，外层应通过 asyncio.to_thread 调用）表情和分享图片URL自动改为完整URL
+    发送 HTML 邮件（阻塞函数，外层应通过 asyncio.to_thread 调用）
+
+    内容应为渲染器输出的已补全图片地址的 HTML，未补全的 // 图片地址会被流式改写
 
     Args:
         subject:邮件主题
         content：邮件内容(HTML)
         to_emails:收件人列表，如果为None则使用默认的TO_EMAILS
+        inline_images:内嵌图片附件，由 send_email_async 准备，content 中以 cid: 引用
+
+    Returns:
+        是否所有收件人都已送达；逐收件人结果见 send_email_report
     """
+    return send_email_report(subject, content, to_emails, inline_images).ok
+
+
+async def send_email_report_async(subject: str, content: str, to_emails: list = None) -> EmailDeliveryReport:
+    """
+    发送 HTML 邮件并返回逐收件人结果（协程版本）
+
+    B站图片先经图片缓存下载并作为 CID 附件内嵌，避免收件人客户端被防盗链拦截；
+    收件人按 EMAIL_BCC_BATCH_SIZE 分批密送，各批并行发送（并发数受 SMTP 连接池大小限制）；
+    优先使用原生 asyncio SMTP 客户端，不占用默认线程池；
+    某一批连接阶段失败（邮件必定未投递）时该批回退到阻塞连接池。
 
+    图片内嵌最多 EMAIL_INLINE_TIMEOUT 秒，各批共享 EMAIL_SEND_DEADLINE 秒的发送期限；
+    总是返回逐收件人结果，超时的批记为临时失败，重试时只发给这些收件人。
+    """
+    if needs_url_normalization(content):
+        content = normalize_image_urls(content)
     try:
-        # 处理 HTML 中相对 URL（保留你的设计）
-        soup = BeautifulSoup(content, "html.parser")
-        for img in soup.find_all("img"):
-            src = img.get("src", "")
-            if src.startswith("//"):
-                img["src"] = "https:" + src
+        content, inline_images = await asyncio.wait_for(_inline_images(content), EMAIL_INLINE_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"⚠️ 邮件图片内嵌失败，使用原图片地址: {e!r}")
+        inline_images = []
 
-        content_fixed = str(soup)
+    deadline = time.monotonic() + EMAIL_SEND_DEADLINE
+    if not EMAIL_ASYNC_TRANSPORT_ENABLED:
+        return await asyncio.to_thread(send_email_report, subject, content, to_emails, inline_images, deadline)
 
-        msg = MIMEText(content_fixed, "html", "utf-8")
-        msg["Subject"] = Header(subject, "utf-8")
-        msg["From"] = EMAIL_USER
+    report = EmailDeliveryReport()
+    try:
+        if inline_images:
+            # 附件的 base64 编码较耗 CPU，放到线程中进行
+            message, recipients = await asyncio.to_thread(
+                _build_message, subject, content, to_emails, inline_images
+            )
+        else:
+            message, recipients = _build_message(subject, content, to_emails)
+    except Exception as e:
+        logger.error(f"❌ 邮件构建失败: {e}")
+        report.fail_batch(list(to_emails if to_emails is not None else TO_EMAILS), str(e))
+        return report
 
-        # 使用指定的收件人列表，如果为None则使用默认的TO_EMAILS
-        recipients = to_emails if to_emails is not None else TO_EMAILS
-        msg["To"] = ", ".join(recipients)
+    # 并发数由 async_smtp_client 的信号量限制在连接池大小以内
+    await asyncio.gather(*(_send_batch_within(message, batch, report, deadline) for batch in _batches(recipients)))
 
-        # 建立 SMTP 连接
-        with smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT, timeout=30) as server:
-            server.login(EMAIL_USER, EMAIL_PASSWORD)
-            server.sendmail(EMAIL_USER, recipients, msg.as_string())
+    _account(subject, report)
+    return report
 
-        logger.info(f"📧 邮件发送成功: {subject}")
-        return True
 
-    except smtplib.SMTPAuthenticationError:
-        logger.error("❌ 邮件认证失败（账号或密码错误）")
-        return False
-    except Exception as e:
-        logger.error(f"❌ 邮件发送失败: {e}")
-        return False
+async def send_email_async(subject: str, content: str, to_emails: list = None) -> bool:
+    """
+    发送 HTML 邮件（协程版本，参数与 send_email 一致）
+
+    Returns:
+        是否所有收件人都已送达；需要逐收件人结果（如只重试失败的收件人）时使用 send_email_report_async
+    """
+    report = await send_email_report_async(subject, content, to_emails)
+    return report.ok
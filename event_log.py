@@ -0,0 +1,168 @@
+# event_log.py
+"""
+结构化事件日志（JSONL）
+
+每行一个紧凑的 JSON 对象，字段固定，便于脚本统计（不再需要用正则解析中文日志）：
+    {"ts":1760000000.123,"v":1,"type":"cycle","cycle":42,"success":true,"duration":8.21}
+
+事件经 logging 队列由后台线程写入 logs/events.jsonl，按大小轮转（见 logger_config.setup_logging）。
+
+查询（流式读取，按需过滤和聚合）：
+    python event_log.py --type cycle --since 7d --field duration
+    python event_log.py --type cycle --since 2026-10-13 --until 2026-10-14 --field duration --group-by success
+    python event_log.py --type notification --since 24h --group-by channel,ok
+    python event_log.py --type stage --since 1h --field duration --group-by stage
+"""
+import argparse
+import json
+import logging
+import math
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from config import EVENT_LOG_ENABLED, EVENT_LOG_STAGES, EVENT_LOG_FILE, EVENT_LOG_BACKUP_COUNT
+
+SCHEMA_VERSION = 1  # 字段含义变化时递增；新增字段不改版本
+
+EVENTS_LOGGER_NAME = 'BiliMonitor.events'
+
+# 事件类型及其字段
+EVENT_CYCLE = "cycle"  # cycle, success, duration
+EVENT_STAGE = "stage"  # stage, duration（tracing 中的分阶段耗时）
+EVENT_CHANGE = "change"  # source(dynamic), target, first（首次记录，无上次内容）
+EVENT_NOTIFICATION = "notification"  # event, channel, ok（是否已入队）, render_ms；渲染失败时为 error
+EVENT_BROWSER_RECYCLE = "browser_recycle"  # reason(interval/memory/renderers/health), cycle
+EVENT_LIVE_CHECK = "live_check"  # room_id, success, duration
+EVENT_LIVE_TRANSITION = "live_transition"  # room_id, change(live_start/live_end/title_change), live_status
+
+_events_logger = logging.getLogger(EVENTS_LOGGER_NAME)
+
+
+def emit(event_type: str, **fields):
+    """记录一个事件（只入队，不阻塞）；fields 中的值需可 JSON 序列化"""
+    if EVENT_LOG_ENABLED:
+        _events_logger.info(event_type, extra={'event': fields})
+
+
+def emit_stage(stage: str, duration: float):
+    if EVENT_LOG_STAGES:
+        emit(EVENT_STAGE, stage=stage, duration=round(duration, 4))
+
+
+class JsonLineFormatter(logging.Formatter):
+    """把事件记录格式化为一行紧凑 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        event = {'ts': round(record.created, 3), 'v': SCHEMA_VERSION, 'type': record.getMessage()}
+        event.update(getattr(record, 'event', None) or {})
+        return json.dumps(event, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+# ----------------------------------------------------------------------
+# 查询
+# ----------------------------------------------------------------------
+def event_files(path: Path = EVENT_LOG_FILE) -> List[Path]:
+    """当前文件及轮转后的备份，按时间从旧到新排列"""
+    backups = [path.with_name(f"{path.name}.{i}") for i in range(EVENT_LOG_BACKUP_COUNT, 0, -1)]
+    return [p for p in backups + [path] if p.exists()]
+
+
+def read_events(files: List[Path], event_type: Optional[str] = None, since: float = 0.0,
+                until: float = math.inf, where: Optional[Dict[str, str]] = None) -> Iterator[dict]:
+    """逐行流式读取并过滤事件；损坏的行（如异常退出时写了一半）直接跳过"""
+    type_marker = f'"type":"{event_type}"' if event_type else None
+    for path in files:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if type_marker and type_marker not in line:
+                    continue
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if not since <= event.get('ts', 0) < until:
+                    continue
+                if where and any(str(event.get(key)).lower() != value.lower() for key, value in where.items()):
+                    continue
+                yield event
+
+
+class _Aggregate:
+    __slots__ = ('count', 'values')
+
+    def __init__(self):
+        self.count = 0
+        self.values: List[float] = []
+
+    def percentile(self, p: float) -> float:
+        values = self.values
+        return values[min(len(values) - 1, int(len(values) * p / 100))] if values else 0.0
+
+
+def aggregate(events: Iterator[dict], field: Optional[str] = None, group_by: tuple = ()) -> Dict[tuple, _Aggregate]:
+    groups: Dict[tuple, _Aggregate] = {}
+    for event in events:
+        key = tuple(event.get(name) for name in group_by)
+        agg = groups.get(key)
+        if agg is None:
+            agg = groups[key] = _Aggregate()
+        agg.count += 1
+        if field is not None:
+            value = event.get(field)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                agg.values.append(float(value))
+    for agg in groups.values():
+        agg.values.sort()
+    return groups
+
+
+def _parse_time(text: Optional[str], default: float) -> float:
+    """支持相对时间（30m / 24h / 7d）和日期（2026-10-13 或 2026-10-13T08:00）"""
+    if not text:
+        return default
+    units = {'m': 60, 'h': 3600, 'd': 86400}
+    if text[-1] in units and text[:-1].replace(".", "", 1).isdigit():
+        return time.time() - float(text[:-1]) * units[text[-1]]
+    return datetime.fromisoformat(text).timestamp()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="查询结构化事件日志（logs/events.jsonl）")
+    parser.add_argument("--file", type=Path, default=EVENT_LOG_FILE, help="事件日志路径（自动包含轮转备份）")
+    parser.add_argument("--type", help="事件类型，如 cycle / stage / notification / live_check")
+    parser.add_argument("--since", help="开始时间：30m / 24h / 7d 或 2026-10-13[T08:00]")
+    parser.add_argument("--until", help="结束时间，格式同 --since")
+    parser.add_argument("--where", action="append", default=[], metavar="KEY=VALUE", help="字段过滤，可重复")
+    parser.add_argument("--group-by", default="", help="分组字段，逗号分隔")
+    parser.add_argument("--field", help="统计该数值字段的 平均/P50/P95/P99/最大值")
+    args = parser.parse_args(argv)
+
+    where = dict(item.split("=", 1) for item in args.where)
+    group_by = tuple(name for name in args.group_by.split(",") if name)
+    events = read_events(event_files(args.file), args.type, _parse_time(args.since, 0.0),
+                         _parse_time(args.until, math.inf), where)
+    groups = aggregate(events, args.field, group_by)
+    if not groups:
+        print("没有匹配的事件")
+        return 1
+
+    header = list(group_by) + ["count"]
+    if args.field:
+        header += ["mean", "p50", "p95", "p99", "max"]
+    print("\t".join(header))
+    for key, agg in sorted(groups.items(), key=lambda item: item[1].count, reverse=True):
+        row = [str(value) for value in key] + [str(agg.count)]
+        if args.field:
+            values = agg.values
+            mean = sum(values) / len(values) if values else 0.0
+            row += [f"{mean:.3f}", f"{agg.percentile(50):.3f}", f"{agg.percentile(95):.3f}",
+                    f"{agg.percentile(99):.3f}", f"{values[-1] if values else 0.0:.3f}"]
+        print("\t".join(row))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,19 @@
 # health_check.py
 import asyncio
-import psutil
 import time
 from datetime import datetime
 from logger_config import logger
-from config import MEMORY_THRESHOLD_MB, TASK_TIMEOUT
-from retry_decorator import NETWORK_RETRY_CONFIG, async_retry
+from config import (
+    MEMORY_THRESHOLD_MB, HEALTH_PROBE_TTL, HEALTH_PROBE_BUDGETS, HEALTH_PROBE_FETCH_URL, HEALTH_PROBE_PAGE_URL
+)
+from process_tree import process_tree
+from tracing import span
+
+# 浏览器健康探测的级别，开销逐级增加
+PROBE_JS = "js"
+PROBE_FETCH = "fetch"
+PROBE_NAVIGATE = "navigate"
+PROBE_TIERS = (PROBE_JS, PROBE_FETCH, PROBE_NAVIGATE)
 
 
 class HealthChecker:
@@ -25,46 +33,118 @@ class HealthChecker:
         self.success_count = 0
         self.failure_count = 0
         self.last_health_check = time.time()  # 初始化时间戳
+        self.last_scrape_ok = True  # 最近一次动态抓取是否成功，失败时健康探测升级到完整加载页面
+        # 最近一次通过的浏览器探测：(时间, 达到的级别)
+        self._probe_cache = None
+        self.probe_stats = {tier: {'runs': 0, 'failures': 0, 'total_time': 0.0} for tier in PROBE_TIERS}
+        self.probe_stats['cached'] = 0
 
     async def check_memory_usage(self):
-        """检查内存使用情况"""
-        process = psutil.Process()
-        memory_mb = process.memory_info().rss / 1024 / 1024
+        """检查内存使用情况（Python 进程及 Chromium 子进程合计）"""
+        sample = await process_tree.sample_async()
+        memory_mb = sample.memory_mb
 
         if memory_mb > MEMORY_THRESHOLD_MB:
-            logger.warning(f"⚠️ 内存使用较高: {memory_mb:.2f} MB (阈值: {MEMORY_THRESHOLD_MB} MB)")
+            logger.warning(f"⚠️ 内存使用较高: {memory_mb:.2f} MB (阈值: {MEMORY_THRESHOLD_MB} MB) - {sample.summary()}")
             return False
         return True
 
-    async def check_browser_health(self, page):
-        """检查浏览器健康状态"""
-        try:
-            # 更新检查时间戳
-            self.last_health_check = time.time()
+    async def check_browser_health(self, browser, context, escalate=None):
+        """
+        分级检查浏览器健康状态
 
-            # 设置页面超时
-            page.set_default_timeout(15000)
+        1. js: 浏览器已连接，且能在空白页中执行 JS（不产生网络请求）
+        2. fetch: 通过浏览器上下文请求一个很小的 B 站接口（与页面共用 Cookie 和代理）
+        3. navigate: 完整加载 B 站首页，只在 fetch 失败或 escalate 时执行，用于确认是否需要重启浏览器
 
-            # 测试访问B站首页
-            await asyncio.wait_for(
-                page.goto("https://www.bilibili.com", wait_until="networkidle"),
-                timeout=TASK_TIMEOUT
-            )
-
-            # 检查页面标题
-            title = await page.title()
-            if "bilibili" not in title.lower():
-                raise Exception("页面标题异常")
+        每级有独立的耗时上限；通过的结果缓存 HEALTH_PROBE_TTL 秒。
+        escalate 默认取决于最近一次动态抓取是否失败。
+        """
+        self.last_health_check = time.time()
+        if escalate is None:
+            escalate = not self.last_scrape_ok
+
+        cached = self._probe_cache
+        if cached is not None and time.time() - cached[0] < HEALTH_PROBE_TTL and (
+                not escalate or cached[1] == PROBE_NAVIGATE):
+            self.probe_stats['cached'] += 1
+            logger.debug(f"✅ 浏览器健康检查通过（{cached[1]}，缓存）")
+            return True
 
-            logger.debug("✅ 浏览器健康检查通过")
+        if not await self._probe(PROBE_JS, self._probe_js(browser, context)):
+            return False
+        fetch_ok = await self._probe(PROBE_FETCH, self._probe_fetch(context))
+        if fetch_ok and not escalate:
+            self._probe_cache = (time.time(), PROBE_FETCH)
             return True
 
-        except asyncio.TimeoutError:
-            logger.error("❌ 浏览器健康检查超时")
+        if not await self._probe(PROBE_NAVIGATE, self._probe_navigate(context)):
             return False
+        if not fetch_ok:
+            logger.warning("⚠️ 接口探测失败但页面可以正常加载，浏览器无需重启")
+        self._probe_cache = (time.time(), PROBE_NAVIGATE)
+        return True
+
+    async def _probe(self, tier, probe):
+        """在该级的耗时上限内执行一次探测，返回是否通过"""
+        budget = HEALTH_PROBE_BUDGETS[tier]
+        stats = self.probe_stats[tier]
+        stats['runs'] += 1
+        start = time.perf_counter()
+        try:
+            with span(f"health.{tier}"):
+                await asyncio.wait_for(probe, timeout=budget)
+            logger.debug(f"✅ 浏览器探测通过: {tier} ({time.perf_counter() - start:.2f}s)")
+            return True
+        except asyncio.TimeoutError:
+            logger.error(f"❌ 浏览器探测超时: {tier} (超过 {budget}s)")
         except Exception as e:
-            logger.error(f"❌ 浏览器健康检查失败: {e}")
-            return False
+            logger.error(f"❌ 浏览器探测失败: {tier} - {e}")
+        finally:
+            stats['total_time'] += time.perf_counter() - start
+        stats['failures'] += 1
+        self._probe_cache = None
+        return False
+
+    @staticmethod
+    async def _close_page(page):
+        try:
+            await asyncio.wait_for(page.close(), timeout=5)
+        except Exception as e:
+            logger.debug(f"关闭探测页面失败: {e}")
+
+    async def _probe_js(self, browser, context):
+        if not browser.is_connected():
+            raise Exception("浏览器已断开连接")
+        page = await context.new_page()
+        try:
+            if await page.evaluate("() => 1 + 1") != 2:
+                raise Exception("JS 执行结果异常")
+        finally:
+            await self._close_page(page)
+
+    @staticmethod
+    async def _probe_fetch(context):
+        response = await context.request.get(
+            HEALTH_PROBE_FETCH_URL, timeout=HEALTH_PROBE_BUDGETS[PROBE_FETCH] * 1000
+        )
+        try:
+            if not response.ok:
+                raise Exception(f"HTTP {response.status}")
+            await response.json()
+        finally:
+            await response.dispose()
+
+    async def _probe_navigate(self, context):
+        page = await context.new_page()
+        try:
+            await page.goto(HEALTH_PROBE_PAGE_URL, wait_until="domcontentloaded",
+                            timeout=HEALTH_PROBE_BUDGETS[PROBE_NAVIGATE] * 1000)
+            title = await page.title()
+            if "bilibili" not in title.lower():
+                raise Exception("页面标题异常")
+        finally:
+            await self._close_page(page)
 
     async def check_network_connectivity(self):
         """检查网络连通性"""
@@ -78,15 +158,14 @@ class HealthChecker:
             logger.error(f"❌ 网络连通性检查失败: {e}")
             return False
 
-    @async_retry(NETWORK_RETRY_CONFIG)
-    async def comprehensive_check(self, page):
-        """综合健康检查"""
+    async def comprehensive_check(self, browser, context):
+        """综合健康检查（各级浏览器探测自带耗时上限，不再整体重试）"""
         # 更新检查时间戳
         self.last_health_check = time.time()
 
         checks = [
             self.check_memory_usage(),
-            self.check_browser_health(page),
+            self.check_browser_health(browser, context),
             self.check_network_connectivity()
         ]
 
@@ -112,10 +191,25 @@ class HealthChecker:
     def increment_success(self):
         """增加成功计数"""
         self.success_count += 1
+        self.last_scrape_ok = True
 
     def increment_failure(self):
         """增加失败计数"""
         self.failure_count += 1
+        self.last_scrape_ok = False
+
+    def get_probe_stats(self):
+        """各级浏览器探测的次数、失败次数和平均耗时"""
+        stats = {'cached': self.probe_stats['cached']}
+        for tier in PROBE_TIERS:
+            tier_stats = self.probe_stats[tier]
+            runs = tier_stats['runs']
+            stats[tier] = {
+                'runs': runs,
+                'failures': tier_stats['failures'],
+                'avg_time': f"{tier_stats['total_time'] / runs:.2f}s" if runs else "0.00s",
+            }
+        return stats
 
     def get_stats(self, total_loops=None):
         """获取统计信息"""
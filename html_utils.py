@@ -0,0 +1,39 @@
+# html_utils.py
+import re
+from typing import Dict, List
+
+# <img ... src="//..."> 中的协议相对地址（src 前须为空白，不会误匹配 data-src）
+_PROTOCOL_RELATIVE_IMG = re.compile(r"""(<img\b[^>]*?\ssrc\s*=\s*["']?)//""", re.IGNORECASE)
+# 任意属性值以 // 开头；模式简单、扫描快，用作预检（已补全的 HTML 通常在这一步就能排除）
+_PROTOCOL_RELATIVE_ATTR = re.compile(r"""=\s*["']?//""")
+# <img ... src="http(s)://..."> 中带引号的完整图片地址
+_IMAGE_SRC = re.compile(r"""(<img\b[^>]*?\ssrc\s*=\s*)(["'])(https?://[^"'<>]+)\2""", re.IGNORECASE)
+
+
+def normalize_url(url: str) -> str:
+    """补全协议相对地址（B站图片常以 // 开头，邮件客户端无法解析）"""
+    return "https:" + url if url.startswith("//") else url
+
+
+def needs_url_normalization(html: str) -> bool:
+    """轻量校验：HTML 中是否还有协议相对的图片地址（一次正则扫描，不构建文档树）"""
+    return _PROTOCOL_RELATIVE_ATTR.search(html) is not None and _PROTOCOL_RELATIVE_IMG.search(html) is not None
+
+
+def normalize_image_urls(html: str) -> str:
+    """流式改写：把 <img src="//..."> 补全为 https://，其余内容原样保留"""
+    return _PROTOCOL_RELATIVE_IMG.sub(r"\1https://", html)
+
+
+def image_sources(html: str) -> List[str]:
+    """按出现顺序返回 HTML 中所有 <img> 的 http(s) 地址（去重）"""
+    return list(dict.fromkeys(match.group(3) for match in _IMAGE_SRC.finditer(html)))
+
+
+def replace_image_sources(html: str, mapping: Dict[str, str]) -> str:
+    """把 <img> 的地址按映射替换（如替换为 cid: 引用），不在映射中的保持不变"""
+    if not mapping:
+        return html
+    return _IMAGE_SRC.sub(
+        lambda m: f"{m.group(1)}{m.group(2)}{mapping.get(m.group(3), m.group(3))}{m.group(2)}", html
+    )
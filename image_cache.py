@@ -0,0 +1,346 @@
+# image_cache.py
+import asyncio
+import hashlib
+import io
+import json
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from logger_config import logger
+from config import (
+    IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_MB, IMAGE_MAX_DOWNLOAD_MB, IMAGE_MAX_WIDTH,
+    IMAGE_FETCH_TIMEOUT, IMAGE_FETCH_CONCURRENCY, IMAGE_FAILURE_TTL, IMAGE_CACHE_FLUSH_DELAY
+)
+from task_supervisor import task_supervisor
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow 为可选依赖，未安装时按原图缓存
+    Image = None
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/122.0.0.0 Safari/537.36"
+)
+_INDEX_FILE = "index.json"
+
+# 文件头 -> (MIME 子类型, 扩展名)
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpeg", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png", "png"),
+    (b"GIF87a", "gif", "gif"),
+    (b"GIF89a", "gif", "gif"),
+)
+
+
+def _sniff(data: bytes):
+    """根据文件头识别图片格式，返回 (MIME 子类型, 扩展名)；无法识别时返回 None"""
+    for magic, subtype, ext in _SIGNATURES:
+        if data.startswith(magic):
+            return subtype, ext
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp", "webp"
+    return None
+
+
+class CachedImage:
+    __slots__ = ('digest', 'path', 'subtype', 'size')
+
+    def __init__(self, digest: str, path: Path, subtype: str, size: int):
+        self.digest = digest  # 内容的 sha256，同时用作 Content-ID
+        self.path = path
+        self.subtype = subtype  # image/<subtype>
+        self.size = size
+
+    def read(self) -> bytes:
+        return self.path.read_bytes()
+
+
+class ImageCache:
+    """
+    内容寻址的图片磁盘缓存
+
+    - 文件以处理后内容的 sha256 命名，不同地址的相同图片只存一份
+    - 地址 -> 摘要的索引持久化在 index.json 中，重复发送同一封面或图片时直接复用磁盘上的字节
+    - 按总大小限制的 LRU：命中时刷新文件修改时间，超限时淘汰最久未使用的文件
+    - 安装了 Pillow 时，宽度超过 max_width 的图片缩放到该宽度（邮件默认为邮件宽度），WebP 转为邮件客户端普遍支持的格式
+    - 同一地址的并发请求只下载一次；下载失败的地址在 IMAGE_FAILURE_TTL 内直接返回失败，不再重复等待超时
+    - 事件循环中只修改内存中的索引；index.json、修改时间和淘汰文件的删除延迟 IMAGE_CACHE_FLUSH_DELAY 秒
+      后在线程中批量写盘，close() 时写出剩余部分
+    """
+
+    def __init__(self, cache_dir=IMAGE_CACHE_DIR, max_bytes: int = IMAGE_CACHE_MAX_MB * 1024 * 1024,
+                 max_width: int = IMAGE_MAX_WIDTH, quality: int = 85):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_width = max_width
+        self.quality = quality  # 重新编码为 JPEG 时的质量
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._semaphore = asyncio.Semaphore(IMAGE_FETCH_CONCURRENCY)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._failed: Dict[str, float] = {}  # 地址 -> 下载失败时间，TTL 内不再重试
+
+        # 统计信息
+        self.stats = {'hits': 0, 'misses': 0, 'downloads': 0, 'failures': 0, 'resized': 0, 'evictions': 0}
+
+        # 文件名 -> 大小，按最近使用排序（最久未使用的在前）
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._urls: Dict[str, str] = {}  # 地址 -> 文件名
+
+        # 尚未写盘的变更
+        self._index_dirty = False
+        self._touched: Set[str] = set()  # 待刷新修改时间的文件
+        self._evicted: Set[str] = set()  # 待删除的文件
+        self._flush_task: Optional[asyncio.Task] = None
+        self._disk_lock = asyncio.Lock()  # 批量写盘与新文件写入互斥，避免删除刚写入的同名文件
+        self._load()
+
+    # ------------------------------------------------------------------
+    # 磁盘索引
+    # ------------------------------------------------------------------
+    def _load(self):
+        exts = {ext for _, _, ext in _SIGNATURES} | {"webp"}
+        files = [p for p in self.cache_dir.iterdir() if p.is_file() and p.suffix[1:] in exts]
+        for path in sorted(files, key=lambda p: p.stat().st_mtime):
+            size = path.stat().st_size
+            self._entries[path.name] = size
+            self._total_bytes += size
+
+        try:
+            urls = json.loads((self.cache_dir / _INDEX_FILE).read_text(encoding="utf-8"))
+            self._urls = {url: name for url, name in urls.items() if name in self._entries}
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ 图片缓存索引损坏，已忽略: {e}")
+        self._evict()
+        # 启动时（事件循环之外）直接写盘
+        self._write_disk(*self._take_pending())
+
+    def _take_pending(self):
+        """取出尚未写盘的变更：(索引快照或 None, 待刷新修改时间的文件, 待删除的文件)"""
+        index = dict(self._urls) if self._index_dirty else None
+        touched = [name for name in self._touched if name in self._entries]
+        evicted = [name for name in self._evicted if name not in self._entries]
+        self._index_dirty = False
+        self._touched = set()
+        self._evicted = set()
+        return index, touched, evicted
+
+    def _write_disk(self, index: Optional[Dict[str, str]], touched: List[str], evicted: List[str]):
+        """阻塞的磁盘写入（在线程中执行）"""
+        for name in evicted:
+            try:
+                (self.cache_dir / name).unlink()
+            except OSError:
+                pass
+        for name in touched:
+            try:
+                os.utime(self.cache_dir / name)
+            except OSError:
+                pass
+        if index is not None:
+            tmp = self.cache_dir / (_INDEX_FILE + ".tmp")
+            tmp.write_text(json.dumps(index, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, self.cache_dir / _INDEX_FILE)
+
+    def _schedule_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = task_supervisor.spawn(self._flush_later(), "image_cache.flush")
+
+    async def _flush_later(self):
+        await asyncio.sleep(IMAGE_CACHE_FLUSH_DELAY)
+        await self.flush()
+
+    async def flush(self):
+        """把尚未写盘的索引、修改时间和淘汰在线程中写入磁盘"""
+        async with self._disk_lock:
+            index, touched, evicted = self._take_pending()
+            if index is None and not touched and not evicted:
+                return
+            try:
+                await asyncio.to_thread(self._write_disk, index, touched, evicted)
+            except Exception as e:
+                logger.warning(f"⚠️ 图片缓存索引写入失败: {e}")
+
+    def _entry(self, name: str) -> CachedImage:
+        digest, ext = name.rsplit(".", 1)
+        return CachedImage(digest, self.cache_dir / name, "jpeg" if ext == "jpg" else ext, self._entries[name])
+
+    def _touch(self, name: str):
+        self._entries.move_to_end(name)
+        self._touched.add(name)
+
+    def _store(self, url: str, name: str, size: int) -> str:
+        """登记已写入磁盘的文件（在事件循环中调用，索引只在事件循环中修改）"""
+        if name not in self._entries:
+            self._entries[name] = size
+            self._total_bytes += size
+        self._touch(name)
+        self._urls[url] = name
+        self._index_dirty = True
+        self._evict(keep=name)
+        self._schedule_flush()
+        return name
+
+    def _evict(self, keep: Optional[str] = None):
+        """淘汰最久未使用的文件，直到总大小不超过上限"""
+        evicted = set()
+        while self._total_bytes > self.max_bytes and self._entries:
+            name, size = next(iter(self._entries.items()))
+            if name == keep:
+                break
+            del self._entries[name]
+            self._total_bytes -= size
+            evicted.add(name)
+        if evicted:
+            self.stats['evictions'] += len(evicted)
+            self._urls = {url: name for url, name in self._urls.items() if name not in evicted}
+            self._evicted |= evicted
+            self._index_dirty = True
+
+    # ------------------------------------------------------------------
+    # 下载与处理
+    # ------------------------------------------------------------------
+    async def get(self, url: str) -> Optional[CachedImage]:
+        """返回地址对应的缓存图片，未缓存时下载并处理；失败返回 None"""
+        name = self._urls.get(url)
+        if name in self._entries:
+            self.stats['hits'] += 1
+            self._touch(name)
+            self._schedule_flush()
+            return self._entry(name)
+
+        failed_at = self._failed.get(url)
+        if failed_at is not None:
+            if time.monotonic() - failed_at < IMAGE_FAILURE_TTL:
+                return None
+            del self._failed[url]
+
+        self.stats['misses'] += 1
+        future = self._inflight.get(url)
+        if future is None:
+            future = task_supervisor.spawn(self._fetch(url), "image_cache.fetch")
+            self._inflight[url] = future
+            future.add_done_callback(lambda _: self._inflight.pop(url, None))
+        name = await asyncio.shield(future)
+        if name is None:
+            now = time.monotonic()
+            self._failed = {u: t for u, t in self._failed.items() if now - t < IMAGE_FAILURE_TTL}
+            self._failed[url] = now
+        return self._entry(name) if name in self._entries else None
+
+    async def _fetch(self, url: str) -> Optional[str]:
+        async with self._semaphore:
+            try:
+                data = await self._download(url)
+            except Exception as e:
+                self.stats['failures'] += 1
+                logger.warning(f"⚠️ 图片下载失败 {url}: {e}")
+                return None
+
+        self.stats['downloads'] += 1
+        data, ext, resized = await asyncio.to_thread(self._process, data)
+        if resized:
+            self.stats['resized'] += 1
+        if ext is None:
+            self.stats['failures'] += 1
+            logger.warning(f"⚠️ 无法识别的图片格式，已跳过: {url}")
+            return None
+        name = f"{hashlib.sha256(data).hexdigest()}.{ext}"
+        async with self._disk_lock:
+            if name not in self._entries:
+                await asyncio.to_thread((self.cache_dir / name).write_bytes, data)
+            return self._store(url, name, len(data))
+
+    async def _download(self, url: str) -> bytes:
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(headers={
+                "User-Agent": USER_AGENT,
+                "Referer": "https://www.bilibili.com/",  # B站图床的防盗链校验 Referer
+            })
+
+        limit = IMAGE_MAX_DOWNLOAD_MB * 1024 * 1024
+        async with self.session.get(url, timeout=aiohttp.ClientTimeout(total=IMAGE_FETCH_TIMEOUT)) as response:
+            response.raise_for_status()
+            if response.content_length and response.content_length > limit:
+                raise ValueError(f"图片过大 ({response.content_length} 字节)")
+            data = await response.content.read(limit + 1)
+            if len(data) > limit:
+                raise ValueError("图片过大")
+            return data
+
+    def _process(self, data: bytes):
+        """
+        缩放到邮件宽度并统一格式，返回 (字节, 扩展名, 是否缩放)；格式无法识别时扩展名为 None
+
+        在线程中执行，不修改统计等共享状态
+        """
+        kind = _sniff(data)
+        if Image is None:
+            return data, kind[1] if kind else None, False
+
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                if getattr(img, "is_animated", False):
+                    return data, kind[1] if kind else None, False  # 动图保持原样
+                too_wide = img.width > self.max_width
+                if not too_wide and kind and kind[0] != "webp":
+                    return data, kind[1], False
+
+                if img.mode == "P":
+                    img = img.convert("RGBA")  # 调色板图片先转 RGBA，缩放时才能使用高质量滤波
+                if too_wide:
+                    img = img.resize((self.max_width, max(1, round(img.height * self.max_width / img.width))),
+                                     Image.LANCZOS)
+
+                out = io.BytesIO()
+                if img.mode in ("RGBA", "LA"):
+                    img.save(out, "PNG", optimize=True)
+                    return out.getvalue(), "png", too_wide
+                img.convert("RGB").save(out, "JPEG", quality=self.quality, optimize=True)
+                return out.getvalue(), "jpg", too_wide
+        except Exception as e:
+            logger.debug(f"图片处理失败，按原图缓存: {e}")
+            return data, kind[1] if kind else None, False
+
+    async def get_many(self, urls: List[str]) -> Dict[str, CachedImage]:
+        """并发获取多张图片，返回成功缓存的 地址 -> 图片"""
+        results = await asyncio.gather(*(self.get(url) for url in urls), return_exceptions=True)
+        return {url: image for url, image in zip(urls, results) if isinstance(image, CachedImage)}
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            'files': len(self._entries),
+            'size_mb': round(self._total_bytes / 1024 / 1024, 2),
+            'pillow': Image is not None,
+        }
+
+    async def close(self):
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        await self.flush()
+        if self.session and not self.session.closed:
+            await self.session.close()
+
+
+def is_inline_candidate(url: str, hosts) -> bool:
+    """是否为需要内嵌的图片地址（指定域名或其子域名下的 http(s) 地址）"""
+    parts = urlsplit(url)
+    host = parts.hostname or ""
+    return parts.scheme in ("http", "https") and any(host == h or host.endswith("." + h) for h in hosts)
+
+
+# 全局实例
+image_cache = ImageCache()
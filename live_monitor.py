@@ -5,9 +5,12 @@ import json
 from datetime import datetime
 from typing import Optional, Dict, Any
 from logger_config import logger
+from email_templates import render_live_email
 from self_monitor import live_failure_counter
 from retry_decorator import NETWORK_RETRY_CONFIG, async_retry
 from config import LIVE_API_TIMEOUT, LIVE_ROOM_ID, COOKIE_FILE, UP_NAME
+from tracing import traced
+from event_log import emit, EVENT_LIVE_TRANSITION
 '''
 | 场景     | status_changed | change_type  | should_notify | 是否发通知 |
 | ------ | -------------- | ------------ | ------------- | ----- |
@@ -25,6 +28,15 @@ USER_AGENT = (
     "Chrome/122.0.0.0 Safari/537.36"
 )
 
+
+def _previous_title(live_info: Dict[str, Any]) -> str:
+    """标题变化时返回原标题，其余情况返回空字符串"""
+    if live_info.get("change_type") != "title_change":
+        return ""
+    previous = live_info.get("previous_title") or ""
+    return previous if previous != live_info.get("title") else ""
+
+
 class LiveMonitor:
     """B站直播间状态监控器（展示封面，但不监测封面变化）"""
 
@@ -68,6 +80,7 @@ class LiveMonitor:
     # ------------------------------------------------------------------
     # API
     # ------------------------------------------------------------------
+    @traced("live.fetch")
     @async_retry(NETWORK_RETRY_CONFIG)
     async def fetch_live_status(self, room_id: int) -> Optional[Dict[str, Any]]:
         await self.init_session()
@@ -95,6 +108,7 @@ class LiveMonitor:
                         "live_status": data.get("live_status", 0),
                         "title": data.get("title", ""),
                         "cover": data.get("user_cover") or data.get("cover", ""),
+                        "live_time": str(data.get("live_time") or data.get("live_start_time") or ""),
                         "anchor_name": UP_NAME,
                         "check_time": datetime.now().isoformat(),
                     }
@@ -116,6 +130,12 @@ class LiveMonitor:
         live_failure_counter.record_success()
 
         changed, change_type = self.detect_status_change(current)
+        if changed:
+            emit(EVENT_LIVE_TRANSITION, room_id=room_id, change=change_type, live_status=current["live_status"])
+        # 变化前的状态，供合并通知展示“首→尾”
+        if self.last_live_status is not None:
+            current["previous_live_status"] = self.last_live_status["live_status"]
+            current["previous_title"] = self.last_live_status.get("title")
         current["status_changed"] = changed
         current["change_type"] = change_type
         current["should_notify"] = (
@@ -147,6 +167,7 @@ class LiveMonitor:
         title = live_info.get("title", "无标题")
         cover = live_info.get("cover")
         room_id = live_info["room_id"]
+        previous_title = _previous_title(live_info)
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
         icon, text = {
@@ -156,54 +177,7 @@ class LiveMonitor:
         }.get(ct, ("📺", "状态更新"))
 
         subject = f"【{UP_NAME}直播监控】{text}"
-
-        html = f"""
-<!DOCTYPE html>
-<html>
-<head>
-<meta charset="UTF-8">
-<style>
-body {{ background:#f5f5f5; font-family:Microsoft YaHei; padding:20px }}
-.container {{ max-width:600px;margin:auto;background:#fff;border-radius:10px;overflow:hidden }}
-.header {{ background:linear-gradient(135deg,#ff6699,#ff3366);color:#fff;padding:20px;text-align:center }}
-.cover img {{ width:100%;display:block }}
-.content {{ padding:24px }}
-.status {{ text-align:center;font-size:20px;color:#ff3366;font-weight:bold }}
-.info {{ background:#f9f9f9;padding:15px;border-radius:8px;margin-top:15px }}
-.btn {{ display:inline-block;margin-top:20px;background:#ff3366;color:#fff;
-       padding:10px 20px;border-radius:5px;text-decoration:none }}
-.footer {{ text-align:center;font-size:12px;color:#999;padding:20px }}
-</style>
-</head>
-<body>
-<div class="container">
-  <div class="header">
-    <h2>{icon} {UP_NAME} 直播提醒</h2>
-  </div>
-
-  {"<div class='cover'><img src='" + cover + "'></div>" if cover else ""}
-
-  <div class="content">
-    <div class="status">{text}</div>
-    <div class="info">
-      <p><b>标题：</b>{title}</p>
-      <p><b>时间：</b>{current_time}</p>
-    </div>
-    <div style="text-align:center">
-      <a class="btn" href="https://live.bilibili.com/{room_id}">
-        进入直播间
-      </a>
-    </div>
-  </div>
-
-  <div class="footer">
-    <p>此邮件由直播监控系统自动发送，请勿回复</p>
-    <p>监控时间：{current_time}</p>
-  </div>
-</div>
-</body>
-</html>
-"""
+        html = render_live_email(UP_NAME, icon, text, title, previous_title, cover, room_id, current_time)
         return subject, html
 
     # ------------------------------------------------------------------
@@ -214,6 +188,7 @@ body {{ background:#f5f5f5; font-family:Microsoft YaHei; padding:20px }}
         title = live_info.get("title", "无标题")
         cover = live_info.get("cover", "")
         room_id = live_info["room_id"]
+        previous_title = _previous_title(live_info)
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
         prefix = {
@@ -224,6 +199,8 @@ body {{ background:#f5f5f5; font-family:Microsoft YaHei; padding:20px }}
 
         qq_msg = f"【{UP_NAME}直播监控】{prefix}\n"
         qq_msg += f"标题：{title}\n"
+        if previous_title:
+            qq_msg += f"原标题：{previous_title}\n"
         qq_msg += f"链接：https://live.bilibili.com/{room_id}\n"
         qq_msg += f"时间：{current_time}\n"
 
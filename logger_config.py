@@ -1,11 +1,14 @@
+import atexit
 import logging
+import queue
 import sys
-from logging.handlers import RotatingFileHandler, TimedRotatingFileHandler
+from logging.handlers import RotatingFileHandler, TimedRotatingFileHandler, QueueHandler, QueueListener
 import time
 import glob
 import os
 from datetime import datetime, timedelta
-from config import LOG_DIR, MAX_LOG_SIZE_MB, LOG_BACKUP_COUNT
+from config import LOG_DIR, MAX_LOG_SIZE_MB, LOG_BACKUP_COUNT, EVENT_LOG_FILE, EVENT_LOG_MAX_MB, EVENT_LOG_BACKUP_COUNT
+from event_log import EVENTS_LOGGER_NAME, JsonLineFormatter
 
 
 def cleanup_old_logs():
@@ -21,7 +24,8 @@ def cleanup_old_logs():
             "err__*",  # 匹配 err__2025-12-15 23:12:49
             "combined.log",  # 基础文件
             "out.log",  # 基础文件
-            "err.log"  # 基础文件
+            "err.log",  # 基础文件
+            "profile-*"  # 按需性能分析结果（profiler.py）
         ]
 
         deleted_files = []
@@ -102,8 +106,41 @@ def cleanup_old_performance_logs():
         return []
 
 
+# 性能指标日志（每轮统计、定期性能摘要）只写入 performance.log 和控制台
+PERFORMANCE_LOGGER_NAME = 'BiliMonitor.performance'
+
+# 后台写日志的监听线程，由 setup_logging() 创建
+_listener = None
+
+
+class _NameFilter(logging.Filter):
+    """按 logger 名称前缀路由：only 非空时只放行这些前缀，exclude 中的前缀一律拒绝"""
+
+    def __init__(self, only=(), exclude=()):
+        super().__init__()
+        self.only = tuple(only)
+        self.exclude = tuple(exclude)
+
+    def filter(self, record):
+        name = record.name
+        if self.only and not name.startswith(self.only):
+            return False
+        return not (self.exclude and name.startswith(self.exclude))
+
+
 def setup_logging():
-    """配置日志系统"""
+    """
+    配置日志系统
+
+    根 logger 只挂一个 QueueHandler：记录放入内存队列即返回，不在事件循环中写文件；
+    由 QueueListener 后台线程写入各输出，按名称和级别路由：
+    - 控制台：全部 INFO 及以上
+    - monitor.log：除性能日志外的全部记录
+    - error.log：ERROR 及以上
+    - performance.log：仅性能日志（PERFORMANCE_LOGGER_NAME）
+    - events.jsonl：仅结构化事件（event_log.EVENTS_LOGGER_NAME），不出现在其他输出中
+    """
+    global _listener
     # 先清理旧日志
     print("开始清理旧日志文件...")
     cleanup_old_logs()
@@ -121,9 +158,12 @@ def setup_logging():
     logger = logging.getLogger()
     logger.setLevel(logging.INFO)
 
-    # 清除已有的handler
+    # 清除已有的handler（重复调用时先停止旧的监听线程，写出已排队的记录）
     for handler in logger.handlers[:]:
         logger.removeHandler(handler)
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
 
     # 创建formatter
     formatter = logging.Formatter(
@@ -135,7 +175,7 @@ def setup_logging():
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+    console_handler.addFilter(_NameFilter(exclude=(EVENTS_LOGGER_NAME,)))
 
     # 主日志文件 - 按大小轮转
     log_file = LOG_DIR / "monitor.log"
@@ -147,7 +187,7 @@ def setup_logging():
     )
     file_handler.setLevel(logging.INFO)
     file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+    file_handler.addFilter(_NameFilter(exclude=(PERFORMANCE_LOGGER_NAME, EVENTS_LOGGER_NAME)))
 
     # 错误日志单独记录
     error_handler = RotatingFileHandler(
@@ -158,7 +198,6 @@ def setup_logging():
     )
     error_handler.setLevel(logging.ERROR)
     error_handler.setFormatter(formatter)
-    logger.addHandler(error_handler)
 
     # 性能日志 - 按天轮转
     # 注意：TimedRotatingFileHandler 会自动删除旧文件
@@ -171,10 +210,30 @@ def setup_logging():
     )
     perf_handler.setLevel(logging.INFO)
     perf_handler.setFormatter(formatter)
+    perf_handler.addFilter(_NameFilter(only=(PERFORMANCE_LOGGER_NAME,)))
 
     # 设置文件名后缀格式
     perf_handler.suffix = "%Y-%m-%d"
-    logger.addHandler(perf_handler)
+
+    # 结构化事件 - 按大小轮转
+    event_handler = RotatingFileHandler(
+        EVENT_LOG_FILE,
+        maxBytes=EVENT_LOG_MAX_MB * 1024 * 1024,
+        backupCount=EVENT_LOG_BACKUP_COUNT,
+        encoding='utf-8'
+    )
+    event_handler.setLevel(logging.INFO)
+    event_handler.setFormatter(JsonLineFormatter())
+    event_handler.addFilter(_NameFilter(only=(EVENTS_LOGGER_NAME,)))
+
+    # 记录经队列交给后台线程写出（无界队列，入队不会阻塞）
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(QueueHandler(log_queue))
+    _listener = QueueListener(
+        log_queue, console_handler, file_handler, error_handler, perf_handler, event_handler,
+        respect_handler_level=True
+    )
+    _listener.start()
 
     logger.info("✅ 日志系统初始化完成")
     logger.info(f"📁 日志目录: {LOG_DIR}")
@@ -182,6 +241,28 @@ def setup_logging():
     return logger
 
 
+def shutdown_logging():
+    """
+    停止后台写日志线程并写出队列中剩余的记录（可重复调用）
+
+    之后的记录改为直接同步写入各输出，关闭过程中的日志不会丢失
+    """
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        if isinstance(handler, QueueHandler):
+            root.removeHandler(handler)
+    listener.stop()
+    for handler in listener.handlers:
+        root.addHandler(handler)
+
+
+atexit.register(shutdown_logging)
+
+
 # # 独立的清理函数，可以手动调用
 # def cleanup_logs_now(retention_days=3):
 #     """立即执行日志清理"""
@@ -198,6 +279,7 @@ def setup_logging():
 
 # 创建全局logger实例
 logger = logging.getLogger('BiliMonitor')
+perf_logger = logging.getLogger(PERFORMANCE_LOGGER_NAME)
 
 if __name__ == "__main__":
     # 可以直接运行此脚本来测试清理功能
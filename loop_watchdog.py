@@ -0,0 +1,191 @@
+# loop_watchdog.py
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Dict, Optional
+
+from logger_config import logger
+from config import LOOP_WATCHDOG_INTERVAL, LOOP_LAG_THRESHOLD, LOOP_WATCHDOG_TOP_N
+from metrics import LOOP_LAG
+from task_supervisor import task_supervisor
+
+_PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+_THIS_FILE = os.path.abspath(__file__)
+
+
+def _is_project_frame(filename: str) -> bool:
+    path = os.path.abspath(filename)
+    return path.startswith(_PROJECT_DIR + os.sep) and path != _THIS_FILE and "site-packages" not in path
+
+
+class _Offender:
+    __slots__ = ('count', 'total', 'max', 'stack', 'window_count', 'window_total', 'window_max')
+
+    def __init__(self, stack: str):
+        self.stack = stack  # 首次捕获时的调用栈
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.window_count = 0
+        self.window_total = 0.0
+        self.window_max = 0.0
+
+    def add(self, lag: float):
+        self.count += 1
+        self.total += lag
+        self.max = max(self.max, lag)
+        self.window_count += 1
+        self.window_total += lag
+        self.window_max = max(self.window_max, lag)
+
+
+class LoopWatchdog:
+    """
+    事件循环延迟与阻塞调用检测
+
+    - 心跳协程每 interval 秒醒来一次，实际唤醒时间与预期的差值即调度延迟，记入 LOOP_LAG 直方图
+    - 后台线程检查心跳：超过 interval + threshold 秒未更新说明事件循环正被同步代码占用，
+      此时通过 sys._current_frames() 抓取事件循环线程的调用栈，按最内层的项目代码调用点归类
+    - 阻塞结束后心跳测得的完整延迟记到该调用点；定期性能摘要中输出阻塞总时长最多的调用点
+    """
+
+    def __init__(self, interval: float = LOOP_WATCHDOG_INTERVAL, threshold: float = LOOP_LAG_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self._loop_thread_id: Optional[int] = None
+        self._beat = 0.0  # 最近一次心跳的 monotonic 时间
+        self._captured_beat = 0.0  # 已抓取调用栈的那次阻塞对应的心跳
+        self._pending: Optional[tuple] = None  # 当前阻塞的 (调用点, 调用栈)，由心跳协程结算
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.offenders: Dict[str, _Offender] = {}
+        self.stats = {'beats': 0, 'stalls': 0, 'max_lag': 0.0, 'total_lag': 0.0}
+
+    def start(self):
+        """在事件循环中调用"""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = task_supervisor.supervise(self._heartbeat, "loop_watchdog.heartbeat")
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"🐶 事件循环看门狗已启动（阻塞阈值 {self.threshold * 1000:.0f}ms）")
+
+    async def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread:
+            await asyncio.to_thread(self._thread.join, 2)
+            self._thread = None
+
+    # ------------------------------------------------------------------
+    # 事件循环侧
+    # ------------------------------------------------------------------
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            with self._lock:
+                self._beat = now
+                pending, self._pending = self._pending, None
+
+            self.stats['beats'] += 1
+            self.stats['total_lag'] += lag
+            if lag > self.stats['max_lag']:
+                self.stats['max_lag'] = lag
+            LOOP_LAG.observe(lag)
+            if lag >= self.threshold:
+                self.stats['stalls'] += 1
+                site, stack = pending or ("未捕获到调用栈", "")
+                offender = self.offenders.get(site)
+                if offender is None:
+                    offender = self.offenders[site] = _Offender(stack)
+                    logger.warning(f"🐢 事件循环被阻塞 {lag * 1000:.0f}ms: {site}\n{stack}")
+                offender.add(lag)
+
+    # ------------------------------------------------------------------
+    # 看门狗线程
+    # ------------------------------------------------------------------
+    def _watch(self):
+        # 心跳正常时最多 interval 秒未更新，超出部分即为当前延迟
+        stale_after = self.interval + self.threshold
+        poll = min(self.interval, self.threshold) / 2
+        while not self._stop.wait(poll):
+            with self._lock:
+                beat = self._beat
+                if time.monotonic() - beat < stale_after or beat == self._captured_beat:
+                    continue
+                self._captured_beat = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            try:
+                pending = self._describe(frame)
+            finally:
+                del frame
+            with self._lock:
+                if self._beat == beat:  # 阻塞尚未结束
+                    self._pending = pending
+
+    @staticmethod
+    def _describe(frame):
+        """返回 (调用点, 调用栈文本)：调用点取最内层的项目代码帧，没有时取最内层帧"""
+        entries = traceback.extract_stack(frame)
+        index = next((i for i in range(len(entries) - 1, -1, -1) if _is_project_frame(entries[i].filename)), None)
+        if index is None:
+            site_entry, start = entries[-1], max(0, len(entries) - 8)
+        else:
+            site_entry, start = entries[index], index
+            # 向外回溯连续的项目代码帧（即当前协程的 await 链），略去事件循环自身的帧
+            while start > 0 and _is_project_frame(entries[start - 1].filename):
+                start -= 1
+        site = f"{os.path.basename(site_entry.filename)}:{site_entry.lineno} {site_entry.name}"
+        return site, "".join(traceback.format_list(entries[start:][-12:])).rstrip()
+
+    # ------------------------------------------------------------------
+    # 统计
+    # ------------------------------------------------------------------
+    def drain_summary(self, top_n: int = LOOP_WATCHDOG_TOP_N) -> str:
+        """自上次调用以来阻塞总时长最多的调用点，并开始新的统计区间"""
+        ranked = sorted(self.offenders.items(), key=lambda item: item[1].window_total, reverse=True)
+        parts = [
+            f"{site} {offender.window_count}次/共{offender.window_total:.2f}秒/最长{offender.window_max:.2f}秒"
+            for site, offender in ranked[:top_n] if offender.window_count
+        ]
+        for offender in self.offenders.values():
+            offender.window_count = 0
+            offender.window_total = offender.window_max = 0.0
+        return "; ".join(parts)
+
+    def get_stats(self) -> dict:
+        beats = self.stats['beats']
+        top = sorted(self.offenders.items(), key=lambda item: item[1].total, reverse=True)[:LOOP_WATCHDOG_TOP_N]
+        return {
+            'beats': beats,
+            'stalls': self.stats['stalls'],
+            'avg_lag': f"{self.stats['total_lag'] / beats * 1000:.1f}ms" if beats else "0.0ms",
+            'max_lag': f"{self.stats['max_lag'] * 1000:.1f}ms",
+            'top_offenders': {
+                site: f"{offender.count}次/共{offender.total:.2f}秒" for site, offender in top if offender.count
+            },
+        }
+
+
+# 全局实例
+loop_watchdog = LoopWatchdog()
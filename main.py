@@ -7,13 +7,26 @@ import platform
 import os
 import time
 from datetime import datetime
-from logger_config import setup_logging, logger
+from logger_config import setup_logging, shutdown_logging, logger
 from config import (APP_NAME, LOG_LEVEL, LOG_FILE_PATH,
-                    SYSTEM_STATUS_CHECK_INTERVAL, LOG_DIR)
+                    SYSTEM_STATUS_CHECK_INTERVAL, LOG_DIR, METRICS_ENABLED, LOOP_WATCHDOG_ENABLED,
+                    PROFILING_ENABLED)
 from monitor import Monitor
 from status_monitor import status_monitor
 from health_check import perform_health_checks
-from email_utils import send_email
+from email_utils import send_email_async
+from smtp_pool import smtp_pool
+from async_smtp import async_smtp_client
+from image_cache import image_cache
+from notification_outbox import notification_outbox
+from notification_coalescer import notification_coalescer
+from qq_utils import qq_sender
+from metrics_server import MetricsServer
+from loop_watchdog import loop_watchdog
+from metrics_store import metrics_store, SERIES_LIVE
+from performance_monitor import performance_monitor
+from profiler import profiler
+from task_supervisor import task_supervisor
 from config import TO_EMAILS, STATUS_MONITOR_EMAILS
 
 # 尝试导入直播监控模块
@@ -35,6 +48,7 @@ class Application:
         self.monitor = None
         self.status_check_task = None
         self.live_monitor_task = None
+        self.metrics_server = None
         self.setup_signal_handlers()
         self.start_time = None
         self.is_running = False
@@ -84,7 +98,7 @@ class Application:
                         # 检查直播监控失败计数器
                         if live_failure_counter.should_alert():
                             alert_msg = (f"【直播监控告警】连续失败次数: {live_failure_counter.consecutive_failures} "
-                                         f"成功率: {live_failure_counter.get_stats()['success_rate']}")
+                                         f"窗口告警: {live_failure_counter.alert_reasons() or '无'}")
                             await self.send_alert_email("直播监控告警", alert_msg)
                             logger.error(f"❌❌ {alert_msg}")
                     except Exception as e:
@@ -96,8 +110,7 @@ class Application:
 
         except asyncio.CancelledError:
             logger.info("⏹⏹⏹️ 状态监控任务已取消")
-        except Exception as e:
-            logger.error(f"❌❌ 状态监控任务异常: {e}")
+            raise
 
     async def send_alert_email(self, subject: str, content: str):
         """发送告警邮件"""
@@ -114,8 +127,7 @@ class Application:
             </html>
             """
 
-            await asyncio.to_thread(
-                send_email,
+            await send_email_async(
                 subject=f"【系统告警】{subject}",
                 content=email_content,
                 to_emails=STATUS_MONITOR_EMAILS
@@ -137,17 +149,47 @@ class Application:
         logger.info(f"📝📝 日志级别: {LOG_LEVEL} | 日志文件: {LOG_FILE_PATH}")
         logger.info("✅✅ 配置加载完成")
 
+        # 从指标日志恢复跨重启的统计（放在日志初始化之后，恢复结果才会写入日志）
+        performance_monitor.restore()
+        if LIVE_MONITOR_AVAILABLE:
+            live_failure_counter.restore(metrics_store, SERIES_LIVE)
+
         # 设置事件循环策略
         self.setup_event_loop_policy()
 
         try:
+            # 启动事件循环看门狗（检测阻塞事件循环的同步调用）
+            if LOOP_WATCHDOG_ENABLED:
+                loop_watchdog.start()
+
+            # kill -USR2 <pid> 触发一次按需性能分析
+            if PROFILING_ENABLED and hasattr(signal, "SIGUSR2"):
+                asyncio.get_running_loop().add_signal_handler(signal.SIGUSR2, profiler.trigger_from_signal)
+
+            # 后台任务巡检（挂起 / 堆积的任务）
+            task_supervisor.start()
+
+            # 启动通知发件箱（检测逻辑只入队，由后台 worker 投递）
+            await notification_outbox.start()
+            # 恢复上次运行时挂起在合并窗口中的通知
+            await notification_coalescer.start()
+
+            # 启动指标与健康检查接口
+            if METRICS_ENABLED:
+                self.metrics_server = MetricsServer(
+                    self,
+                    live_scheduler=live_scheduler if LIVE_MONITOR_AVAILABLE else None,
+                    live_monitor=live_monitor if LIVE_MONITOR_AVAILABLE else None
+                )
+                await self.metrics_server.start()
+
             # 启动状态监控任务
-            self.status_check_task = asyncio.create_task(self.periodic_status_check())
+            self.status_check_task = task_supervisor.supervise(self.periodic_status_check, "status_check")
             logger.info("✅✅ 系统状态监控任务已启动")
 
             # 启动直播监控任务（如果可用）
             if LIVE_MONITOR_AVAILABLE:
-                self.live_monitor_task = asyncio.create_task(live_scheduler.start_monitoring())
+                self.live_monitor_task = task_supervisor.supervise(live_scheduler.start_monitoring, "live_monitor")
                 logger.info("✅✅ 直播监控任务已启动")
             else:
                 logger.info("ℹ️ℹ️ 直播监控模块不可用，跳过启动")
@@ -172,6 +214,10 @@ class Application:
         """优雅关闭所有服务"""
         logger.info("🛑 开始关闭应用程序...")
 
+        # 停止指标服务
+        if self.metrics_server:
+            await self.metrics_server.stop()
+
         # 停止直播监控（如果可用）
         if LIVE_MONITOR_AVAILABLE and hasattr(live_scheduler, 'is_running'):
             await live_scheduler.stop_monitoring()
@@ -189,6 +235,39 @@ class Application:
         if tasks:
             await asyncio.gather(*tasks, return_exceptions=True)
 
+        # 发出合并窗口中挂起的通知，确保在发件箱停止前入队（同时取消等待中的合并定时任务）
+        await notification_coalescer.flush_all()
+
+        # 等待进行中的告警 / 报告发送和邮件备份写入；服务任务由下面各组件自行停止
+        logger.info(f"🧵 后台任务统计: {task_supervisor.get_stats()}")
+        await task_supervisor.drain()
+
+        # 停止发件箱 worker，未投递的通知保留在磁盘上，下次启动继续投递
+        await notification_outbox.stop()
+
+        # 关闭SMTP连接池中的空闲连接
+        logger.info(f"📮 SMTP连接池统计: {smtp_pool.get_stats()}")
+        logger.info(f"📮 异步SMTP统计: {async_smtp_client.get_stats()}")
+        smtp_pool.close()
+        await async_smtp_client.close()
+        logger.info(f"🖼️ 图片缓存统计: {image_cache.get_stats()}")
+        await image_cache.close()
+
+        # 关闭QQ机器人连接
+        logger.info(f"💬 QQ传输统计: {qq_sender.get_stats()}")
+        await qq_sender.close()
+
+        # 停止事件循环看门狗
+        logger.info(f"🐶 事件循环统计: {loop_watchdog.get_stats()}")
+        await loop_watchdog.stop()
+
+        # 取消剩余的后台任务（巡检等）
+        await task_supervisor.shutdown()
+
+        # 写出未完成的指标汇总桶
+        metrics_store.close()
+        logger.info(f"🗄️ 指标日志统计: {metrics_store.get_stats()}")
+
         # 计算运行时间
         uptime = time.time() - self.start_time
         hours, remainder = divmod(uptime, 3600)
@@ -196,6 +275,9 @@ class Application:
         logger.info(f"⏱⏱ 应用程序运行时间: {int(hours)}小时 {int(minutes)}分钟 {int(seconds)}秒")
         logger.info("✅✅ 应用程序关闭完成")
 
+        # 写出日志队列中剩余的记录
+        shutdown_logging()
+
     def setup_event_loop_policy(self):
         """设置事件循环策略 - Windows兼容性"""
         try:
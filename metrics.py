@@ -0,0 +1,120 @@
+# metrics.py
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 指标名前缀
+NAMESPACE = "bili_monitor"
+
+LabelSet = Optional[Dict[str, str]]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: LabelSet) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Exposition:
+    """按 Prometheus 文本格式（0.0.4）拼装指标"""
+
+    def __init__(self):
+        self.lines: List[str] = []
+
+    def add(self, name: str, kind: str, documentation: str, samples: Iterable[Tuple[LabelSet, object]]):
+        """添加一个指标族；值为 None 的样本跳过"""
+        samples = [(labels, value) for labels, value in samples if value is not None]
+        if not samples:
+            return
+        full_name = f"{NAMESPACE}_{name}"
+        self.lines.append(f"# HELP {full_name} {documentation}")
+        self.lines.append(f"# TYPE {full_name} {kind}")
+        for labels, value in samples:
+            self.lines.append(f"{full_name}{_format_labels(labels)} {_format_value(value)}")
+
+    def gauge(self, name: str, documentation: str, value, labels: LabelSet = None):
+        self.add(name, "gauge", documentation, [(labels, value)])
+
+    def counter(self, name: str, documentation: str, value, labels: LabelSet = None):
+        self.add(name, "counter", documentation, [(labels, value)])
+
+    def extend(self, lines: List[str]):
+        self.lines.extend(lines)
+
+    def render(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+class Histogram:
+    """
+    累计直方图（Prometheus histogram 语义）
+
+    observe 只做一次二分查找和计数加一；导出时再累加为 le 桶
+    """
+
+    def __init__(self, name: str, documentation: str, buckets: Iterable[float], labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = sorted(buckets)
+        self.labelnames = labelnames
+        # 标签值 -> [各桶计数..., +Inf 桶计数], 总和
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labelvalues: str):
+        series = self._series.get(labelvalues)
+        if series is None:
+            series = self._series[labelvalues] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = series
+        counts[bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def render(self) -> List[str]:
+        if not self._series:
+            return []
+        full_name = f"{NAMESPACE}_{self.name}"
+        lines = [f"# HELP {full_name} {self.documentation}", f"# TYPE {full_name} histogram"]
+        for labelvalues, (counts, total) in self._series.items():
+            base = dict(zip(self.labelnames, labelvalues))
+            cumulative = 0
+            for bound, count in zip(self.buckets + [float("inf")], counts):
+                cumulative += count
+                lines.append(f"{full_name}_bucket{_format_labels({**base, 'le': _format_value(float(bound))})} "
+                             f"{cumulative}")
+            lines.append(f"{full_name}_sum{_format_labels(base)} {_format_value(total[0])}")
+            lines.append(f"{full_name}_count{_format_labels(base)} {cumulative}")
+        return lines
+
+
+# ===== 延迟直方图（在各模块中 observe，由 /metrics 导出）=====
+CYCLE_DURATION = Histogram(
+    "cycle_duration_seconds", "动态监控每轮耗时",
+    (0.5, 1, 2, 3, 5, 8, 13, 20, 30, 60)
+)
+LIVE_CHECK_DURATION = Histogram(
+    "live_check_duration_seconds", "直播状态检查耗时",
+    (0.1, 0.25, 0.5, 1, 2, 5, 10)
+)
+NOTIFICATION_LATENCY = Histogram(
+    "notification_latency_seconds", "通知从检测到变化到送达的耗时",
+    (0.5, 1, 2, 5, 10, 30, 60, 120, 300, 900), ("channel",)
+)
+STAGE_DURATION = Histogram(
+    "stage_duration_seconds", "各处理阶段耗时（tracing 记录）",
+    (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20), ("stage",)
+)
+LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "事件循环调度延迟",
+    (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5)
+)
+HISTOGRAMS = [CYCLE_DURATION, LIVE_CHECK_DURATION, NOTIFICATION_LATENCY, STAGE_DURATION, LOOP_LAG]
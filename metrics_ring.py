@@ -0,0 +1,110 @@
+# metrics_ring.py
+from array import array
+from typing import List, Optional
+
+
+class CycleRingBuffer:
+    """
+    定长环形缓冲区：按 (时间戳, 耗时, 是否成功) 记录每轮监控结果
+
+    - 三列数据保存在初始化时一次分配好的定长数组中（array('d') / bytearray），
+      追加为 O(1)，写满后覆盖最旧的记录，内存不随运行时间增长
+    - 缓冲区内的耗时总和、成功次数以及全程累计值随追加增量维护，整体平均值 / 成功率为 O(1)
+    - 最近 N 轮的平均值 / 成功率为 O(N)，分位数为 O(N log N)，N 为查询窗口而不是运行总轮数
+    """
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("capacity 必须为正整数")
+        self.capacity = capacity
+        self._timestamps = array('d', bytes(8 * capacity))
+        self._durations = array('d', bytes(8 * capacity))
+        self._success = bytearray(capacity)
+        self._next = 0  # 下一次写入的位置
+        self._size = 0
+
+        # 缓冲区内的增量汇总
+        self._window_duration = 0.0
+        self._window_success = 0
+
+        # 全程累计（不受容量限制）
+        self.total_count = 0
+        self.total_duration = 0.0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, timestamp: float, duration: float, success: bool):
+        i = self._next
+        if self._size == self.capacity:
+            # 覆盖最旧的记录，先从汇总中扣除
+            self._window_duration -= self._durations[i]
+            self._window_success -= self._success[i]
+        else:
+            self._size += 1
+
+        self._timestamps[i] = timestamp
+        self._durations[i] = duration
+        self._success[i] = 1 if success else 0
+        self._window_duration += duration
+        self._window_success += self._success[i]
+        self._next = (i + 1) % self.capacity
+        if self._next == 0:
+            # 每写满一圈重新求和一次，消除增减累积的浮点误差（均摊 O(1)）
+            self._window_duration = sum(self._durations[:self._size])
+
+        self.total_count += 1
+        self.total_duration += duration
+
+    def _window(self, column, last: Optional[int]):
+        """按时间顺序返回最近 last 条（默认全部）记录的某一列"""
+        n = self._size if last is None else max(0, min(last, self._size))
+        if n == 0:
+            return column[:0]
+        start = (self._next - n) % self.capacity
+        if start + n <= self.capacity:
+            return column[start:start + n]
+        return column[start:] + column[:self._next]
+
+    def durations(self, last: Optional[int] = None) -> array:
+        return self._window(self._durations, last)
+
+    def mean(self, last: Optional[int] = None) -> float:
+        """最近 last 轮（默认缓冲区内全部）的平均耗时"""
+        if last is None or last >= self._size:
+            return self._window_duration / self._size if self._size else 0.0
+        window = self.durations(last)
+        return sum(window) / len(window) if window else 0.0
+
+    def lifetime_mean(self) -> float:
+        """自启动以来的平均耗时（O(1)，包括已被覆盖的记录）"""
+        return self.total_duration / self.total_count if self.total_count else 0.0
+
+    def success_rate(self, last: Optional[int] = None) -> float:
+        """最近 last 轮（默认缓冲区内全部）的成功率，无记录时返回 0"""
+        if last is None or last >= self._size:
+            return self._window_success / self._size if self._size else 0.0
+        window = self._window(self._success, last)
+        return sum(window) / len(window) if window else 0.0
+
+    def percentile(self, q: float, last: Optional[int] = None) -> float:
+        """最近 last 轮耗时的 q 分位数（0 ≤ q ≤ 100，线性插值）"""
+        window = sorted(self.durations(last))
+        if not window:
+            return 0.0
+        position = (len(window) - 1) * min(max(q, 0.0), 100.0) / 100
+        lower = int(position)
+        upper = min(lower + 1, len(window) - 1)
+        return window[lower] + (window[upper] - window[lower]) * (position - lower)
+
+    def recent_failures(self, limit: int) -> List[float]:
+        """最近 limit 次失败的时间戳（从新到旧），只扫描到找满为止"""
+        result = []
+        i = self._next
+        for _ in range(self._size):
+            i = (i - 1) % self.capacity
+            if not self._success[i]:
+                result.append(self._timestamps[i])
+                if len(result) >= limit:
+                    break
+        return result
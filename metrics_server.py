@@ -0,0 +1,374 @@
+# metrics_server.py
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+import psutil
+from aiohttp import web
+
+from logger_config import logger
+from config import (
+    METRICS_HOST, METRICS_PORT, COOKIE_FILE, HEALTH_CYCLE_STALE_SECONDS, HEALTH_LIVE_STALE_SECONDS,
+    HEALTH_OUTBOX_MAX_PENDING_AGE, PROFILING_HTTP_ENABLED
+)
+from metrics import Exposition, HISTOGRAMS
+from performance_monitor import performance_monitor
+from status_monitor import status_monitor
+from smtp_pool import smtp_pool
+from async_smtp import async_smtp_client
+from image_cache import image_cache
+from notification_outbox import notification_outbox, OutboxStore
+from notification_coalescer import notification_coalescer
+from qq_utils import qq_sender
+from loop_watchdog import loop_watchdog
+from process_tree import process_tree, ProcessTreeSample
+from health_check import PROBE_TIERS
+from profiler import profiler
+from task_supervisor import task_supervisor
+
+_OUTBOX_STATUSES = ("pending", "inflight", "done", "dead")
+_OUTBOX_COUNTERS = ("enqueued", "deduplicated", "delivered", "partial", "retries", "dead")
+
+
+def _numeric_stats(stats: Dict[str, Any], prefix: str = ""):
+    """展开 get_stats() 结果中的数值项（嵌套字典以 . 连接键名），格式化过的字符串项跳过"""
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            yield from _numeric_stats(value, f"{prefix}{key}.")
+        elif isinstance(value, (bool, int, float)):
+            yield f"{prefix}{key}", value
+
+
+def _cookie_health() -> dict:
+    """检查 Cookie 文件中的 SESSDATA（登录态）是否存在且未过期（读文件，在线程中调用）"""
+    try:
+        cookies = json.loads(COOKIE_FILE.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {'ok': False, 'detail': "Cookie 文件不存在"}
+    except (OSError, ValueError) as e:
+        return {'ok': False, 'detail': f"Cookie 文件无法读取: {e}"}
+
+    sessdata = next((c for c in cookies if isinstance(c, dict) and c.get("name") == "SESSDATA"), None) \
+        if isinstance(cookies, list) else None
+    if sessdata is None:
+        return {'ok': False, 'detail': "缺少 SESSDATA，请重新运行 get_cookies.py"}
+    expires = sessdata.get("expires", -1)
+    if expires is None or expires < 0:
+        return {'ok': True, 'detail': "会话 Cookie"}
+    remaining = expires - time.time()
+    if remaining <= 0:
+        return {'ok': False, 'detail': "SESSDATA 已过期", 'expires': expires}
+    return {'ok': True, 'expires_in_hours': round(remaining / 3600, 1)}
+
+
+class MetricsServer:
+    """
+    内嵌的指标与健康检查 HTTP 服务
+
+    - /metrics：Prometheus 文本格式的计数器、仪表和延迟直方图
+    - /healthz：浏览器、Cookie、直播会话、发件箱和动态监控的就绪状态（JSON，任一项不健康时返回 503）
+
+    处理函数只读取各组件的内存统计，文件 / 数据库读取放到线程中执行，抓取不会阻塞监控循环
+    """
+
+    def __init__(self, app, live_scheduler=None, live_monitor=None, host: str = METRICS_HOST,
+                 port: int = METRICS_PORT):
+        self.app = app  # main.Application，运行期间持有 monitor 实例
+        self.live_scheduler = live_scheduler  # 直播监控模块不可用时为 None
+        self.live_monitor = live_monitor
+        self.host = host
+        self.port = port
+        self.process = psutil.Process(os.getpid())
+        self._runner: Optional[web.AppRunner] = None
+        self._outbox_reader: Optional[OutboxStore] = None
+        self.stats = {'scrapes': 0, 'health_checks': 0}
+
+    async def start(self):
+        web_app = web.Application()
+        web_app.router.add_get("/metrics", self.handle_metrics)
+        web_app.router.add_get("/healthz", self.handle_healthz)
+        web_app.router.add_get("/debug/tasks", self.handle_tasks)
+        if PROFILING_HTTP_ENABLED:
+            web_app.router.add_get("/debug/profile", self.handle_profile_status)
+            web_app.router.add_post("/debug/profile", self.handle_profile_start)
+        self._runner = web.AppRunner(web_app, access_log=None)
+        await self._runner.setup()
+        try:
+            await web.TCPSite(self._runner, self.host, self.port).start()
+        except OSError as e:
+            logger.error(f"❌ 指标服务启动失败 {self.host}:{self.port}: {e}")
+            await self._runner.cleanup()
+            self._runner = None
+            return
+        logger.info(f"📊 指标服务已启动: http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+        if self._outbox_reader:
+            self._outbox_reader.close()
+            self._outbox_reader = None
+
+    # ------------------------------------------------------------------
+    # 发件箱（SQLite 查询在线程中执行，使用独立的只读连接）
+    # ------------------------------------------------------------------
+    def _outbox_queue(self) -> dict:
+        if self._outbox_reader is None:
+            self._outbox_reader = OutboxStore(notification_outbox.store.db_file, readonly=True)
+        return {
+            'counts': self._outbox_reader.counts(),
+            'oldest_pending_age': self._outbox_reader.oldest_pending_age(),
+        }
+
+    async def _outbox_snapshot(self) -> Optional[dict]:
+        try:
+            return await asyncio.to_thread(self._outbox_queue)
+        except Exception as e:
+            logger.warning(f"⚠️ 读取发件箱统计失败: {e}")
+            return None
+
+    # ------------------------------------------------------------------
+    # /metrics
+    # ------------------------------------------------------------------
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        self.stats['scrapes'] += 1
+        outbox = await self._outbox_snapshot()
+        try:
+            tree = await process_tree.sample_async()
+        except Exception as e:
+            logger.warning(f"⚠️ 进程树采样失败: {e}")
+            tree = None
+        body = self.render_metrics(outbox, tree)
+        return web.Response(text=body, content_type="text/plain", charset="utf-8",
+                            headers={"Cache-Control": "no-cache"})
+
+    def render_metrics(self, outbox: Optional[dict], tree: Optional[ProcessTreeSample] = None) -> str:
+        now = time.time()
+        exp = Exposition()
+
+        # 进程
+        start_time = self.app.start_time or now
+        exp.gauge("uptime_seconds", "进程运行时间", round(now - start_time, 3))
+        try:
+            exp.gauge("resident_memory_bytes", "进程常驻内存", self.process.memory_info().rss)
+        except psutil.Error:
+            pass
+
+        # 进程树（Python + Playwright 驱动 + Chromium 各类子进程）
+        if tree is not None:
+            roles = sorted(tree.roles.items())
+            exp.add("process_count", "gauge", "进程数（按角色）", [({'role': r}, u.count) for r, u in roles])
+            exp.add("process_rss_bytes", "gauge", "常驻内存（按角色）", [({'role': r}, u.rss) for r, u in roles])
+            exp.add("process_pss_bytes", "gauge", "按比例分摊共享页的内存（按角色）",
+                    [({'role': r}, u.pss) for r, u in roles if u.pss])
+            exp.add("process_cpu_seconds", "gauge", "存活进程累计 CPU 时间（按角色，进程退出后会下降）",
+                    [({'role': r}, round(u.cpu_time, 3)) for r, u in roles])
+            exp.add("process_open_fds", "gauge", "打开的文件描述符数（按角色）", [({'role': r}, u.fds) for r, u in roles])
+
+        # 动态监控
+        monitor = self.app.monitor
+        if monitor is not None:
+            checker = monitor.health_checker
+            exp.counter("monitor_loops_total", "动态监控已执行轮数", monitor.loop_count)
+            exp.add("monitor_scrapes_total", "counter", "动态页面抓取次数（按结果）", [
+                ({'result': "success"}, checker.success_count),
+                ({'result': "failure"}, checker.failure_count),
+            ])
+            exp.gauge("monitor_last_cycle_timestamp_seconds", "最近一轮动态监控完成时间", monitor.last_cycle_completed)
+            exp.gauge("browser_up", "浏览器是否已连接", self._browser_connected(monitor))
+            probes = [(tier, checker.probe_stats[tier]) for tier in PROBE_TIERS]
+            exp.add("browser_probe_runs_total", "counter", "浏览器健康探测次数（按级别）",
+                    [({'tier': tier}, stats['runs']) for tier, stats in probes])
+            exp.add("browser_probe_failures_total", "counter", "浏览器健康探测失败次数（按级别）",
+                    [({'tier': tier}, stats['failures']) for tier, stats in probes])
+
+        # 性能统计与滑动窗口告警
+        perf = performance_monitor
+        exp.add("cycles_total", "counter", "性能统计记录的轮数（按结果）", [
+            ({'result': "success"}, perf.cumulative_success),
+            ({'result': "failure"}, perf.cumulative_failure),
+        ])
+        exp.gauge("memory_peak_megabytes", "运行期间的内存峰值", perf.memory_peak)
+        exp.add("alert_active", "gauge", "告警是否处于触发状态", [
+            ({'source': "performance", 'rule': rule.name}, perf.alerts.is_active(rule.name))
+            for rule in perf.alerts.rules
+        ])
+        exp.add("window_success_ratio", "gauge", "滑动窗口内的动态抓取成功率", [
+            ({'window': label}, window['success'] / (window['success'] + window['failures']))
+            for label, window in perf.alerts.snapshot(now).items() if window['success'] + window['failures']
+        ])
+
+        # 直播监控
+        if self.live_scheduler is not None:
+            scheduler = self.live_scheduler
+            exp.gauge("live_scheduler_running", "直播监控调度器是否运行中", scheduler.is_running)
+            exp.counter("live_checks_total", "直播状态检查次数", scheduler.check_count)
+            exp.gauge("live_last_success_timestamp_seconds", "最近一次直播检查成功时间",
+                      scheduler.last_successful_check)
+            last_status = self.live_monitor.last_live_status
+            if last_status is not None:
+                exp.gauge("live_streaming", "直播间是否正在直播", last_status["live_status"] == 1)
+
+        # 状态监控
+        status = status_monitor.status_data
+        exp.gauge("last_change_timestamp_seconds", "最近一次检测到动态变化的时间", status["last_change_time"])
+        exp.counter("changes_total", "检测到的动态变化次数", status["total_changes"])
+
+        # 通知发件箱
+        outbox_stats = notification_outbox.stats
+        exp.gauge("outbox_running", "发件箱 worker 是否运行中", notification_outbox.is_running)
+        if outbox is not None:
+            exp.add("outbox_items", "gauge", "发件箱中的通知数（按状态）", [
+                ({'status': status_name}, outbox['counts'].get(status_name, 0)) for status_name in _OUTBOX_STATUSES
+            ])
+            exp.gauge("outbox_oldest_pending_age_seconds", "最早待投递通知的等待时间", round(outbox['oldest_pending_age'], 3))
+        for counter in _OUTBOX_COUNTERS:
+            exp.add(f"outbox_{counter}_total", "counter", f"发件箱 {counter} 计数（按通道）", [
+                ({'channel': channel}, stats[counter]) for channel, stats in outbox_stats.items()
+            ])
+
+        # 后台任务
+        exp.add("background_tasks", "gauge", "未完成的后台任务数（按类型和状态）", [
+            ({'kind': kind, 'state': state}, count) for (kind, state), count in sorted(task_supervisor.counts().items())
+        ])
+
+        # 其他组件的 get_stats() 数值项
+        components = {
+            'smtp_pool': smtp_pool,
+            'async_smtp': async_smtp_client,
+            'qq_sender': qq_sender,
+            'notification_coalescer': notification_coalescer,
+            'image_cache': image_cache,
+            'loop_watchdog': loop_watchdog,
+            'task_supervisor': task_supervisor,
+        }
+        samples = []
+        for component, instance in components.items():
+            try:
+                samples.extend(
+                    ({'component': component, 'stat': key}, value)
+                    for key, value in _numeric_stats(instance.get_stats())
+                )
+            except Exception as e:
+                logger.debug(f"读取 {component} 统计失败: {e}")
+        exp.add("component_stat", "gauge", "各组件 get_stats() 中的数值项", samples)
+
+        # 延迟直方图
+        for histogram in HISTOGRAMS:
+            exp.extend(histogram.render())
+        return exp.render()
+
+    # ------------------------------------------------------------------
+    # /healthz
+    # ------------------------------------------------------------------
+    async def handle_healthz(self, request: web.Request) -> web.Response:
+        self.stats['health_checks'] += 1
+        report = await self.health()
+        return web.json_response(report, status=200 if report['ok'] else 503,
+                                 dumps=lambda obj: json.dumps(obj, ensure_ascii=False))
+
+    async def health(self) -> dict:
+        now = time.time()
+        cookie, outbox = await asyncio.gather(asyncio.to_thread(_cookie_health), self._outbox_snapshot())
+        checks = {
+            'browser': self._browser_health(),
+            'cookie': cookie,
+            'live_session': self._live_health(now),
+            'outbox': self._outbox_health(outbox),
+            'monitor_cycle': self._cycle_health(now),
+        }
+        return {'ok': all(check['ok'] for check in checks.values()), 'time': round(now, 3), 'checks': checks}
+
+    @staticmethod
+    def _browser_connected(monitor) -> bool:
+        browser = monitor.browser
+        return bool(browser is not None and browser.is_connected() and monitor.context is not None)
+
+    def _browser_health(self) -> dict:
+        monitor = self.app.monitor
+        if monitor is None:
+            return {'ok': False, 'detail': "动态监控尚未启动"}
+        if self._browser_connected(monitor):
+            return {'ok': True}
+        return {'ok': False, 'detail': "浏览器未连接"}
+
+    def _in_startup_grace(self, now: float, stale_seconds: float) -> bool:
+        return self.app.start_time is not None and now - self.app.start_time < stale_seconds
+
+    def _live_health(self, now: float) -> dict:
+        if self.live_scheduler is None:
+            return {'ok': True, 'detail': "直播监控不可用，已跳过"}
+        scheduler = self.live_scheduler
+        session = self.live_monitor.session
+        session_open = session is not None and not session.closed
+        last_success = scheduler.last_successful_check
+        age = now - last_success if last_success else None
+        result = {'running': scheduler.is_running, 'session_open': session_open,
+                  'last_success_age': round(age, 1) if age is not None else None}
+        if not scheduler.is_running:
+            return {'ok': False, 'detail': "直播监控未运行", **result}
+        if age is None or age > HEALTH_LIVE_STALE_SECONDS:
+            if age is None and self._in_startup_grace(now, HEALTH_LIVE_STALE_SECONDS):
+                return {'ok': True, 'detail': "启动中", **result}
+            return {'ok': False, 'detail': f"超过 {HEALTH_LIVE_STALE_SECONDS} 秒没有成功检查", **result}
+        return {'ok': True, **result}
+
+    @staticmethod
+    def _outbox_health(outbox: Optional[dict]) -> dict:
+        if not notification_outbox.is_running:
+            return {'ok': False, 'detail': "发件箱 worker 未运行"}
+        if outbox is None:
+            return {'ok': False, 'detail': "发件箱数据库无法读取"}
+        age = outbox['oldest_pending_age']
+        result = {'queue': outbox['counts'], 'oldest_pending_age': round(age, 1)}
+        if age > HEALTH_OUTBOX_MAX_PENDING_AGE:
+            return {'ok': False, 'detail': f"有通知等待超过 {HEALTH_OUTBOX_MAX_PENDING_AGE} 秒", **result}
+        return {'ok': True, **result}
+
+    def _cycle_health(self, now: float) -> dict:
+        monitor = self.app.monitor
+        if monitor is None:
+            return {'ok': False, 'detail': "动态监控尚未启动"}
+        # 以完成时间判断：卡在某一轮中途时开始时间和浏览器探测时间仍会不断刷新
+        age = now - monitor.last_cycle_completed
+        result = {'loops': monitor.loop_count, 'last_cycle_age': round(age, 1)}
+        if age > HEALTH_CYCLE_STALE_SECONDS:
+            return {'ok': False, 'detail': f"超过 {HEALTH_CYCLE_STALE_SECONDS} 秒没有完成一轮监控", **result}
+        return {'ok': True, **result}
+
+    # ------------------------------------------------------------------
+    # /debug/tasks（后台任务及其当前挂起位置；?stacks=0 不展开调用链）
+    # ------------------------------------------------------------------
+    async def handle_tasks(self, request: web.Request) -> web.Response:
+        with_stacks = request.query.get("stacks", "1") != "0"
+        return self._json({'stats': task_supervisor.get_stats(), 'tasks': task_supervisor.dump(with_stacks)})
+
+    # ------------------------------------------------------------------
+    # /debug/profile（按需性能分析，结果写入 logs/）
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _json(obj, status: int = 200) -> web.Response:
+        return web.json_response(obj, status=status, dumps=lambda o: json.dumps(o, ensure_ascii=False))
+
+    async def handle_profile_status(self, request: web.Request) -> web.Response:
+        return self._json({'current': profiler.current, 'last': profiler.last, **profiler.get_stats()})
+
+    async def handle_profile_start(self, request: web.Request) -> web.Response:
+        """POST /debug/profile?seconds=30&modes=sample,cprofile,memory"""
+        modes = request.query.get("modes")
+        try:
+            session = profiler.trigger(
+                seconds=float(request.query["seconds"]) if "seconds" in request.query else None,
+                modes=modes.split(",") if modes else None
+            )
+        except ValueError as e:
+            return self._json({'error': str(e)}, status=400)
+        if session is None:
+            return self._json({'error': "已有性能分析在运行", 'current': profiler.current}, status=409)
+        return self._json(session, status=202)
+
+    def get_stats(self) -> dict:
+        return {**self.stats, 'listening': self._runner is not None}
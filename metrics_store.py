@@ -0,0 +1,306 @@
+# metrics_store.py
+import calendar
+import struct
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from logger_config import logger
+from config import (
+    METRICS_STORE_DIR, METRICS_RAW_RETENTION_DAYS, METRICS_MINUTE_RETENTION_DAYS, METRICS_HOUR_RETENTION_DAYS
+)
+
+# 序列名 -> 记录中的序列编号（只可追加，不可修改已有编号）
+SERIES_DYNAMIC = "dynamic"
+SERIES_LIVE = "live"
+_SERIES_IDS = {SERIES_DYNAMIC: 1, SERIES_LIVE: 2}
+
+# 原始记录: 时间戳, 序列, 是否成功, 耗时（14 字节）
+_RAW = struct.Struct("<dBBf")
+# 汇总记录: 桶起始时间, 序列, 次数, 成功次数, 总耗时, 最大耗时, 已计入的最后一条原始记录时间戳（37 字节）
+_ROLLUP = struct.Struct("<dBIIdfd")
+
+_DAY = 86400
+
+
+class Rollup:
+    """一个时间桶内的汇总；同一个桶可能分多条记录写入（如重启前后），读取时合并"""
+    __slots__ = ('start', 'count', 'success', 'total', 'max', 'last_ts')
+
+    def __init__(self, start: float = 0.0, count: int = 0, success: int = 0, total: float = 0.0,
+                 max_duration: float = 0.0, last_ts: float = 0.0):
+        self.start = start
+        self.count = count
+        self.success = success
+        self.total = total
+        self.max = max_duration
+        self.last_ts = last_ts
+
+    def add(self, ts: float, duration: float, success: bool):
+        self.count += 1
+        self.success += 1 if success else 0
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.last_ts = max(self.last_ts, ts)
+
+    def merge(self, other: "Rollup"):
+        self.count += other.count
+        self.success += other.success
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.last_ts = max(self.last_ts, other.last_ts)
+
+    @property
+    def failure(self) -> int:
+        return self.count - self.success
+
+    @property
+    def success_rate(self) -> float:
+        return self.success / self.count if self.count else 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class _Tier:
+    """一个存储层级：按天（或按月）分文件，整文件过期删除，磁盘占用有上限"""
+
+    def __init__(self, name: str, bucket: int, retention_days: int, monthly: bool = False):
+        self.name = name
+        self.bucket = bucket  # 汇总桶宽（秒），原始层为 0
+        self.retention = retention_days * _DAY
+        self.monthly = monthly
+        self.record = _ROLLUP if bucket else _RAW
+
+    def period_key(self, ts: float) -> str:
+        return time.strftime("%Y%m" if self.monthly else "%Y%m%d", time.gmtime(ts))
+
+    def period_end(self, key: str) -> float:
+        """文件所覆盖时间段的结束时间（UTC）"""
+        if self.monthly:
+            year, month = int(key[:4]), int(key[4:6])
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+            return calendar.timegm((year, month, 1, 0, 0, 0))
+        return calendar.timegm(time.strptime(key, "%Y%m%d")) + _DAY
+
+    def file_name(self, key: str) -> str:
+        return f"{self.name}-{key}.bin"
+
+
+class MetricsStore:
+    """
+    跨重启保存的每轮监控指标（定长二进制记录，只追加）
+
+    - 原始层：每条结果一条 14 字节记录，保留 METRICS_RAW_RETENTION_DAYS 天，用于重启后恢复滑动窗口和耗时分位数
+    - 分钟层 / 小时层：按桶汇总（次数、成功次数、总耗时、最大耗时），分别保留一个月和一年，供长期趋势和累计计数查询
+    - 各层按天（小时层按月）分文件，过期的文件整个删除，磁盘占用有上限
+    - 汇总记录带有已计入的最后一条原始记录时间戳：异常退出后，启动时从原始层补算未写出的汇总桶
+    """
+
+    def __init__(self, directory=METRICS_STORE_DIR):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.raw = _Tier("raw", 0, METRICS_RAW_RETENTION_DAYS)
+        self.minute = _Tier("minute", 60, METRICS_MINUTE_RETENTION_DAYS)
+        self.hour = _Tier("hour", 3600, METRICS_HOUR_RETENTION_DAYS, monthly=True)
+        self.tiers = (self.raw, self.minute, self.hour)
+
+        self._handles: Dict[str, Tuple[str, object]] = {}  # 层级名 -> (当前文件名, 文件对象)
+        # (层级名, 序列编号) -> 当前未写出的汇总桶
+        self._pending: Dict[Tuple[str, int], Rollup] = {}
+        self.stats = {'appended': 0, 'rollups_written': 0, 'files_pruned': 0}
+
+        self._prune()
+        self._recover()
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+    def append(self, series: str, duration: float, success: bool, ts: Optional[float] = None):
+        ts = time.time() if ts is None else ts
+        series_id = _SERIES_IDS[series]
+        try:
+            self._write(self.raw, ts, _RAW.pack(ts, series_id, 1 if success else 0, duration))
+            self._accumulate(series_id, ts, duration, success)
+            self.stats['appended'] += 1
+        except OSError as e:
+            logger.error(f"❌ 写入指标记录失败: {e}")
+
+    def _accumulate(self, series_id: int, ts: float, duration: float, success: bool):
+        for tier in (self.minute, self.hour):
+            key = (tier.name, series_id)
+            start = ts - ts % tier.bucket
+            pending = self._pending.get(key)
+            if pending is not None and pending.start != start:
+                self._write_rollup(tier, series_id, pending)
+                pending = None
+            if pending is None:
+                pending = self._pending[key] = Rollup(start)
+            pending.add(ts, duration, success)
+
+    def _write_rollup(self, tier: _Tier, series_id: int, rollup: Rollup):
+        self._write(tier, rollup.start, _ROLLUP.pack(
+            rollup.start, series_id, rollup.count, rollup.success, rollup.total, rollup.max, rollup.last_ts
+        ))
+        self.stats['rollups_written'] += 1
+
+    def _write(self, tier: _Tier, ts: float, data: bytes):
+        name = tier.file_name(tier.period_key(ts))
+        current = self._handles.get(tier.name)
+        if current is None or current[0] != name:
+            if current is not None:
+                current[1].close()
+                self._prune()
+            current = self._handles[tier.name] = (name, open(self.directory / name, "ab", buffering=0))
+        current[1].write(data)
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+    def _files(self, tier: _Tier, since: float, until: float) -> List[Path]:
+        files = []
+        for path in self.directory.glob(f"{tier.name}-*.bin"):
+            key = path.stem.split("-", 1)[1]
+            try:
+                end = tier.period_end(key)
+            except ValueError:
+                continue
+            start = calendar.timegm(time.strptime(key + ("01" if tier.monthly else ""), "%Y%m%d"))
+            if end > since and start <= until:
+                files.append(path)
+        return sorted(files)
+
+    def _read(self, tier: _Tier, since: float, until: float):
+        record = tier.record
+        for path in self._files(tier, since, until):
+            try:
+                data = path.read_bytes()
+            except OSError as e:
+                logger.warning(f"⚠️ 读取指标文件失败 {path.name}: {e}")
+                continue
+            # 异常退出可能留下不完整的末尾记录，只读取完整记录
+            usable = len(data) - len(data) % record.size
+            yield from record.iter_unpack(data[:usable])
+
+    def raw_records(self, series: str, since: float, until: Optional[float] = None) -> List[Tuple[float, float, bool]]:
+        """原始层中 (since, until] 区间的 (时间戳, 耗时, 是否成功)，按时间排序"""
+        until = time.time() if until is None else until
+        series_id = _SERIES_IDS[series]
+        records = [
+            (ts, duration, bool(success))
+            for ts, sid, success, duration in self._read(self.raw, since, until)
+            if sid == series_id and since < ts <= until
+        ]
+        records.sort()
+        return records
+
+    def rollups(self, series: str, since: float, until: Optional[float] = None, resolution: int = 60) -> List[Rollup]:
+        """按分钟（resolution=60）或小时（3600）汇总的时间序列，包含尚未写出的当前桶"""
+        until = time.time() if until is None else until
+        tier = self.minute if resolution < 3600 else self.hour
+        series_id = _SERIES_IDS[series]
+        buckets: Dict[float, Rollup] = {}
+        for start, sid, count, success, total, max_duration, last_ts in self._read(tier, since, until):
+            if sid == series_id and since <= start + tier.bucket and start <= until:
+                bucket = buckets.get(start)
+                if bucket is None:
+                    bucket = buckets[start] = Rollup(start)
+                bucket.merge(Rollup(start, count, success, total, max_duration, last_ts))
+        pending = self._pending.get((tier.name, series_id))
+        if pending is not None and since <= pending.start + tier.bucket and pending.start <= until:
+            bucket = buckets.get(pending.start)
+            if bucket is None:
+                bucket = buckets[pending.start] = Rollup(pending.start)
+            bucket.merge(pending)
+        return [buckets[start] for start in sorted(buckets)]
+
+    def aggregate(self, series: str, since: float = 0.0, until: Optional[float] = None) -> Rollup:
+        """
+        区间内的合计，自动选择覆盖该区间的最细层级
+
+        since 早于所有层级的保留期时（如 0 表示“全部”），按小时层统计，即最多一年
+        """
+        now = time.time()
+        until = now if until is None else until
+        total = Rollup(since)
+        if now - since <= self.raw.retention:
+            for ts, duration, success in self.raw_records(series, since, until):
+                total.add(ts, duration, success)
+            return total
+        resolution = 60 if now - since <= self.minute.retention else 3600
+        for bucket in self.rollups(series, since, until, resolution):
+            total.merge(bucket)
+        return total
+
+    # ------------------------------------------------------------------
+    # 维护
+    # ------------------------------------------------------------------
+    def _prune(self):
+        """删除整段已超过保留期的文件"""
+        now = time.time()
+        for tier in self.tiers:
+            for path in self.directory.glob(f"{tier.name}-*.bin"):
+                try:
+                    expired = tier.period_end(path.stem.split("-", 1)[1]) < now - tier.retention
+                except ValueError:
+                    continue
+                if expired:
+                    try:
+                        path.unlink()
+                        self.stats['files_pruned'] += 1
+                    except OSError as e:
+                        logger.warning(f"⚠️ 删除过期指标文件失败 {path.name}: {e}")
+
+    def _recover(self):
+        """从原始层补算异常退出时尚未写出的汇总桶"""
+        now = time.time()
+        raw = list(self._read(self.raw, now - self.raw.retention, now))
+        if not raw:
+            return
+        raw.sort()
+        for tier in (self.minute, self.hour):
+            # 各序列已计入汇总的最后一条原始记录
+            watermark: Dict[int, float] = {}
+            for _, sid, _, _, _, _, last_ts in self._read(tier, now - self.raw.retention - tier.bucket, now):
+                watermark[sid] = max(watermark.get(sid, 0.0), last_ts)
+            recovered = 0
+            for ts, sid, success, duration in raw:
+                if ts <= watermark.get(sid, 0.0):
+                    continue
+                key = (tier.name, sid)
+                start = ts - ts % tier.bucket
+                pending = self._pending.get(key)
+                if pending is not None and pending.start != start:
+                    self._write_rollup(tier, sid, pending)
+                    pending = None
+                if pending is None:
+                    pending = self._pending[key] = Rollup(start)
+                pending.add(ts, duration, bool(success))
+                recovered += 1
+            if recovered:
+                logger.info(f"🔁 已从原始记录补算 {recovered} 条{tier.name}汇总")
+
+    def close(self):
+        """写出未完成的汇总桶（重启后同一个桶的后续记录另写一条，读取时合并）"""
+        try:
+            for (tier_name, series_id), pending in self._pending.items():
+                self._write_rollup(self.minute if tier_name == "minute" else self.hour, series_id, pending)
+        except OSError as e:
+            logger.error(f"❌ 写出指标汇总失败: {e}")
+        self._pending.clear()
+        for _, handle in self._handles.values():
+            handle.close()
+        self._handles.clear()
+
+    def get_stats(self) -> dict:
+        files = list(self.directory.glob("*.bin"))
+        return {
+            **self.stats,
+            'files': len(files),
+            'disk_kb': round(sum(path.stat().st_size for path in files) / 1024, 1),
+        }
+
+
+# 全局实例
+metrics_store = MetricsStore()
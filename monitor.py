@@ -1,5 +1,7 @@
 # monitor.py
 import asyncio
+import functools
+import hashlib
 import json
 import time
 import os
@@ -10,17 +12,23 @@ from playwright.async_api import async_playwright, TimeoutError as PlaywrightTim
 from config import (
     DYNAMIC_URLS, CHECK_INTERVAL, COOKIE_FILE, HISTORY_FILE,
     MAIL_SAVE_DIR, UP_NAME, BROWSER_CONFIG, BROWSER_RESTART_INTERVAL,
-    HEALTH_CHECK_INTERVAL, P1_TOTAL_FAILURE_THRESHOLD, P2_SUCCESS_RATE_THRESHOLD
+    HEALTH_CHECK_INTERVAL, P1_TOTAL_FAILURE_THRESHOLD, P2_SUCCESS_RATE_THRESHOLD,
+    BROWSER_RECYCLE_MEMORY_MB, BROWSER_MAX_RENDERERS
 )
 from render_comment import CommentRenderer
-from email_utils import send_email
 from config_email import TO_EMAILS, STATUS_MONITOR_EMAILS, EMAIL_USER
 from health_check import HealthChecker
-from logger_config import logger
+from logger_config import logger, perf_logger
 from retry_decorator import BROWSER_RETRY_CONFIG, async_retry
 from performance_monitor import performance_monitor
-from qq_utils import send_qq_message
+from notification_outbox import notification_outbox, CHANNEL_EMAIL, CHANNEL_QQ, PRIORITY_HIGH
+from notification_dispatcher import notification_dispatcher
+from notification_coalescer import notification_coalescer
 from config_qq import QQ_GROUP_IDS
+from tracing import span, traced
+from process_tree import process_tree
+from task_supervisor import task_supervisor
+from event_log import emit, EVENT_CHANGE, EVENT_BROWSER_RECYCLE
 
 
 class Monitor:
@@ -37,6 +45,8 @@ class Monitor:
 
         self.loop_count = 0
         self.is_running = True
+        # 最近一轮监控完成的时间（/healthz 据此判断监控是否卡住）；以启动时间为初始值
+        self.last_cycle_completed = time.time()
         self.current_success = False  # 新增：记录当前轮次是否成功
 
         # 修改：按照UP_NAME存储历史记录，而不是动态ID
@@ -51,6 +61,9 @@ class Monitor:
         self.browser = None
         self.context = None
 
+        # 重启后恢复的挂起通知按事件类型找到 emit
+        notification_coalescer.register(["comment_change"], self._emit_comment_change)
+
     def _migrate_old_history_format(self):
         """迁移旧的历史记录格式（动态ID为键 -> UP_NAME为键）"""
         # 检查是否包含动态ID格式的键（长的数字字符串）
@@ -102,19 +115,22 @@ class Monitor:
     async def restart_browser_if_needed(self):
         """根据轮次定期重启浏览器或执行健康检查"""
 
-        restart_needed = False
+        reason = None
 
         if self.loop_count % BROWSER_RESTART_INTERVAL == 0:
             logger.info("♻️ 达到重启阈值，执行浏览器重启")
-            restart_needed = True
-        elif self.loop_count % HEALTH_CHECK_INTERVAL == 0:
+            reason = "interval"
+        elif self.browser:
+            reason = await self._browser_over_budget()
+        if reason is None and self.loop_count % HEALTH_CHECK_INTERVAL == 0:
             logger.info("🔍 执行健康检查...")
             if self.context and self.browser and not await self.health_checker.comprehensive_check(
-                    await self.context.new_page()):
+                    self.browser, self.context):
                 logger.warning("⚠️ 健康检查失败，准备重启浏览器")
-                restart_needed = True
+                reason = "health"
 
-        if restart_needed:
+        if reason is not None:
+            emit(EVENT_BROWSER_RECYCLE, reason=reason, cycle=self.loop_count)
             await self.safe_close_browser()
             await asyncio.sleep(2)
             await self.initialize_browser()
@@ -122,6 +138,21 @@ class Monitor:
 
         return False
 
+    async def _browser_over_budget(self):
+        """
+        Chromium 进程占用内存或渲染进程数超限时提前回收（采样结果有缓存，每轮调用开销很小）
+
+        返回回收原因（memory / renderers），未超限时返回 None
+        """
+        sample = await process_tree.sample_async()
+        if sample.browser_memory_mb > BROWSER_RECYCLE_MEMORY_MB:
+            logger.warning(f"♻️ 浏览器内存超过 {BROWSER_RECYCLE_MEMORY_MB}MB，执行浏览器重启: {sample.summary()}")
+            return "memory"
+        if sample.renderer_count > BROWSER_MAX_RENDERERS:
+            logger.warning(f"♻️ 渲染进程数超过 {BROWSER_MAX_RENDERERS} 个，执行浏览器重启: {sample.summary()}")
+            return "renderers"
+        return None
+
     def _clean_html_emojis(self, html_text: str) -> str:
         """
         将 HTML 中的表情图片替换为 alt 属性中的文本，而不是直接删除。
@@ -160,7 +191,8 @@ class Monitor:
                 logger.warning("⚠️ 浏览器上下文不存在，跳过本次检查")
                 return False  # 返回False表示失败
 
-            page = await self.context.new_page()
+            with span("dynamic.new_page"):
+                page = await self.context.new_page()
             try:
                 current_html, current_images = await asyncio.wait_for(
                     self.comment_renderer.get_pinned_comment(page, dynamic_id),
@@ -182,11 +214,12 @@ class Monitor:
             last_html = last_record.get("html", "")
             last_images = last_record.get("images", [])
 
-            current_html_cleaned = self._clean_html_emojis(current_html)
-            last_html_cleaned = self._clean_html_emojis(last_html)
+            with span("dynamic.parse"):
+                current_html_cleaned = self._clean_html_emojis(current_html)
+                last_html_cleaned = self._clean_html_emojis(last_html)
 
-            current_text = self.comment_renderer.extract_text_from_html(current_html_cleaned)
-            last_text = self.comment_renderer.extract_text_from_html(last_html_cleaned)
+                current_text = self.comment_renderer.extract_text_from_html(current_html_cleaned)
+                last_text = self.comment_renderer.extract_text_from_html(last_html_cleaned)
 
             logger.info(f"📝 当前文本: {current_text}")
             logger.info(f"📜 上次文本: {last_text if last_text else '无'}")
@@ -194,7 +227,16 @@ class Monitor:
             # 仅文字变化触发通知
             if not last_text or current_text != last_text:
                 logger.info(f"🔔 动态 {dynamic_id} 置顶评论文字变化")
-                await self._send_notification(dynamic_id, current_html, current_images, last_html, last_images)
+                emit(EVENT_CHANGE, source="dynamic", target=dynamic_id, first=not last_text)
+                # 短时间内多次修改合并为一条通知（孤立的修改立即发出）
+                with span("dynamic.notify"):
+                    await notification_coalescer.submit(
+                        "comment_change",
+                        f"comment:{dynamic_id}",
+                        {"dynamic_id": dynamic_id, "last_html": last_html, "last_images": last_images,
+                         "current_html": current_html, "current_images": current_images},
+                        self._emit_comment_change
+                    )
                 # 记录变化到状态监控器
                 if self.status_monitor:
                     self.status_monitor.record_change()
@@ -210,46 +252,65 @@ class Monitor:
             self.health_checker.increment_failure()
             return False  # 返回False表示失败
 
+    async def _emit_comment_change(self, first, last, count):
+        """合并窗口发出：从第一次变化前的内容到最后一次变化后的内容"""
+        if count > 1 and first["last_html"] == last["current_html"]:
+            logger.info(f"♻️ 动态 {last['dynamic_id']} 置顶评论 {count} 次修改后恢复原样，跳过通知")
+            return
+        await self._send_notification(
+            last["dynamic_id"], last["current_html"], last["current_images"],
+            first["last_html"], first["last_images"]
+        )
+
+    @traced("notify.comment")
     async def _send_notification(self, dynamic_id, current_html, current_images, last_html, last_images):
-        """发送邮件和QQ通知"""
+        """渲染邮件和QQ通知并分发到发件箱（QQ 先入队，不等待邮件渲染和备份写盘）"""
         try:
+            detected_at = time.time()
             current_time = time.strftime("%Y-%m-%d %H:%M:%S")
-            email_body = self.comment_renderer.render_email_content(
-                dynamic_id, current_html, current_images, last_html, last_images, current_time
-            )
 
-            timestamp = time.strftime("%Y%m%d%H%M%S")
-            file_name = f"{UP_NAME}-{timestamp}.html"
-            file_path = os.path.join(self.mail_save_dir, file_name)
-            Path(self.mail_save_dir).mkdir(parents=True, exist_ok=True)
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(email_body)
-            logger.info(f"✅ 邮件内容已保存: {file_path}")
-
-            # 发送邮件
-            email_success = await asyncio.to_thread(
-                send_email,
-                subject=f"【{UP_NAME}动态监控】瞳瞳空间更新啦",
-                content=email_body
-            )
-            if email_success:
-                logger.info("✅ 邮件发送成功")
-            else:
-                logger.error("❌❌ 邮件发送失败")
-
-            # 修改：传入 current_images 参数
-            qq_message = self.comment_renderer.generate_qq_message(
-                UP_NAME, dynamic_id, current_html, current_time, current_images  # 添加 current_images
-            )
-            qq_results = await send_qq_message(qq_message)
+            # 同一次变化只通知一次（防止崩溃重启后重复推送）
+            dedupe_key = "comment:" + hashlib.sha1(
+                f"{dynamic_id}\n{last_html}\n{current_html}".encode("utf-8")
+            ).hexdigest()
+
+            def render_qq():
+                # 修改：传入 current_images 参数
+                message = self.comment_renderer.generate_qq_message(
+                    UP_NAME, dynamic_id, current_html, current_time, current_images  # 添加 current_images
+                )
+                return {"message": message}
 
-            qq_success_count = sum(1 for r in qq_results if r is True)
-            if qq_results:
-                logger.info(f"✅ QQ消息发送结果: {qq_success_count}/{len(qq_results)} 成功")
+            def render_email():
+                email_body = self.comment_renderer.render_email_content(
+                    dynamic_id, current_html, current_images, last_html, last_images, current_time
+                )
+                return {"subject": f"【{UP_NAME}动态监控】瞳瞳空间更新啦", "content": email_body}
+
+            await notification_dispatcher.dispatch(
+                "comment_change",
+                {CHANNEL_QQ: render_qq, CHANNEL_EMAIL: render_email},
+                priority=PRIORITY_HIGH,
+                dedupe_key=dedupe_key,
+                detected_at=detected_at,
+                # 邮件备份在入队后于线程中写入，不阻塞投递
+                archivers={CHANNEL_EMAIL: lambda payload: self._save_email_backup(payload["content"])}
+            )
 
         except Exception as e:
             logger.error(f"❌❌ 发送通知出错: {e}")
 
+    def _save_email_backup(self, email_body):
+        """保存邮件内容备份（阻塞函数，在线程中执行）"""
+        timestamp = time.strftime("%Y%m%d%H%M%S")
+        file_name = f"{UP_NAME}-{timestamp}.html"
+        file_path = os.path.join(self.mail_save_dir, file_name)
+        Path(self.mail_save_dir).mkdir(parents=True, exist_ok=True)
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(email_body)
+        logger.info(f"✅ 邮件内容已保存: {file_path}")
+
+    @traced("cycle.save_history")
     def _save_history(self):
         """保存历史记录到文件"""
         try:
@@ -266,7 +327,8 @@ class Monitor:
         logger.info(f"🔍 第 {self.loop_count} 轮检查开始")
         self.health_checker.last_health_check = time.time()
 
-        await self.restart_browser_if_needed()
+        with span("cycle.browser_maintenance"):
+            await self.restart_browser_if_needed()
         await performance_monitor.record_memory_usage()
 
         # 记录循环开始时间
@@ -309,9 +371,10 @@ class Monitor:
         )
 
         self._save_history()
+        self.last_cycle_completed = time.time()
         # 将 loop_count 作为参数传入
         stats = self.health_checker.get_stats(total_loops=self.loop_count)
-        logger.info(f"📊 本轮检查完成 - {stats}")
+        perf_logger.info(f"📊 本轮检查完成 - {stats}")
         # 记录状态信息到日志
         if self.status_monitor:
             status_info = self.status_monitor.get_status_info()
@@ -334,10 +397,16 @@ class Monitor:
             f"📊 性能监控配置: P1告警阈值={P1_TOTAL_FAILURE_THRESHOLD}次失败, P2告警阈值={P2_SUCCESS_RATE_THRESHOLD * 100:.0f}%成功率")
 
         try:
+            # 单独运行 monitor.py 时也需要投递 worker 和恢复挂起的合并通知（已启动则忽略）
+            await notification_outbox.start()
+            await notification_coalescer.start()
+
             await self.initialize_browser()
 
             # 启动定期性能报告任务
-            perf_task = asyncio.create_task(performance_monitor.periodic_report(interval_minutes=60))
+            perf_task = task_supervisor.supervise(
+                functools.partial(performance_monitor.periodic_report, interval_minutes=60), "performance_report"
+            )
             logger.info("📊 定期性能报告任务已启动")
 
             while self.is_running:
@@ -386,5 +455,7 @@ class Monitor:
 
 # -------------------- 程序入口 --------------------
 if __name__ == "__main__":
+    # 与 main.py 相同：恢复跨重启的累计统计和滑动窗口
+    performance_monitor.restore()
     monitor = Monitor()
     asyncio.run(monitor.run())
@@ -5,9 +5,14 @@ from datetime import datetime
 from logger_config import logger
 from live_monitor import live_monitor
 from config import LIVE_ROOM_ID, LIVE_CHECK_INTERVAL
-from email_utils import send_email
-from qq_utils import send_qq_message
+from notification_outbox import CHANNEL_EMAIL, CHANNEL_QQ, PRIORITY_URGENT, PRIORITY_HIGH
+from notification_dispatcher import notification_dispatcher
+from notification_coalescer import notification_coalescer
 from config_email import TO_EMAILS, STATUS_MONITOR_EMAILS
+from metrics import LIVE_CHECK_DURATION
+from tracing import traced
+from metrics_store import metrics_store, SERIES_LIVE
+from event_log import emit, EVENT_LIVE_CHECK
 
 
 class LiveMonitorScheduler:
@@ -18,6 +23,8 @@ class LiveMonitorScheduler:
         self.is_running = False
         self.last_successful_check = None
         self.check_count = 0
+        # 重启后恢复的挂起通知按事件类型找到 emit
+        notification_coalescer.register(["live_start", "live_end", "title_change"], self._emit_live_change)
 
     async def start_monitoring(self):
         """开始监控直播间"""
@@ -54,7 +61,12 @@ class LiveMonitorScheduler:
         self.check_count += 1
 
         try:
+            check_start = time.perf_counter()
             live_info = await live_monitor.check_live_status(LIVE_ROOM_ID)
+            duration = time.perf_counter() - check_start
+            LIVE_CHECK_DURATION.observe(duration)
+            metrics_store.append(SERIES_LIVE, duration, bool(live_info))
+            emit(EVENT_LIVE_CHECK, room_id=LIVE_ROOM_ID, success=bool(live_info), duration=round(duration, 3))
 
             if live_info:
                 self.last_successful_check = time.time()
@@ -71,32 +83,54 @@ class LiveMonitorScheduler:
             self.logger.error(f"❌❌ 执行直播检查异常: {e}")
 
     async def send_live_notification(self, live_info: dict):
-        """发送直播状态变化通知"""
+        """直播状态变化进入合并窗口：开播立即发出，紧随其后的标题修改等合并为一条"""
+        await notification_coalescer.submit(
+            live_info.get('change_type'), f"live:{live_info['room_id']}", live_info, self._emit_live_change
+        )
+
+    async def _emit_live_change(self, first: dict, last: dict, count: int):
+        """按合并区间首尾状态确定实际的变化类型"""
+        if count == 1:
+            await self.dispatch_live_notification(last)
+            return
+
+        live_info = dict(last)
+        live_info['previous_title'] = first.get('previous_title')
+        live_info['previous_live_status'] = first.get('previous_live_status')
+        if live_info['previous_live_status'] != live_info.get('live_status'):
+            live_info['change_type'] = 'live_start' if live_info.get('live_status') == 1 else 'live_end'
+        elif live_info['previous_title'] != live_info.get('title'):
+            live_info['change_type'] = 'title_change'
+        else:
+            self.logger.info(f"♻️♻️ 直播间 {count} 次状态变化后恢复原样，跳过通知")
+            return
+        await self.dispatch_live_notification(live_info)
+
+    @traced("notify.live")
+    async def dispatch_live_notification(self, live_info: dict):
+        """发送直播状态变化通知（QQ 与邮件分别入队并发投递，开播提醒优先）"""
         try:
-            # 生成邮件内容
-            subject, email_content = live_monitor.format_email_content(live_info)
-
-            # 发送邮件通知
-            email_success = await asyncio.to_thread(
-                send_email,
-                subject=subject,
-                content=email_content,
-                to_emails=TO_EMAILS
+            detected_at = time.time()
+            priority = PRIORITY_URGENT if live_info.get('change_type') == 'live_start' else PRIORITY_HIGH
+            # 去重键只用稳定字段（开播时间、标题），同一次变化被重复检测到时不会重复通知
+            dedupe_key = (f"live:{live_info['room_id']}:{live_info.get('change_type')}:"
+                          f"{live_info.get('live_time', '')}:{live_info.get('title', '')}")
+
+            def render_qq():
+                return {"message": live_monitor.generate_qq_message(live_info)}
+
+            def render_email():
+                subject, email_content = live_monitor.format_email_content(live_info)
+                return {"subject": subject, "content": email_content, "to_emails": TO_EMAILS}
+
+            await notification_dispatcher.dispatch(
+                f"live_{live_info.get('change_type')}",
+                {CHANNEL_QQ: render_qq, CHANNEL_EMAIL: render_email},
+                priority=priority,
+                dedupe_key=dedupe_key,
+                detected_at=detected_at
             )
 
-            if email_success:
-                self.logger.info("✅ 直播状态邮件发送成功")
-            else:
-                self.logger.error("❌❌❌❌ 直播状态邮件发送失败")
-
-            # 生成QQ消息
-            qq_message = live_monitor.generate_qq_message(live_info)
-            qq_results = await send_qq_message(qq_message)
-
-            qq_success_count = sum(1 for r in qq_results if r is True)
-            if qq_results:
-                self.logger.info(f"✅ QQ直播通知发送结果: {qq_success_count}/{len(qq_results)} 成功")
-
         except Exception as e:
             self.logger.error(f"❌❌❌❌ 发送直播通知异常: {e}")
 
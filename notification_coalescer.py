@@ -0,0 +1,224 @@
+# notification_coalescer.py
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set
+
+from logger_config import logger
+from config import NOTIFY_COALESCE_RULES, NOTIFY_COALESCE_BYPASS
+from notification_outbox import notification_outbox, OutboxStore
+from task_supervisor import task_supervisor
+
+# emit(first_event, last_event, count)：first/last 为合并区间内第一个和最后一个事件
+EmitFunc = Callable[[Dict[str, Any], Dict[str, Any], int], Awaitable[None]]
+
+
+class _Window:
+    __slots__ = ('until', 'deadline', 'first', 'last', 'count', 'emit', 'event_type', 'timer')
+
+    def __init__(self, until: float):
+        self.until = until  # 合并窗口结束时间
+        self.deadline = 0.0  # 挂起事件最晚发出时间（第一个挂起事件 + max_delay）
+        self.first: Optional[Dict[str, Any]] = None
+        self.last: Optional[Dict[str, Any]] = None
+        self.count = 0
+        self.emit: Optional[EmitFunc] = None
+        self.event_type = ""
+        self.timer: Optional[asyncio.Task] = None
+
+
+class NotificationCoalescer:
+    """
+    通知合并：检测与投递之间的合并窗口
+
+    - 前沿触发：窗口外的事件立即发出，孤立事件不增加任何延迟，同时为该目标打开合并窗口
+    - 窗口内的后续事件挂起，每来一个事件窗口顺延，但最晚不超过 max_delay，
+      窗口结束时合并为一条通知（第一个挂起事件的旧状态 → 最后一个事件的新状态）
+    - 绕过规则中的事件类型（如开播）始终立即发出，同时为该目标打开合并窗口
+    - 同一目标（如同一直播间）的不同事件类型共用一个窗口，由 emit 根据首尾状态决定通知内容
+    - 挂起的事件同步写入发件箱的 SQLite 数据库，发出后删除；进程崩溃重启后由 start() 恢复，
+      按事件类型找到 register() 注册的 emit 后继续等待窗口结束（检测方的历史记录已更新，不会再次检测到）
+    """
+
+    def __init__(self, rules: Dict[str, Dict[str, float]] = None, bypass=None, store: Optional[OutboxStore] = None):
+        self.rules = NOTIFY_COALESCE_RULES if rules is None else rules
+        self.bypass = set(NOTIFY_COALESCE_BYPASS if bypass is None else bypass)
+        self.store = notification_outbox.store if store is None else store
+        self._windows: Dict[str, _Window] = {}
+        self._timers: Set[asyncio.Task] = set()
+        self._emitters: Dict[str, EmitFunc] = {}
+        self._started = False
+
+        # 统计信息
+        self.stats = {'received': 0, 'emitted': 0, 'bypassed': 0, 'coalesced': 0, 'merged_notifications': 0,
+                      'restored': 0}
+
+    def register(self, event_types: Iterable[str], emit: EmitFunc):
+        """注册事件类型的 emit，用于发出上次运行时挂起、重启后恢复的事件"""
+        for event_type in event_types:
+            self._emitters[event_type] = emit
+        if self._started:
+            self._arm_restored()
+
+    async def start(self):
+        """恢复上次运行时挂起在合并窗口中的事件（可重复调用）"""
+        if self._started:
+            return
+        self._started = True
+        try:
+            rows = self.store.load_pending()
+        except Exception as e:
+            logger.error(f"❌ 读取挂起的合并通知失败: {e}")
+            return
+
+        now, wall_now = time.monotonic(), time.time()
+        for row in rows:
+            if row["target"] in self._windows:
+                continue
+            window = _Window(now + max(0.0, row["due_at"] - wall_now))
+            window.deadline = now + max(0.0, row["deadline"] - wall_now)
+            window.first = json.loads(row["first_event"])
+            window.last = json.loads(row["last_event"])
+            window.count = row["count"]
+            window.event_type = row["event_type"]
+            self._windows[row["target"]] = window
+            self.stats['restored'] += 1
+        if rows:
+            logger.info(f"♻️ 恢复了 {len(rows)} 个合并窗口中挂起的通知")
+        self._arm_restored()
+
+    async def submit(self, event_type: str, target: str, event: Dict[str, Any], emit: EmitFunc):
+        """提交一个事件；需要立即发出时在当前协程中调用 emit，否则挂起到窗口结束"""
+        self.stats['received'] += 1
+        rule = self.rules.get(event_type)
+        now = time.monotonic()
+        window = self._windows.get(target)
+
+        if event_type in self.bypass or rule is None:
+            if event_type in self.bypass:
+                self.stats['bypassed'] += 1
+            if rule is not None:
+                self._open_window(target, now + rule['window'])
+            await self._emit(emit, event, event, 1)
+            return
+
+        if window is None or (window.until <= now and window.count == 0):
+            # 前沿：立即发出，并打开合并窗口
+            self._open_window(target, now + rule['window'])
+            await self._emit(emit, event, event, 1)
+            return
+
+        # 窗口内：挂起，窗口顺延但不超过最大延迟
+        if window.count == 0:
+            window.first = event
+            window.deadline = now + rule['max_delay']
+        window.last = event
+        window.count += 1
+        window.emit = emit
+        window.event_type = event_type
+        window.until = min(max(window.until, now + rule['window']), window.deadline)
+        self.stats['coalesced'] += 1
+        logger.info(f"⏳ {event_type} 通知进入合并窗口 ({target}, 已挂起 {window.count} 个, "
+                    f"{window.until - now:.0f}秒后发出)")
+        # 返回前落盘：调用方随后会把新状态写入历史记录
+        self._persist(target, window)
+
+        if window.timer is None or window.timer.done():
+            self._arm(target, window)
+
+    def _arm(self, target: str, window: _Window):
+        window.timer = task_supervisor.spawn(self._flush_when_due(target, window), f"coalescer.{window.event_type}")
+        self._timers.add(window.timer)
+        window.timer.add_done_callback(self._timers.discard)
+
+    def _arm_restored(self):
+        """为已恢复、且 emit 已注册的挂起事件启动定时发出"""
+        for target, window in self._windows.items():
+            if window.count and window.emit is None and window.event_type in self._emitters \
+                    and (window.timer is None or window.timer.done()):
+                self._arm(target, window)
+
+    def _persist(self, target: str, window: _Window):
+        offset = time.time() - time.monotonic()
+        try:
+            self.store.save_pending(target, window.event_type, window.first, window.last, window.count,
+                                    window.until + offset, window.deadline + offset)
+        except Exception as e:
+            logger.error(f"❌ 保存挂起的合并通知失败 ({target}): {e}")
+
+    def _forget(self, target: str):
+        try:
+            self.store.delete_pending(target)
+        except Exception as e:
+            logger.error(f"❌ 删除已发出的合并通知失败 ({target}): {e}")
+
+    def _open_window(self, target: str, until: float):
+        window = self._windows.get(target)
+        if window is None:
+            self._windows[target] = _Window(until)
+        else:
+            window.until = max(window.until, until)
+            if window.count:
+                window.until = min(window.until, window.deadline)
+        self._prune(time.monotonic())
+
+    def _prune(self, now: float):
+        """移除已过期且没有挂起事件的窗口"""
+        for target in [t for t, w in self._windows.items() if w.until <= now and w.count == 0]:
+            del self._windows[target]
+
+    async def _flush_when_due(self, target: str, window: _Window):
+        while window.count:
+            wait = window.until - time.monotonic()
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+        await self._flush(target, window)
+
+    async def _flush(self, target: str, window: _Window):
+        emit = window.emit or self._emitters.get(window.event_type)
+        if not window.count or emit is None:
+            # 恢复的事件尚未注册 emit 时保留在磁盘上，下次启动继续发出
+            return
+        first, last, count = window.first, window.last, window.count
+        window.first = window.last = window.emit = None
+        window.count = 0
+        # 合并发出后继续保持一个窗口，持续的连续变更仍会被合并
+        rule = self.rules.get(window.event_type, {'window': 0})
+        window.until = time.monotonic() + rule['window']
+
+        self.stats['merged_notifications'] += 1
+        logger.info(f"🧩 合并 {count} 个 {window.event_type} 事件为一条通知 ({target})")
+        await self._emit(emit, first, last, count)
+        # emit 已写入发件箱；发出期间又有新事件挂起时保留其记录（submit 已落盘）
+        if not window.count:
+            self._forget(target)
+
+    async def _emit(self, emit: EmitFunc, first: Dict[str, Any], last: Dict[str, Any], count: int):
+        self.stats['emitted'] += 1
+        try:
+            await emit(first, last, count)
+        except Exception as e:
+            logger.error(f"❌ 合并通知发出失败: {e}")
+
+    async def flush_all(self):
+        """立即发出所有挂起的通知（关闭前调用，避免丢失）"""
+        for target, window in list(self._windows.items()):
+            await self._flush(target, window)
+        # 挂起事件已全部发出，剩余的定时任务只是在等待
+        timers = list(self._timers)
+        for task in timers:
+            task.cancel()
+        if timers:
+            await asyncio.gather(*timers, return_exceptions=True)
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            'pending': sum(window.count for window in self._windows.values()),
+            'open_windows': len(self._windows),
+        }
+
+
+# 全局实例
+notification_coalescer = NotificationCoalescer()
@@ -0,0 +1,118 @@
+# notification_dispatcher.py
+import asyncio
+import time
+from typing import Any, Callable, Dict, Optional
+
+from logger_config import logger
+from notification_outbox import (
+    enqueue_email, enqueue_qq, notification_outbox, CHANNEL_EMAIL, CHANNEL_QQ, PRIORITY_NORMAL
+)
+from tracing import tracer
+from event_log import emit, EVENT_NOTIFICATION
+from task_supervisor import task_supervisor
+
+# 各通道的入队函数：payload 字段与入队函数参数一一对应
+_ENQUEUE_FUNCS: Dict[str, Callable[..., bool]] = {
+    CHANNEL_EMAIL: enqueue_email,
+    CHANNEL_QQ: enqueue_qq,
+}
+
+
+class NotificationDispatcher:
+    """
+    通知分发器：每个事件按通道各渲染一次，逐个入队
+
+    - 渲染顺序即入队顺序，轻量的 QQ 消息放在前面，先入队先投递
+    - 渲染在线程中执行，事件循环保持空闲，已入队通道的 worker 立即开始投递，
+      不必等待后面通道（如大体积邮件 HTML）渲染完成
+    - 各通道由发件箱中独立的 worker 并发投递，分别有自己的超时，
+      检测到送达的耗时按通道记录在 notification_outbox 的统计中
+    - 邮件备份等磁盘写入在入队之后放到线程中后台执行，不阻塞入队
+    """
+
+    def __init__(self):
+        self.stats: Dict[str, Dict[str, Any]] = {}
+
+    async def dispatch(self, event_type: str, renderers: Dict[str, Callable[[], Dict[str, Any]]],
+                       priority: int = PRIORITY_NORMAL, dedupe_key: Optional[str] = None,
+                       detected_at: Optional[float] = None,
+                       archivers: Optional[Dict[str, Callable[[Dict[str, Any]], None]]] = None) -> Dict[str, bool]:
+        """
+        渲染并分发一个事件
+
+        Args:
+            event_type: 事件类型（仅用于日志和统计）
+            renderers: {通道: 渲染函数}，渲染函数返回该通道入队函数所需的参数字典，
+                       在线程中执行，须为不依赖事件循环的纯函数
+            priority: 发件箱优先级
+            dedupe_key: 去重键（各通道会自动加上通道前缀）
+            detected_at: 检测到事件的时间戳，用于统计端到端送达耗时
+            archivers: {通道: 阻塞的归档函数}，在该通道入队后于线程中后台执行
+
+        Returns:
+            {通道: 是否成功入队}
+        """
+        detected_at = detected_at or time.time()
+        archivers = archivers or {}
+        results = {}
+
+        for channel, render in renderers.items():
+            start = time.perf_counter()
+            try:
+                payload = await asyncio.to_thread(render)
+            except Exception as e:
+                logger.error(f"❌ 渲染{channel}通知失败 ({event_type}): {e}")
+                results[channel] = False
+                emit(EVENT_NOTIFICATION, event=event_type, channel=channel, ok=False, error="render")
+                continue
+            render_time = time.perf_counter() - start
+
+            results[channel] = _ENQUEUE_FUNCS[channel](
+                **payload, priority=priority, dedupe_key=dedupe_key, detected_at=detected_at
+            )
+            self._record(channel, render_time, results[channel])
+            emit(EVENT_NOTIFICATION, event=event_type, channel=channel, ok=results[channel],
+                 render_ms=round(render_time * 1000, 1))
+
+            if channel in archivers:
+                self.run_in_background(archivers[channel], payload)
+
+        logger.info(
+            f"📨 {event_type} 通知已分发: "
+            + ", ".join(f"{channel}={'✅' if ok else '❌'}" for channel, ok in results.items())
+        )
+        return results
+
+    def run_in_background(self, func: Callable, *args):
+        """在线程中执行阻塞操作（如写邮件备份），不等待结果"""
+        # 由 task_supervisor 持有引用并记录异常，关闭时等待写入完成
+        task_supervisor.spawn(asyncio.to_thread(func, *args), f"notification.{getattr(func, '__name__', 'archive')}")
+
+    def _record(self, channel: str, render_time: float, enqueued: bool):
+        stats = self.stats.setdefault(channel, {'events': 0, 'failed': 0, 'total_render': 0.0, 'max_render': 0.0})
+        stats['events'] += 1
+        if not enqueued:
+            stats['failed'] += 1
+        stats['total_render'] += render_time
+        stats['max_render'] = max(stats['max_render'], render_time)
+        if tracer.enabled:
+            tracer.record(f"notify.render_{channel}", render_time)
+
+    def get_stats(self) -> dict:
+        channels = {}
+        for channel, stats in self.stats.items():
+            events = stats['events']
+            channels[channel] = {
+                'events': events,
+                'enqueue_failed': stats['failed'],
+                'avg_render_time': f"{stats['total_render'] / events * 1000:.2f}ms" if events else "0.00ms",
+                'max_render_time': f"{stats['max_render'] * 1000:.2f}ms",
+            }
+        return {
+            'channels': channels,
+            'delivery': notification_outbox.get_stats()['channels'],
+        }
+
+
+# 全局实例
+notification_dispatcher = NotificationDispatcher()
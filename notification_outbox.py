@@ -0,0 +1,577 @@
+# notification_outbox.py
+import asyncio
+import functools
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+from logger_config import logger
+from config import (
+    OUTBOX_DB_FILE, OUTBOX_MAX_ATTEMPTS, OUTBOX_RETRY_BASE_DELAY, OUTBOX_RETRY_MAX_DELAY,
+    OUTBOX_DEDUPE_WINDOW_SECONDS, OUTBOX_RETENTION_HOURS, OUTBOX_WORKER_ERROR_DELAY, NOTIFY_CHANNEL_TIMEOUTS
+)
+from config_qq import QQ_GROUP_IDS, QQ_PUSH_ENABLED
+from email_utils import send_email_report_async
+from qq_utils import qq_sender
+from qq_scheduler import QQThrottledError
+from metrics import NOTIFICATION_LATENCY
+from task_supervisor import task_supervisor
+
+# ===== 优先级（数值越小越先投递）=====
+PRIORITY_URGENT = 0  # 开播提醒
+PRIORITY_HIGH = 1  # 置顶评论更新、下播/标题变更、告警
+PRIORITY_NORMAL = 2
+PRIORITY_LOW = 3  # 性能报告等
+
+# 通道名称
+CHANNEL_EMAIL = "email"
+CHANNEL_QQ = "qq"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    dedupe_key TEXT,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    last_error TEXT,
+    detected_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_ready ON outbox (channel, status, priority, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_outbox_dedupe ON outbox (dedupe_key, created_at);
+CREATE TABLE IF NOT EXISTS coalesce_pending (
+    target TEXT PRIMARY KEY,
+    event_type TEXT NOT NULL,
+    first_event TEXT NOT NULL,
+    last_event TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    due_at REAL NOT NULL,
+    deadline REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class OutboxStore:
+    """
+    基于 SQLite 的发件箱日志
+
+    状态流转: pending -> inflight -> done / pending(重试) / dead
+    进程崩溃时遗留的 inflight 记录在下次启动时恢复为 pending。
+    """
+
+    def __init__(self, db_file, readonly: bool = False):
+        self.db_file = str(db_file)
+        if readonly:
+            # 只读连接：供统计查询在线程中使用，WAL 模式下不阻塞 worker 的写入
+            self.conn = sqlite3.connect(f"{Path(self.db_file).resolve().as_uri()}?mode=ro", uri=True,
+                                        check_same_thread=False)
+            self.conn.row_factory = sqlite3.Row
+            return
+        self.conn = sqlite3.connect(self.db_file, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """兼容旧版本数据库：补齐新增字段"""
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(outbox)")}
+        if "detected_at" not in columns:
+            self.conn.execute("ALTER TABLE outbox ADD COLUMN detected_at REAL")
+
+    def enqueue(self, channel: str, payload: Dict[str, Any], priority: int,
+                dedupe_key: Optional[str] = None, dedupe_window: float = 0,
+                detected_at: Optional[float] = None) -> Optional[int]:
+        """写入一条待投递记录，去重窗口内已存在相同去重键时返回 None"""
+        now = time.time()
+        with self.conn:
+            if dedupe_key:
+                row = self.conn.execute(
+                    "SELECT id FROM outbox WHERE dedupe_key = ? AND created_at >= ? LIMIT 1",
+                    (dedupe_key, now - dedupe_window)
+                ).fetchone()
+                if row is not None:
+                    return None
+            cursor = self.conn.execute(
+                "INSERT INTO outbox (channel, priority, dedupe_key, payload, next_attempt_at, created_at, updated_at, "
+                "detected_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (channel, priority, dedupe_key, json.dumps(payload, ensure_ascii=False), now, now, now,
+                 detected_at or now)
+            )
+            return cursor.lastrowid
+
+    def claim(self, channel: str) -> Optional[sqlite3.Row]:
+        """取出该通道下优先级最高、已到期的一条记录并标记为 inflight"""
+        now = time.time()
+        with self.conn:
+            row = self.conn.execute(
+                "SELECT * FROM outbox WHERE channel = ? AND status = 'pending' AND next_attempt_at <= ? "
+                "ORDER BY priority, id LIMIT 1",
+                (channel, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                "UPDATE outbox SET status = 'inflight', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (now, row["id"])
+            )
+            return row
+
+    def next_due_time(self, channel: str) -> Optional[float]:
+        row = self.conn.execute(
+            "SELECT MIN(next_attempt_at) AS due FROM outbox WHERE channel = ? AND status = 'pending'",
+            (channel,)
+        ).fetchone()
+        return row["due"] if row else None
+
+    def mark_done(self, item_id: int):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE outbox SET status = 'done', last_error = NULL, updated_at = ? WHERE id = ?",
+                (time.time(), item_id)
+            )
+
+    def mark_retry(self, item_id: int, delay: float, error: str, payload: Optional[Dict[str, Any]] = None):
+        now = time.time()
+        with self.conn:
+            if payload is not None:
+                self.conn.execute(
+                    "UPDATE outbox SET status = 'pending', next_attempt_at = ?, last_error = ?, payload = ?, "
+                    "updated_at = ? WHERE id = ?",
+                    (now + delay, error, json.dumps(payload, ensure_ascii=False), now, item_id)
+                )
+            else:
+                self.conn.execute(
+                    "UPDATE outbox SET status = 'pending', next_attempt_at = ?, last_error = ?, updated_at = ? "
+                    "WHERE id = ?",
+                    (now + delay, error, now, item_id)
+                )
+
+    def defer(self, item_id: int, delay: float, reason: str, payload: Optional[Dict[str, Any]] = None):
+        """延后投递（如通道限流冷却中），不计入尝试次数"""
+        now = time.time()
+        with self.conn:
+            if payload is not None:
+                self.conn.execute(
+                    "UPDATE outbox SET status = 'pending', attempts = MAX(attempts - 1, 0), next_attempt_at = ?, "
+                    "last_error = ?, payload = ?, updated_at = ? WHERE id = ?",
+                    (now + delay, reason, json.dumps(payload, ensure_ascii=False), now, item_id)
+                )
+            else:
+                self.conn.execute(
+                    "UPDATE outbox SET status = 'pending', attempts = MAX(attempts - 1, 0), next_attempt_at = ?, "
+                    "last_error = ?, updated_at = ? WHERE id = ?",
+                    (now + delay, reason, now, item_id)
+                )
+
+    def mark_dead(self, item_id: int, error: str):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE outbox SET status = 'dead', last_error = ?, updated_at = ? WHERE id = ?",
+                (error, time.time(), item_id)
+            )
+
+    def release(self, item_id: int):
+        """投递被中断（如程序退出），放回队列且不计入尝试次数"""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE outbox SET status = 'pending', attempts = MAX(attempts - 1, 0), updated_at = ? WHERE id = ?",
+                (time.time(), item_id)
+            )
+
+    def recover_inflight(self) -> int:
+        with self.conn:
+            cursor = self.conn.execute(
+                "UPDATE outbox SET status = 'pending', updated_at = ? WHERE status = 'inflight'",
+                (time.time(),)
+            )
+            return cursor.rowcount
+
+    def purge(self, older_than: float) -> int:
+        with self.conn:
+            cursor = self.conn.execute(
+                "DELETE FROM outbox WHERE status IN ('done', 'dead') AND updated_at < ?",
+                (older_than,)
+            )
+            return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        rows = self.conn.execute("SELECT status, COUNT(*) AS n FROM outbox GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def oldest_pending_age(self) -> float:
+        row = self.conn.execute(
+            "SELECT MIN(created_at) AS oldest FROM outbox WHERE status IN ('pending', 'inflight')"
+        ).fetchone()
+        return time.time() - row["oldest"] if row and row["oldest"] else 0.0
+
+    # 合并窗口中挂起的事件（见 notification_coalescer）：检测结果已写入历史记录，
+    # 挂起期间进程崩溃时由这里恢复，否则该变化再也不会被检测到
+    def save_pending(self, target: str, event_type: str, first: Dict[str, Any], last: Dict[str, Any],
+                     count: int, due_at: float, deadline: float):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO coalesce_pending (target, event_type, first_event, last_event, count, "
+                "due_at, deadline, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (target, event_type, json.dumps(first, ensure_ascii=False, default=str),
+                 json.dumps(last, ensure_ascii=False, default=str), count, due_at, deadline, time.time())
+            )
+
+    def delete_pending(self, target: str):
+        with self.conn:
+            self.conn.execute("DELETE FROM coalesce_pending WHERE target = ?", (target,))
+
+    def load_pending(self) -> List[sqlite3.Row]:
+        return self.conn.execute("SELECT * FROM coalesce_pending ORDER BY due_at").fetchall()
+
+    def close(self):
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+
+class PartialDelivery:
+    """
+    投递函数的部分成功结果：已送达的部分不再重发，剩余部分按 payload 重试
+
+    例如邮件只有部分收件人临时失败时，payload 中只保留这些收件人
+    """
+
+    __slots__ = ('payload', 'error')
+
+    def __init__(self, payload: Dict[str, Any], error: str):
+        self.payload = payload
+        self.error = error
+
+
+class Deferred:
+    """
+    投递函数的延后结果：通道暂时不能发送（如限流冷却），delay 秒后重新投递，不计入尝试次数；
+    已送达一部分时 payload 为剩余部分
+    """
+
+    __slots__ = ('delay', 'reason', 'payload')
+
+    def __init__(self, delay: float, reason: str, payload: Optional[Dict[str, Any]] = None):
+        self.delay = delay
+        self.reason = reason
+        self.payload = payload
+
+
+DeliveryHandler = Callable[[Dict[str, Any]], Awaitable[Union[bool, PartialDelivery, Deferred]]]
+
+
+class NotificationOutbox:
+    """
+    通知发件箱：检测逻辑只负责入队，后台按通道投递
+
+    - 每个通道独立的 worker，互不阻塞
+    - 按优先级投递，开播提醒排在性能报告之前
+    - 指数退避重试，超过最大次数标记为死信
+    - 去重键防止崩溃重启后重复通知
+    """
+
+    def __init__(self, db_file=OUTBOX_DB_FILE):
+        self.store = OutboxStore(db_file)
+        self.handlers: Dict[str, DeliveryHandler] = {}
+        self.concurrency: Dict[str, int] = {}
+        self.timeouts: Dict[str, float] = {}
+        self._events: Dict[str, asyncio.Event] = {}
+        self._workers: List[asyncio.Task] = []
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self.is_running = False
+
+        # 统计信息
+        self.stats: Dict[str, Dict[str, Any]] = {}
+
+    def register_handler(self, channel: str, handler: DeliveryHandler, concurrency: int = 1,
+                         timeout: Optional[float] = None):
+        """
+        注册通道投递函数：接收 payload，返回是否投递成功，部分成功时返回 PartialDelivery，
+        需要延后时返回 Deferred；timeout 为该通道单次投递超时
+        """
+        self.handlers[channel] = handler
+        self.concurrency[channel] = max(1, concurrency)
+        self.timeouts[channel] = timeout or NOTIFY_CHANNEL_TIMEOUTS.get(channel, 60)
+        self.stats.setdefault(channel, {
+            'enqueued': 0, 'deduplicated': 0, 'delivered': 0, 'partial': 0, 'deferred': 0,
+            'retries': 0, 'dead': 0, 'total_latency': 0.0, 'max_latency': 0.0,
+        })
+
+    # ------------------------------------------------------------------
+    # 入队
+    # ------------------------------------------------------------------
+    def enqueue(self, channel: str, payload: Dict[str, Any], priority: int = PRIORITY_NORMAL,
+                dedupe_key: Optional[str] = None, detected_at: Optional[float] = None) -> bool:
+        """写入发件箱并唤醒对应通道的 worker，返回是否成功入队（去重跳过也视为成功）"""
+        if channel not in self.handlers:
+            logger.error(f"❌ 未注册的通知通道: {channel}")
+            return False
+
+        try:
+            item_id = self.store.enqueue(channel, payload, priority, dedupe_key,
+                                         OUTBOX_DEDUPE_WINDOW_SECONDS, detected_at)
+        except Exception as e:
+            logger.error(f"❌ 通知入队失败: {e}")
+            return False
+
+        if item_id is None:
+            self.stats[channel]['deduplicated'] += 1
+            logger.info(f"♻️ 重复通知已跳过: {dedupe_key}")
+            return True
+
+        self.stats[channel]['enqueued'] += 1
+        logger.debug(f"📥 通知已入队: 通道={channel}, id={item_id}, 优先级={priority}")
+        event = self._events.get(channel)
+        if event is not None:
+            event.set()
+        return True
+
+    # ------------------------------------------------------------------
+    # 生命周期
+    # ------------------------------------------------------------------
+    async def start(self):
+        """启动各通道 worker（可重复调用）"""
+        if self.is_running:
+            return
+        self.is_running = True
+
+        recovered = self.store.recover_inflight()
+        if recovered:
+            logger.info(f"♻️ 恢复了 {recovered} 条上次未完成投递的通知")
+
+        for channel, concurrency in self.concurrency.items():
+            self._events[channel] = asyncio.Event()
+            self._events[channel].set()
+            for index in range(concurrency):
+                self._workers.append(task_supervisor.supervise(
+                    functools.partial(self._worker, channel, index), f"outbox.{channel}.{index}"
+                ))
+        self._maintenance_task = task_supervisor.supervise(self._maintenance, "outbox.maintenance")
+
+        logger.info(f"📮 通知发件箱已启动: 通道={list(self.concurrency)}, 待投递={self.store.counts().get('pending', 0)}")
+
+    async def stop(self, timeout: float = 10):
+        """停止 worker：先等待正在进行的投递完成，超时后取消"""
+        if not self.is_running:
+            return
+        self.is_running = False
+        for event in self._events.values():
+            event.set()
+
+        tasks = list(self._workers)
+        if self._maintenance_task:
+            self._maintenance_task.cancel()
+            tasks.append(self._maintenance_task)
+
+        done, pending = await asyncio.wait(tasks, timeout=timeout) if tasks else (set(), set())
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        self._workers = []
+        self._maintenance_task = None
+        logger.info(f"📮 通知发件箱已停止: {self.store.counts()}")
+
+    # ------------------------------------------------------------------
+    # 投递
+    # ------------------------------------------------------------------
+    async def _worker(self, channel: str, index: int):
+        """单个通道的投递循环；任何一轮出错（包括数据库暂时不可用）只记录日志，稍后继续"""
+        event = self._events[channel]
+        while self.is_running:
+            item = None
+            try:
+                item = self.store.claim(channel)
+                if item is None:
+                    await self._wait_for_work(channel, event)
+                    continue
+                await self._deliver(channel, item)
+            except asyncio.CancelledError:
+                if item is not None:
+                    self.store.release(item["id"])
+                raise
+            except Exception as e:
+                logger.error(f"❌ 发件箱 worker 异常 ({channel}#{index}): {e}")
+                await asyncio.sleep(OUTBOX_WORKER_ERROR_DELAY)
+
+    async def _wait_for_work(self, channel: str, event: asyncio.Event):
+        """等待新通知入队或最早的重试到期（最多 60 秒）"""
+        event.clear()
+        due = self.store.next_due_time(channel)
+        wait_time = max(0.0, due - time.time()) if due is not None else 60
+        try:
+            await asyncio.wait_for(event.wait(), timeout=min(wait_time, 60))
+        except asyncio.TimeoutError:
+            pass
+
+    async def _deliver(self, channel: str, item: sqlite3.Row):
+        payload = json.loads(item["payload"])
+        stats = self.stats[channel]
+
+        error = ""
+        retry_payload = None
+        try:
+            success = await asyncio.wait_for(self.handlers[channel](payload), timeout=self.timeouts[channel])
+            if isinstance(success, PartialDelivery):
+                retry_payload, error, success = success.payload, success.error, False
+                stats['partial'] += 1
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            success = False
+            error = f"投递超时（>{self.timeouts[channel]}秒）"
+        except Exception as e:
+            success = False
+            error = str(e)
+
+        if isinstance(success, Deferred):
+            self.store.defer(item["id"], success.delay, success.reason, success.payload)
+            stats['deferred'] += 1
+            logger.info(f"⏸️ 通知延后 {success.delay:.0f}秒投递: 通道={channel}, id={item['id']}, 原因={success.reason}")
+            return
+
+        if success:
+            self.store.mark_done(item["id"])
+            # 从检测到变化到送达的端到端耗时
+            latency = time.time() - (item["detected_at"] or item["created_at"])
+            stats['delivered'] += 1
+            stats['total_latency'] += latency
+            stats['max_latency'] = max(stats['max_latency'], latency)
+            NOTIFICATION_LATENCY.observe(latency, channel)
+            logger.info(f"📤 通知送达: 通道={channel}, id={item['id']}, 检测到送达 {latency:.2f}秒")
+            return
+
+        attempts = item["attempts"] + 1
+        error = error or "投递失败"
+        if attempts >= OUTBOX_MAX_ATTEMPTS:
+            self.store.mark_dead(item["id"], error)
+            stats['dead'] += 1
+            logger.error(f"❌ 通知投递失败 {attempts} 次，已放弃: 通道={channel}, id={item['id']}, 错误={error}")
+            return
+
+        delay = min(OUTBOX_RETRY_BASE_DELAY * (2 ** (attempts - 1)), OUTBOX_RETRY_MAX_DELAY)
+        self.store.mark_retry(item["id"], delay, error, retry_payload)
+        stats['retries'] += 1
+        logger.warning(f"⚠️ 通知投递失败，{delay}秒后重试 (第{attempts}次): 通道={channel}, id={item['id']}")
+
+    async def _maintenance(self):
+        """定期清理过期的已完成 / 死信记录"""
+        while self.is_running:
+            try:
+                removed = self.store.purge(time.time() - OUTBOX_RETENTION_HOURS * 3600)
+                if removed:
+                    logger.info(f"🧹 发件箱清理了 {removed} 条过期记录")
+            except Exception as e:
+                logger.error(f"❌ 发件箱清理失败: {e}")
+            await asyncio.sleep(3600)
+
+    # ------------------------------------------------------------------
+    # 统计
+    # ------------------------------------------------------------------
+    def get_stats(self) -> dict:
+        channels = {}
+        for channel, stats in self.stats.items():
+            delivered = stats['delivered']
+            channels[channel] = {
+                'enqueued': stats['enqueued'],
+                'deduplicated': stats['deduplicated'],
+                'delivered': delivered,
+                'partial': stats['partial'],
+                'deferred': stats['deferred'],
+                'retries': stats['retries'],
+                'dead': stats['dead'],
+                'avg_latency': f"{stats['total_latency'] / delivered:.2f}s" if delivered else "0.00s",
+                'max_latency': f"{stats['max_latency']:.2f}s",
+            }
+        return {
+            'is_running': self.is_running,
+            'queue': self.store.counts(),
+            'oldest_pending_age': f"{self.store.oldest_pending_age():.1f}s",
+            'channels': channels,
+        }
+
+
+# ------------------------------------------------------------------
+# 默认通道
+# ------------------------------------------------------------------
+async def _deliver_email(payload: Dict[str, Any]) -> Union[bool, PartialDelivery]:
+    report = await send_email_report_async(
+        subject=payload["subject"],
+        content=payload["content"],
+        to_emails=payload.get("to_emails")
+    )
+    if not report.failed:
+        # 没有可重试的收件人：永久拒绝的地址重试也不会成功，已在发送时记录
+        return True
+    if report.delivered or report.rejected:
+        # 只对临时失败的收件人重试，已送达的不会重复收到
+        return PartialDelivery({**payload, "to_emails": list(report.failed)}, report.summary())
+    return False
+
+
+async def _deliver_qq(payload: Dict[str, Any]) -> Union[bool, PartialDelivery, Deferred]:
+    # 重试时只发送上次未送达的段（按原顺序），已送达的段不会在群里重复出现
+    chunks = payload.get("chunks") or qq_sender.split(payload["message"])
+    try:
+        remaining = await qq_sender.send_group_chunks(
+            payload["group_id"], chunks, payload.get("priority", PRIORITY_NORMAL)
+        )
+    except QQThrottledError as e:
+        # 冷却结束后再投递，等待冷却不占用投递超时，也不会因此进入死信
+        remaining = e.remaining if e.remaining is not None else chunks
+        return Deferred(e.retry_in, str(e), {**payload, "chunks": remaining} if len(remaining) < len(chunks) else None)
+    except Exception as e:
+        # 部分段已送达时记录进度，重试只发送出错及未送达的段
+        remaining = getattr(e, "remaining", None)
+        if remaining is None or len(remaining) == len(chunks):
+            raise
+        return PartialDelivery({**payload, "chunks": remaining}, f"{len(remaining)}/{len(chunks)} 段未送达: {e!r}")
+
+    if not remaining:
+        return True
+    if len(remaining) < len(chunks):
+        return PartialDelivery({**payload, "chunks": remaining}, f"{len(remaining)}/{len(chunks)} 段未送达")
+    return False
+
+
+# 全局实例
+notification_outbox = NotificationOutbox()
+notification_outbox.register_handler(CHANNEL_EMAIL, _deliver_email, concurrency=1)
+notification_outbox.register_handler(CHANNEL_QQ, _deliver_qq, concurrency=max(1, len(QQ_GROUP_IDS)))
+
+
+def enqueue_email(subject: str, content: str, to_emails: list = None,
+                  priority: int = PRIORITY_NORMAL, dedupe_key: Optional[str] = None,
+                  detected_at: Optional[float] = None) -> bool:
+    """将一封已渲染的邮件写入发件箱"""
+    payload = {"subject": subject, "content": content, "to_emails": to_emails}
+    key = f"{CHANNEL_EMAIL}:{dedupe_key}" if dedupe_key else None
+    return notification_outbox.enqueue(CHANNEL_EMAIL, payload, priority, key, detected_at)
+
+
+def enqueue_qq(message: str, priority: int = PRIORITY_NORMAL, dedupe_key: Optional[str] = None,
+               detected_at: Optional[float] = None) -> bool:
+    """将一条已生成的QQ消息按群拆分写入发件箱，失败重试只针对对应的群"""
+    if not QQ_PUSH_ENABLED:
+        logger.info("QQ推送已禁用，跳过发送")
+        return True
+
+    results = []
+    for group_id in QQ_GROUP_IDS:
+        key = f"{CHANNEL_QQ}:{group_id}:{dedupe_key}" if dedupe_key else None
+        results.append(notification_outbox.enqueue(
+            CHANNEL_QQ, {"group_id": group_id, "message": message, "priority": priority}, priority, key, detected_at
+        ))
+    return all(results)
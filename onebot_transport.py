@@ -0,0 +1,246 @@
+# onebot_transport.py
+import asyncio
+import functools
+import itertools
+import json
+import time
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+from logger_config import logger
+from config import QQ_TRANSPORT, QQ_ACTION_TIMEOUT, QQ_WS_HEARTBEAT_INTERVAL, QQ_WS_RECONNECT_MAX_DELAY
+from task_supervisor import task_supervisor
+
+# 机器人框架返回的"动作不存在"（go-cqhttp / NapCat）；
+# HTTP 404 也可能来自反向代理或地址配置错误，不据此判断，以免整个进程内都不再尝试该动作
+_UNSUPPORTED_RETCODES = (1404,)
+
+
+class UnsupportedActionError(Exception):
+    """机器人框架不支持请求的 OneBot 动作（如部分实现没有 send_group_forward_msg）"""
+
+    def __init__(self, action: str):
+        super().__init__(f"OneBot 动作不受支持: {action}")
+        self.action = action
+
+
+def is_unsupported_action(result: Dict[str, Any]) -> bool:
+    return result.get("status") != "ok" and result.get("retcode") in _UNSUPPORTED_RETCODES
+
+
+class OneBotHTTPTransport:
+    """OneBot v11 HTTP 传输：POST {api_url}/{action}，复用同一个 ClientSession"""
+
+    name = "http"
+
+    def __init__(self, api_url: str, access_token: str = ""):
+        self.api_url = api_url.rstrip("/")
+        self.headers = {"Authorization": f"Bearer {access_token}"} if access_token else {}
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    async def call(self, action: str, params: Dict[str, Any], timeout: float = QQ_ACTION_TIMEOUT) -> Dict[str, Any]:
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(headers=self.headers)
+
+        async with self.session.post(
+                f"{self.api_url}/{action}",
+                json=params,
+                timeout=aiohttp.ClientTimeout(total=timeout)
+        ) as response:
+            if response.status != 200:
+                # 保留状态码和 Retry-After，供上层判断是否被限流
+                return {
+                    "status": "failed",
+                    "retcode": response.status,
+                    "http_status": response.status,
+                    "retry_after": response.headers.get("Retry-After"),
+                }
+            return await response.json(content_type=None)
+
+    def get_stats(self) -> dict:
+        return {'transport': self.name, 'session_open': bool(self.session and not self.session.closed)}
+
+    async def close(self):
+        if self.session and not self.session.closed:
+            await self.session.close()
+
+
+class OneBotWebSocketTransport:
+    """
+    OneBot v11 正向 WebSocket 传输
+
+    - 保持一条持久连接，所有动作通过 echo 关联请求和响应，
+      多个群消息可以在同一连接上流水线发送，无需等待前一条响应
+    - 协议层 ping/pong 心跳，同时记录 OneBot 的 heartbeat 元事件
+    - 断线后按指数退避在后台重连，重连期间的调用快速失败，由上层重试
+    """
+
+    name = "ws"
+
+    def __init__(self, api_url: str, access_token: str = ""):
+        self.api_url = api_url
+        self.headers = {"Authorization": f"Bearer {access_token}"} if access_token else {}
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.ws: Optional[aiohttp.ClientWebSocketResponse] = None
+
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._echo_counter = itertools.count(1)
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self._send_lock: Optional[asyncio.Lock] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._closed = False
+
+        self._reconnect_delay = 1.0
+        self._next_connect_at = 0.0
+
+        # 统计信息
+        self.connects = 0
+        self.disconnects = 0
+        self.actions_sent = 0
+        self.last_heartbeat: Optional[float] = None
+
+    @property
+    def is_connected(self) -> bool:
+        return self.ws is not None and not self.ws.closed
+
+    # ------------------------------------------------------------------
+    # 连接管理
+    # ------------------------------------------------------------------
+    async def _ensure_connected(self):
+        if self.is_connected:
+            return
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+            self._send_lock = asyncio.Lock()
+
+        async with self._connect_lock:
+            if self.is_connected:
+                return
+            if time.time() < self._next_connect_at:
+                raise ConnectionError(f"OneBot WebSocket 重连退避中，{self._next_connect_at - time.time():.1f}秒后重试")
+            await self._connect()
+
+    async def _connect(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(headers=self.headers)
+        try:
+            self.ws = await self.session.ws_connect(
+                self.api_url,
+                heartbeat=QQ_WS_HEARTBEAT_INTERVAL,
+                timeout=aiohttp.ClientWSTimeout(ws_close=QQ_ACTION_TIMEOUT),
+            )
+        except Exception as e:
+            self._next_connect_at = time.time() + self._reconnect_delay
+            self._reconnect_delay = min(self._reconnect_delay * 2, QQ_WS_RECONNECT_MAX_DELAY)
+            raise ConnectionError(f"OneBot WebSocket 连接失败: {e}") from e
+
+        self.connects += 1
+        self._reconnect_delay = 1.0
+        self._next_connect_at = 0.0
+        self._reader_task = task_supervisor.supervise(functools.partial(self._read_loop, self.ws), "onebot.reader")
+        logger.info(f"🔌 OneBot WebSocket 已连接: {self.api_url}")
+
+    async def _read_loop(self, ws: aiohttp.ClientWebSocketResponse):
+        try:
+            async for msg in ws:
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    continue
+                try:
+                    data = json.loads(msg.data)
+                except ValueError:
+                    continue
+
+                echo = data.get("echo")
+                if echo is not None:
+                    future = self._pending.pop(str(echo), None)
+                    if future is not None and not future.done():
+                        future.set_result(data)
+                elif data.get("post_type") == "meta_event" and data.get("meta_event_type") == "heartbeat":
+                    self.last_heartbeat = time.time()
+        except Exception as e:
+            logger.warning(f"⚠️ OneBot WebSocket 读取异常: {e}")
+        finally:
+            self._on_disconnect(ws)
+
+    def _on_disconnect(self, ws: aiohttp.ClientWebSocketResponse):
+        if ws is not self.ws:
+            return
+        self.ws = None
+        self.disconnects += 1
+
+        # 连接断开后，尚未收到响应的请求全部失败，由上层重试
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("OneBot WebSocket 连接已断开"))
+
+        if not self._closed:
+            logger.warning("⚠️ OneBot WebSocket 连接断开，准备重连")
+            if self._reconnect_task is None or self._reconnect_task.done():
+                self._reconnect_task = task_supervisor.supervise(self._reconnect_loop, "onebot.reconnect")
+
+    async def _reconnect_loop(self):
+        while not self._closed and not self.is_connected:
+            await asyncio.sleep(max(self._next_connect_at - time.time(), self._reconnect_delay))
+            try:
+                await self._ensure_connected()
+            except ConnectionError as e:
+                logger.warning(f"⚠️ {e}")
+
+    # ------------------------------------------------------------------
+    # 调用
+    # ------------------------------------------------------------------
+    async def call(self, action: str, params: Dict[str, Any], timeout: float = QQ_ACTION_TIMEOUT) -> Dict[str, Any]:
+        await self._ensure_connected()
+        # 保留本地引用：等待发送锁期间连接可能断开，self.ws 会被置空
+        ws = self.ws
+        if ws is None or ws.closed:
+            raise ConnectionError("OneBot WebSocket 连接已断开")
+
+        echo = f"btce-{next(self._echo_counter)}"
+        future = asyncio.get_running_loop().create_future()
+        self._pending[echo] = future
+        try:
+            async with self._send_lock:
+                if ws.closed:
+                    raise ConnectionError("OneBot WebSocket 连接已断开")
+                await ws.send_str(json.dumps({"action": action, "params": params, "echo": echo}))
+            self.actions_sent += 1
+            return await asyncio.wait_for(future, timeout=timeout)
+        finally:
+            self._pending.pop(echo, None)
+
+    def get_stats(self) -> dict:
+        return {
+            'transport': self.name,
+            'connected': self.is_connected,
+            'connects': self.connects,
+            'disconnects': self.disconnects,
+            'actions_sent': self.actions_sent,
+            'pending_actions': len(self._pending),
+            'last_heartbeat': self.last_heartbeat,
+        }
+
+    async def close(self):
+        self._closed = True
+        if self._reconnect_task:
+            self._reconnect_task.cancel()
+        if self.ws is not None and not self.ws.closed:
+            await self.ws.close()
+        if self._reader_task:
+            await asyncio.gather(self._reader_task, return_exceptions=True)
+        if self.session and not self.session.closed:
+            await self.session.close()
+
+
+def create_transport(api_url: str, access_token: str = ""):
+    """按配置和地址协议选择传输方式"""
+    transport = QQ_TRANSPORT
+    if transport == "auto":
+        transport = "ws" if api_url.startswith(("ws://", "wss://")) else "http"
+
+    if transport == "ws":
+        return OneBotWebSocketTransport(api_url, access_token)
+    return OneBotHTTPTransport(api_url, access_token)
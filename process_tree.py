@@ -0,0 +1,211 @@
+# process_tree.py
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import psutil
+
+from logger_config import logger
+from config import PROCESS_SAMPLE_INTERVAL, PROCESS_SAMPLE_PSS
+
+# 本进程的角色名；Chromium 子进程按命令行中的 --type= 归类，没有 --type 的 Chromium 进程是浏览器主进程
+ROLE_PYTHON = "python"
+ROLE_BROWSER = "browser"
+ROLE_RENDERER = "renderer"
+_CHROMIUM_NAMES = ("chrome", "chromium", "headless_shell")
+
+
+def _classify(process: psutil.Process) -> str:
+    try:
+        cmdline = process.cmdline()
+        name = process.name().lower()
+    except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+        return "other"
+    for arg in cmdline[1:]:
+        if arg.startswith("--type="):
+            return arg[len("--type="):] or "other"
+    executable = os.path.basename(cmdline[0]).lower() if cmdline else name
+    if any(key in executable or key in name for key in _CHROMIUM_NAMES):
+        return ROLE_BROWSER
+    if "node" in name or "playwright" in " ".join(cmdline).lower():
+        return "driver"  # Playwright 驱动进程
+    return "other"
+
+
+class RoleUsage:
+    __slots__ = ('count', 'rss', 'pss', 'cpu_time', 'fds')
+
+    def __init__(self):
+        self.count = 0
+        self.rss = 0  # 字节
+        self.pss = 0  # 字节；未开启或无权限读取时为 0
+        self.cpu_time = 0.0  # user + system 秒（存活进程的累计值）
+        self.fds = 0
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'rss_mb': round(self.rss / 1024 / 1024, 1),
+            'pss_mb': round(self.pss / 1024 / 1024, 1),
+            'cpu_time': round(self.cpu_time, 1),
+            'fds': self.fds,
+        }
+
+
+class ProcessTreeSample:
+    """一次采样结果：本进程及全部子孙进程按角色汇总"""
+
+    def __init__(self, timestamp: float, roles: Dict[str, RoleUsage]):
+        self.timestamp = timestamp
+        self.roles = roles
+
+    @property
+    def total_rss_mb(self) -> float:
+        return sum(usage.rss for usage in self.roles.values()) / 1024 / 1024
+
+    @property
+    def total_pss_mb(self) -> float:
+        return sum(usage.pss for usage in self.roles.values()) / 1024 / 1024
+
+    @property
+    def memory_mb(self) -> float:
+        """进程树实际占用的内存：有 PSS 时用 PSS（共享页按比例分摊，不重复计算），否则用 RSS"""
+        return self.total_pss_mb or self.total_rss_mb
+
+    @property
+    def browser_memory_mb(self) -> float:
+        """Chromium 进程（除本进程和驱动外）占用的内存"""
+        usages = [usage for role, usage in self.roles.items() if role not in (ROLE_PYTHON, "driver", "other")]
+        return sum(usage.pss or usage.rss for usage in usages) / 1024 / 1024
+
+    @property
+    def renderer_count(self) -> int:
+        usage = self.roles.get(ROLE_RENDERER)
+        return usage.count if usage else 0
+
+    def to_dict(self) -> dict:
+        return {role: usage.to_dict() for role, usage in self.roles.items()}
+
+    def summary(self) -> str:
+        parts = [
+            f"{role}×{usage.count} {(usage.pss or usage.rss) / 1024 / 1024:.0f}MB"
+            for role, usage in sorted(self.roles.items(), key=lambda item: item[1].rss, reverse=True)
+        ]
+        return f"共{self.memory_mb:.0f}MB, 渲染进程{self.renderer_count}个 ({', '.join(parts)})"
+
+
+class ProcessTreeSampler:
+    """
+    进程树资源采样（Python 进程 + Playwright 驱动 + Chromium 浏览器 / GPU / 渲染等子进程）
+
+    - 按角色汇总 RSS / PSS、CPU 时间和打开的文件描述符数，并统计渲染进程数
+    - 采样结果缓存 min_interval 秒，期间的调用直接返回缓存，健康检查、回收判断和指标接口共用一次采样
+    - psutil.Process 对象和进程角色按 pid 缓存，每个子进程只解析一次命令行
+    - PSS 需要读取 smaps，开销高于 RSS，可通过 PROCESS_SAMPLE_PSS 关闭
+    """
+
+    def __init__(self, min_interval: float = PROCESS_SAMPLE_INTERVAL, with_pss: bool = PROCESS_SAMPLE_PSS):
+        self.min_interval = min_interval
+        self.with_pss = with_pss
+        self.root = psutil.Process(os.getpid())
+        self._processes: Dict[int, psutil.Process] = {}
+        self._roles: Dict[int, str] = {}
+        self._last: Optional[ProcessTreeSample] = None
+        self._lock = threading.Lock()  # 采样可能同时在多个线程中发起
+        self.stats = {'samples': 0, 'cached': 0, 'total_sample_time': 0.0}
+
+    @property
+    def last(self) -> Optional[ProcessTreeSample]:
+        return self._last
+
+    def sample(self, force: bool = False) -> ProcessTreeSample:
+        """阻塞采样；缓存未过期时直接返回缓存"""
+        with self._lock:
+            last = self._last
+            if not force and last is not None and time.time() - last.timestamp < self.min_interval:
+                self.stats['cached'] += 1
+                return last
+            return self._sample()
+
+    def _sample(self) -> ProcessTreeSample:
+        start = time.perf_counter()
+        roles: Dict[str, RoleUsage] = {}
+        alive = set()
+        for process in self._tree():
+            pid = process.pid
+            role = ROLE_PYTHON if pid == self.root.pid else self._roles.get(pid)
+            if role is None:
+                role = self._roles[pid] = _classify(process)
+            try:
+                with process.oneshot():
+                    memory = process.memory_full_info() if self.with_pss else process.memory_info()
+                    cpu = process.cpu_times()
+                    fds = process.num_fds() if hasattr(process, "num_fds") else process.num_handles()
+            except psutil.AccessDenied:
+                try:
+                    memory, cpu, fds = process.memory_info(), process.cpu_times(), 0
+                except psutil.Error:
+                    continue
+            except psutil.Error:
+                continue
+            alive.add(pid)
+            usage = roles.get(role)
+            if usage is None:
+                usage = roles[role] = RoleUsage()
+            usage.count += 1
+            usage.rss += memory.rss
+            usage.pss += getattr(memory, "pss", 0)
+            usage.cpu_time += cpu.user + cpu.system
+            usage.fds += fds
+
+        # 清理已退出进程的缓存
+        for pid in list(self._processes):
+            if pid not in alive:
+                self._processes.pop(pid, None)
+                self._roles.pop(pid, None)
+
+        self._last = ProcessTreeSample(time.time(), roles)
+        self.stats['samples'] += 1
+        self.stats['total_sample_time'] += time.perf_counter() - start
+        return self._last
+
+    def _tree(self) -> List[psutil.Process]:
+        """本进程及全部子孙进程，复用已缓存的 Process 对象（pid 复用时 psutil 会按创建时间区分）"""
+        try:
+            children = self.root.children(recursive=True)
+        except psutil.Error as e:
+            logger.debug(f"获取子进程失败: {e}")
+            children = []
+        processes = [self.root]
+        for child in children:
+            cached = self._processes.get(child.pid)
+            if cached is None or cached != child:
+                self._processes[child.pid] = cached = child
+                self._roles.pop(child.pid, None)
+            processes.append(cached)
+        return processes
+
+    async def sample_async(self, force: bool = False) -> ProcessTreeSample:
+        """缓存未过期时直接返回，否则在线程中采样，不阻塞事件循环"""
+        last = self._last
+        if not force and last is not None and time.time() - last.timestamp < self.min_interval:
+            self.stats['cached'] += 1
+            return last
+        return await asyncio.to_thread(self.sample, force)
+
+    def get_stats(self) -> dict:
+        samples = self.stats['samples']
+        last = self._last
+        return {
+            'samples': samples,
+            'cached': self.stats['cached'],
+            'avg_sample_time': f"{self.stats['total_sample_time'] / samples * 1000:.1f}ms" if samples else "0.0ms",
+            'memory_mb': round(last.memory_mb, 1) if last else 0,
+            'renderers': last.renderer_count if last else 0,
+        }
+
+
+# 全局实例
+process_tree = ProcessTreeSampler()
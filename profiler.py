@@ -0,0 +1,198 @@
+# profiler.py
+import asyncio
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, Iterable, Optional
+
+from logger_config import logger
+from config import (
+    LOG_DIR, PROFILE_DEFAULT_SECONDS, PROFILE_MAX_SECONDS, PROFILE_DEFAULT_MODES, PROFILE_SAMPLE_INTERVAL,
+    PROFILE_TRACEMALLOC_FRAMES, PROFILE_TOP_N
+)
+from task_supervisor import task_supervisor
+
+MODE_SAMPLE = "sample"  # 采样调用栈，输出火焰图可用的折叠栈文件（flamegraph.pl / speedscope）
+MODE_CPROFILE = "cprofile"  # 确定性 profile（只覆盖事件循环线程，开销较大），输出 pstats 文件
+MODE_MEMORY = "memory"  # tracemalloc 开始 / 结束快照对比，输出内存增长最多的代码行
+MODES = (MODE_SAMPLE, MODE_CPROFILE, MODE_MEMORY)
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _StackSampler:
+    """后台线程按固定间隔抓取所有线程的调用栈，按折叠栈计数"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(2)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(names.get(thread_id, f"thread-{thread_id}"))
+                self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def write(self, path) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def top_leaves(self, n: int) -> str:
+        leaves: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        return ", ".join(f"{leaf} {count / total:.0%}" for leaf, count in leaves.most_common(n))
+
+
+class Profiler:
+    """
+    按需性能分析（SIGUSR2 或 POST /debug/profile 触发，到时自动停止）
+
+    - sample：后台线程每 PROFILE_SAMPLE_INTERVAL 秒抓取全部线程的调用栈，写出折叠栈文件
+    - cprofile：在事件循环线程上启用 cProfile，写出 pstats 文件（python -m pstats 或 snakeviz 查看）
+    - memory：开始和结束各取一次 tracemalloc 快照，写出增长最多的代码行
+    - 文件写入 logs/profile-<时间>.*；未触发时不启动任何线程或钩子，没有额外开销
+    - 同一时间只运行一次分析，运行期间的触发请求被忽略
+    """
+
+    def __init__(self, directory=LOG_DIR):
+        self.directory = directory
+        self._task: Optional[asyncio.Task] = None
+        self.current: Optional[dict] = None
+        self.last: Optional[dict] = None
+        self.stats = {'runs': 0, 'rejected': 0}
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def trigger(self, seconds: Optional[float] = None, modes: Optional[Iterable[str]] = None) -> Optional[dict]:
+        """在事件循环中调用；返回本次分析的信息，已有分析在运行时返回 None"""
+        seconds = min(max(float(seconds or PROFILE_DEFAULT_SECONDS), 1.0), PROFILE_MAX_SECONDS)
+        modes = tuple(mode for mode in (modes or PROFILE_DEFAULT_MODES) if mode in MODES)
+        if not modes:
+            raise ValueError(f"未知的分析模式，可选: {', '.join(MODES)}")
+        if self.is_running:
+            self.stats['rejected'] += 1
+            logger.warning("⚠️ 性能分析正在运行，忽略本次触发")
+            return None
+
+        prefix = os.path.join(self.directory, time.strftime("profile-%Y%m%d-%H%M%S"))
+        self.current = {'started': time.time(), 'seconds': seconds, 'modes': list(modes), 'files': {}}
+        if MODE_SAMPLE in modes:
+            self.current['files'][MODE_SAMPLE] = f"{prefix}.collapsed"
+        if MODE_CPROFILE in modes:
+            self.current['files'][MODE_CPROFILE] = f"{prefix}.pstats"
+        if MODE_MEMORY in modes:
+            self.current['files'][MODE_MEMORY] = f"{prefix}.memory.txt"
+        self._task = task_supervisor.spawn(self._run(self.current), "profiler")
+        return self.current
+
+    def trigger_from_signal(self):
+        """SIGUSR2 处理函数（通过 loop.add_signal_handler 注册，在事件循环中执行）"""
+        try:
+            self.trigger()
+        except Exception as e:
+            logger.error(f"❌ 启动性能分析失败: {e}")
+
+    async def _run(self, session: dict):
+        files: Dict[str, str] = session['files']
+        logger.info(f"🔬 性能分析开始: {'/'.join(session['modes'])}，持续 {session['seconds']:.0f} 秒")
+        self.stats['runs'] += 1
+
+        sampler = profile = before = None
+        started_tracemalloc = False
+        try:
+            if MODE_MEMORY in files:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+                    started_tracemalloc = True
+                before = await asyncio.to_thread(tracemalloc.take_snapshot)
+            if MODE_SAMPLE in files:
+                sampler = _StackSampler(PROFILE_SAMPLE_INTERVAL)
+                sampler.start()
+            if MODE_CPROFILE in files:
+                profile = cProfile.Profile()
+                profile.enable()
+
+            await asyncio.sleep(session['seconds'])
+        finally:
+            if profile is not None:
+                profile.disable()
+            if sampler is not None:
+                await asyncio.to_thread(sampler.stop)
+            after = await asyncio.to_thread(tracemalloc.take_snapshot) if before is not None else None
+            if started_tracemalloc:
+                tracemalloc.stop()
+
+            try:
+                summary = await asyncio.to_thread(self._write, files, sampler, profile, before, after)
+                logger.info(f"🔬 性能分析完成: {summary}")
+            except Exception as e:
+                logger.error(f"❌ 写出性能分析结果失败: {e}")
+            session['finished'] = time.time()
+            self.last, self.current = session, None
+
+    @staticmethod
+    def _write(files, sampler, profile, before, after) -> str:
+        parts = []
+        if sampler is not None:
+            sampler.write(files[MODE_SAMPLE])
+            parts.append(f"采样{sampler.samples}次，热点 {sampler.top_leaves(PROFILE_TOP_N)}")
+        if profile is not None:
+            profile.dump_stats(files[MODE_CPROFILE])
+            rows = sorted(pstats.Stats(profile).stats.items(), key=lambda item: item[1][2], reverse=True)
+            parts.append("自身耗时最多 " + ", ".join(
+                f"{func[2]} ({os.path.basename(func[0])}:{func[1]}) {tottime:.2f}s"
+                for func, (_, _, tottime, _, _) in rows[:PROFILE_TOP_N]
+            ))
+        if after is not None:
+            ignore = (tracemalloc.Filter(False, tracemalloc.__file__),
+                      tracemalloc.Filter(False, "<frozen importlib._bootstrap>"))
+            diff = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+            growth = sum(stat.size_diff for stat in diff)
+            with open(files[MODE_MEMORY], "w", encoding="utf-8") as f:
+                f.write(f"# 分析期间内存净增长 {growth / 1024:.1f} KiB，按代码行排序\n")
+                for stat in diff[:50]:
+                    f.write(f"{stat}\n")
+            parts.append(f"内存净增长 {growth / 1024:.1f} KiB")
+        return "; ".join(parts)
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            'running': self.is_running,
+            'last_files': self.last['files'] if self.last else {},
+        }
+
+
+# 全局实例
+profiler = Profiler()
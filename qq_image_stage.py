@@ -0,0 +1,112 @@
+# qq_image_stage.py
+import asyncio
+import base64
+import re
+from typing import Dict, List
+from urllib.parse import urlsplit
+
+from logger_config import logger
+from config import (
+    QQ_IMAGE_STAGE_ENABLED, QQ_IMAGE_DELIVERY, QQ_IMAGE_CACHE_DIR, QQ_IMAGE_CACHE_MAX_MB, QQ_IMAGE_MAX_WIDTH,
+    QQ_IMAGE_QUALITY, QQ_IMAGE_BASE64_MAX_KB
+)
+from config_qq import QQ_BOT_API_URL
+from html_utils import normalize_url
+from image_cache import ImageCache, CachedImage, Image
+
+# [CQ:image,file=<地址>...] 中的 file 参数（参数值中的 , [ ] & 已被转义）
+_CQ_IMAGE_FILE = re.compile(r"(\[CQ:image,(?:[^\]]*?,)?file=)([^,\]]+)")
+_CQ_UNESCAPE = (("&#44;", ","), ("&#91;", "["), ("&#93;", "]"), ("&amp;", "&"))
+_LOCAL_HOSTS = {"127.0.0.1", "localhost", "::1"}
+
+
+def _cq_unescape(value: str) -> str:
+    for escaped, char in _CQ_UNESCAPE:
+        value = value.replace(escaped, char)
+    return value
+
+
+def _resolve_delivery(mode: str, api_url: str) -> str:
+    """
+    auto：机器人与本程序在同一台机器上时引用本地文件，否则内联 base64；
+    未安装 Pillow 时图片无法缩小，远程机器人保留原地址，避免在每条消息中内联完整原图
+    """
+    if mode != "auto":
+        return mode
+    if urlsplit(api_url).hostname in _LOCAL_HOSTS:
+        return "file"
+    if Image is None:
+        logger.warning("⚠️ 未安装 Pillow，无法缩小QQ图片，远程机器人改为使用原图片地址")
+        return "url"
+    return "base64"
+
+
+class QQImageStage:
+    """
+    QQ图片预处理：CQ码中的远程图片地址替换为本地缓存的缩小图
+
+    - 每张图片只下载一次，按 QQ_IMAGE_MAX_WIDTH / QQ_IMAGE_QUALITY 缩小重编码后按内容哈希缓存，
+      机器人不再为每个群从 CDN 拉取原图
+    - 机器人在本机时以 file:// 引用缓存文件，远程机器人以 base64:// 内联；
+      超过 QQ_IMAGE_BASE64_MAX_KB 的图片（未能缩小的原图、动图）不内联，保留原地址
+    - 下载失败的图片保留原地址，由机器人自行拉取
+    """
+
+    def __init__(self, cache: ImageCache = None, delivery: str = QQ_IMAGE_DELIVERY, api_url: str = QQ_BOT_API_URL):
+        self.cache = cache or ImageCache(
+            QQ_IMAGE_CACHE_DIR, QQ_IMAGE_CACHE_MAX_MB * 1024 * 1024, QQ_IMAGE_MAX_WIDTH, QQ_IMAGE_QUALITY
+        )
+        self.delivery = _resolve_delivery(delivery, api_url)
+        self.base64_max_bytes = QQ_IMAGE_BASE64_MAX_KB * 1024
+        self.stats = {'rewritten': 0, 'kept_remote': 0, 'too_large': 0}
+
+    async def rewrite(self, message: str) -> str:
+        """替换消息中所有远程图片的 file 参数"""
+        if not QQ_IMAGE_STAGE_ENABLED or self.delivery == "url":
+            return message
+        # CQ码中的原始值 -> 实际下载地址
+        sources = {
+            value: normalize_url(_cq_unescape(value)) for value in dict.fromkeys(
+                match.group(2) for match in _CQ_IMAGE_FILE.finditer(message)
+            ) if value.startswith(("http://", "https://", "//"))
+        }
+        if not sources:
+            return message
+
+        cached = await self.cache.get_many(list(dict.fromkeys(sources.values())))
+        images = {value: cached[url] for value, url in sources.items() if url in cached}
+        if self.delivery == "base64":
+            too_large = [value for value, image in images.items() if image.size > self.base64_max_bytes]
+            for value in too_large:
+                del images[value]
+            self.stats['too_large'] += len(too_large)
+        files = await asyncio.to_thread(self._references, images)
+
+        self.stats['rewritten'] += len(files)
+        self.stats['kept_remote'] += len(sources) - len(files)
+        if len(files) < len(sources):
+            logger.warning(f"⚠️ {len(sources) - len(files)} 张QQ图片未能缓存或过大，保留原地址")
+        return _CQ_IMAGE_FILE.sub(lambda m: m.group(1) + files.get(m.group(2), m.group(2)), message)
+
+    def _references(self, images: Dict[str, CachedImage]) -> Dict[str, str]:
+        """原地址 -> CQ码中的 file 参数；缓存文件刚被淘汰的图片不替换"""
+        references = {}
+        for url, image in images.items():
+            try:
+                if self.delivery == "file":
+                    if image.path.exists():
+                        references[url] = image.path.resolve().as_uri()
+                else:
+                    references[url] = "base64://" + base64.b64encode(image.read()).decode("ascii")
+            except OSError:
+                pass
+        return references
+
+    async def rewrite_all(self, messages: List[str]) -> List[str]:
+        return list(await asyncio.gather(*(self.rewrite(message) for message in messages)))
+
+    def get_stats(self) -> dict:
+        return {**self.stats, 'delivery': self.delivery, 'cache': self.cache.get_stats()}
+
+    async def close(self):
+        await self.cache.close()
@@ -0,0 +1,80 @@
+# qq_message_splitter.py
+import re
+from typing import List, Tuple
+
+# CQ码：[CQ:type,key=value,...]，参数中的 [ ] , & 已被转义，因此不会出现嵌套的 ]
+_CQ_CODE_PATTERN = re.compile(r"\[CQ:[^\]]*\]")
+_CQ_IMAGE_PREFIX = "[CQ:image"
+# CQ码转义序列：&amp; &#91; &#93; &#44;
+_CQ_ESCAPE_PATTERN = re.compile(r"&(?:amp|#91|#93|#44);")
+_MAX_ESCAPE_LENGTH = 5
+
+
+def parse_segments(message: str) -> List[Tuple[bool, str]]:
+    """将消息拆分为 (是否为CQ码, 内容) 片段"""
+    segments = []
+    position = 0
+    for match in _CQ_CODE_PATTERN.finditer(message):
+        if match.start() > position:
+            segments.append((False, message[position:match.start()]))
+        segments.append((True, match.group()))
+        position = match.end()
+    if position < len(message):
+        segments.append((False, message[position:]))
+    return segments
+
+
+def count_images(message: str) -> int:
+    return message.count(_CQ_IMAGE_PREFIX)
+
+
+def _cut_position(text: str, max_length: int) -> int:
+    """硬切分超长文本时避免切断 &#91; 之类的转义序列"""
+    ampersand = text.rfind("&", max(0, max_length - _MAX_ESCAPE_LENGTH + 1), max_length)
+    if ampersand > 0 and _CQ_ESCAPE_PATTERN.match(text, ampersand):
+        return ampersand
+    return max_length
+
+
+def _split_text(text: str, max_length: int) -> List[str]:
+    """文本片段按行拆分，单行超长时再按长度硬切分"""
+    pieces = []
+    for line in text.splitlines(keepends=True):
+        while len(line) > max_length:
+            cut = _cut_position(line, max_length)
+            pieces.append(line[:cut])
+            line = line[cut:]
+        if line:
+            pieces.append(line)
+    return pieces
+
+
+def split_message(message: str, max_length: int) -> List[str]:
+    """
+    按CQ码边界无损拆分消息
+
+    CQ码作为整体不会被切开（单个CQ码超过 max_length 时独占一段），
+    文本优先在换行处拆分，所有内容都保留在某一段中
+    """
+    if len(message) <= max_length:
+        return [message]
+
+    pieces = []
+    for is_cq, content in parse_segments(message):
+        if is_cq:
+            pieces.append(content)
+        else:
+            pieces.extend(_split_text(content, max_length))
+
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(piece) > max_length:
+            chunks.append(current)
+            current = ""
+        current += piece
+    if current:
+        chunks.append(current)
+
+    # 段首尾的换行在QQ中显示为空行，去掉后丢弃空段
+    return [chunk.strip("\n") for chunk in chunks if chunk.strip()]
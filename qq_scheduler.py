@@ -0,0 +1,352 @@
+# qq_scheduler.py
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from logger_config import logger
+from onebot_transport import UnsupportedActionError, is_unsupported_action
+from task_supervisor import task_supervisor
+from config import (
+    QQ_GLOBAL_RATE, QQ_GLOBAL_BURST, QQ_GROUP_RATE, QQ_GROUP_BURST, QQ_SEND_CONCURRENCY,
+    QQ_SEND_MAX_RETRIES, QQ_THROTTLE_BASE_DELAY, QQ_THROTTLE_MAX_DELAY, QQ_THROTTLE_DEFER_AFTER,
+    QQ_RATE_LIMIT_RETCODES
+)
+
+# 默认优先级，与 notification_outbox.PRIORITY_NORMAL 一致（数值越小越先发送）
+DEFAULT_PRIORITY = 2
+
+SendFunc = Callable[[str, Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+class QQThrottledError(Exception):
+    """目标群（或整个账号）的限流冷却还需较长时间，消息未发送，应在 retry_in 秒后重新提交"""
+
+    def __init__(self, group_id: str, retry_in: float):
+        super().__init__(f"QQ群 {group_id} 限流冷却中，{retry_in:.0f}秒后重试")
+        self.group_id = group_id
+        self.retry_in = retry_in
+        self.remaining: Optional[List[str]] = None  # 分段发送时尚未送达的段（由 QQMessageSender 填写）
+
+
+class TokenBucket:
+    """令牌桶：按 rate 条/秒补充令牌，最多积累 capacity 个；block() 用于限流后的强制冷却"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.strikes = 0  # 连续被限流次数，用于自适应退避
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now: float) -> float:
+        """距离可以取出一个令牌还需等待的秒数（0 表示立即可用）"""
+        self._refill(now)
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(wait, self.blocked_until - now, 0.0)
+
+    def consume(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, seconds: float, now: float):
+        """冷却 seconds 秒，冷却期间不发放令牌，冷却结束后先放行一条，之后按速率补充"""
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = 1.0
+        self.updated = max(self.updated, self.blocked_until)
+
+
+class _SendRequest:
+    __slots__ = ('group_id', 'action', 'params', 'priority', 'seq', 'future', 'submitted_at', 'queued_at', 'attempts')
+
+    def __init__(self, group_id: str, action: str, params: Dict[str, Any], priority: int, seq: int,
+                 future: asyncio.Future):
+        self.group_id = group_id
+        self.action = action
+        self.params = params
+        self.priority = priority
+        self.seq = seq
+        self.future = future
+        self.submitted_at = time.monotonic()
+        self.queued_at = self.submitted_at
+        self.attempts = 0
+
+
+class QQSendScheduler:
+    """
+    QQ群消息发送调度器
+
+    - 全局令牌桶限制机器人账号的总发送速率，每个群另有独立的令牌桶
+    - 每个群一条优先级队列，开播提醒等高优先级消息先发送；
+      某个群处于冷却时不会挡住其他群的消息
+    - 被限流（HTTP 429、配置的 retcode 或返回 retry_after）时，按 retry_after
+      或连续限流次数指数退避冷却对应的群（HTTP 429 冷却全局），消息重新排队，不计入失败次数
+    - 剩余冷却超过 QQ_THROTTLE_DEFER_AFTER 秒时，排队的消息以 QQThrottledError 结束，
+      由发件箱在冷却结束后重新投递，避免等待冷却期间触发通道投递超时
+    - 统计排队等待时间和限流事件
+    """
+
+    def __init__(self, send_func: SendFunc):
+        self.send_func = send_func
+        self.global_bucket = TokenBucket(QQ_GLOBAL_RATE, QQ_GLOBAL_BURST)
+        self.group_buckets: Dict[str, TokenBucket] = {}
+        self._queues: Dict[str, List[Tuple[int, int, _SendRequest]]] = {}
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._inflight: Set[asyncio.Task] = set()
+
+        # 统计信息
+        self.stats = {
+            'submitted': 0, 'sent': 0, 'failed': 0, 'retries': 0, 'deferred': 0,
+            'throttle_events': 0, 'throttle_delay_total': 0.0,
+            'dispatched': 0, 'total_queue_wait': 0.0, 'max_queue_wait': 0.0,
+        }
+
+    # ------------------------------------------------------------------
+    # 提交
+    # ------------------------------------------------------------------
+    async def submit(self, group_id: str, action: str, params: Dict[str, Any],
+                     priority: int = DEFAULT_PRIORITY) -> bool:
+        """
+        提交一次发往某个群的 OneBot 动作并等待结果；调用方取消时请求从队列中移除
+
+        Raises:
+            UnsupportedActionError: 机器人框架不支持该动作（不重试）
+            QQThrottledError: 冷却时间较长，消息未发送
+        """
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        request = _SendRequest(group_id, action, params, priority, next(self._seq), future)
+        self._push(request)
+        self.stats['submitted'] += 1
+        try:
+            return await future
+        finally:
+            # 调用方超时或取消后，队列中的请求在出队时被跳过
+            if not future.done():
+                future.cancel()
+
+    def _ensure_started(self):
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._slots = asyncio.Semaphore(QQ_SEND_CONCURRENCY)
+            self._dispatcher = task_supervisor.supervise(self._run, "qq_scheduler.dispatcher")
+
+    def _push(self, request: _SendRequest):
+        request.queued_at = time.monotonic()
+        heapq.heappush(self._queues.setdefault(request.group_id, []), (request.priority, request.seq, request))
+        if request.group_id not in self.group_buckets:
+            self.group_buckets[request.group_id] = TokenBucket(QQ_GROUP_RATE, QQ_GROUP_BURST)
+        self._wakeup.set()
+
+    # ------------------------------------------------------------------
+    # 调度
+    # ------------------------------------------------------------------
+    async def _run(self):
+        while True:
+            await self._slots.acquire()
+            try:
+                request = await self._next_request()
+            except BaseException:
+                self._slots.release()
+                raise
+
+            task = task_supervisor.spawn(self._send(request), "qq_scheduler.send")
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _next_request(self) -> _SendRequest:
+        """等待全局令牌，然后取出令牌可用的群中优先级最高的消息"""
+        while True:
+            now = time.monotonic()
+            self._defer_cooling(now)
+            wait = self.global_bucket.delay(now)
+            if wait <= 0:
+                request, wait = self._pick(now)
+                if request is not None:
+                    self.global_bucket.consume(now)
+                    self.group_buckets[request.group_id].consume(now)
+                    return request
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def _defer_cooling(self, now: float):
+        """剩余冷却时间过长的群中排队的消息直接以 QQThrottledError 结束"""
+        global_wait = self.global_bucket.blocked_until - now
+        for group_id, queue in self._queues.items():
+            wait = max(global_wait, self.group_buckets[group_id].blocked_until - now)
+            if wait <= QQ_THROTTLE_DEFER_AFTER or not queue:
+                continue
+            for _, _, request in queue:
+                if not request.future.done():
+                    request.future.set_exception(QQThrottledError(group_id, wait))
+                    self.stats['deferred'] += 1
+            queue.clear()
+
+    def _pick(self, now: float) -> Tuple[Optional[_SendRequest], Optional[float]]:
+        best_group = None
+        min_wait = None
+        for group_id, queue in self._queues.items():
+            while queue and queue[0][2].future.done():
+                heapq.heappop(queue)
+            if not queue:
+                continue
+
+            wait = self.group_buckets[group_id].delay(now)
+            if wait > 0:
+                min_wait = wait if min_wait is None else min(min_wait, wait)
+            elif best_group is None or queue[0][:2] < self._queues[best_group][0][:2]:
+                best_group = group_id
+
+        if best_group is None:
+            return None, min_wait
+        return heapq.heappop(self._queues[best_group])[2], None
+
+    # ------------------------------------------------------------------
+    # 发送
+    # ------------------------------------------------------------------
+    async def _send(self, request: _SendRequest):
+        group_id = request.group_id
+        queue_wait = time.monotonic() - request.queued_at
+        self.stats['dispatched'] += 1
+        self.stats['total_queue_wait'] += queue_wait
+        self.stats['max_queue_wait'] = max(self.stats['max_queue_wait'], queue_wait)
+
+        result: Optional[Dict[str, Any]] = None
+        error = ""
+        try:
+            result = await self.send_func(request.action, request.params)
+        except asyncio.CancelledError:
+            self._slots.release()
+            raise
+        except asyncio.TimeoutError:
+            error = "消息发送超时"
+        except Exception as e:
+            error = f"消息发送异常: {e}"
+        self._slots.release()
+
+        if request.future.done():
+            return
+
+        if result is not None and result.get("status") == "ok":
+            self.group_buckets[group_id].strikes = 0
+            self.stats['sent'] += 1
+            logger.info(f"✅ QQ群 {group_id} 消息发送成功 (排队 {queue_wait:.2f}秒)")
+            request.future.set_result(True)
+            return
+
+        if result is not None and self._is_throttled(result):
+            self._throttle(request, result)
+            return
+
+        if result is not None and is_unsupported_action(result):
+            logger.warning(f"⚠️ 机器人框架不支持 {request.action}: {result}")
+            request.future.set_exception(UnsupportedActionError(request.action))
+            return
+
+        request.attempts += 1
+        if result is not None:
+            error = f"发送失败: {result}"
+        logger.error(f"❌ QQ群 {group_id} 第{request.attempts}次{error}")
+
+        if request.attempts >= QQ_SEND_MAX_RETRIES:
+            logger.error(f"❌ QQ群 {group_id} 消息发送失败，已重试{QQ_SEND_MAX_RETRIES}次")
+            self.stats['failed'] += 1
+            request.future.set_result(False)
+            return
+
+        wait_time = 2 ** (request.attempts - 1)  # 指数退避：1秒, 2秒, 4秒...
+        logger.info(f"等待{wait_time}秒后重试...")
+        self.stats['retries'] += 1
+        await asyncio.sleep(wait_time)
+        if not request.future.done():
+            self._push(request)
+
+    @staticmethod
+    def _retry_after(result: Dict[str, Any]) -> Optional[float]:
+        value = result.get("retry_after")
+        if value is None and isinstance(result.get("data"), dict):
+            value = result["data"].get("retry_after")
+        try:
+            return float(value) if value is not None else None
+        except (TypeError, ValueError):
+            return None
+
+    def _is_throttled(self, result: Dict[str, Any]) -> bool:
+        return (
+            result.get("http_status") == 429
+            or result.get("retcode") in QQ_RATE_LIMIT_RETCODES
+            or self._retry_after(result) is not None
+        )
+
+    def _throttle(self, request: _SendRequest, result: Dict[str, Any]):
+        """限流：冷却对应的桶后重新排队，消息不丢失"""
+        now = time.monotonic()
+        # HTTP 429 来自机器人框架本身，作用于整个账号；其余信号只冷却对应的群
+        bucket = self.global_bucket if result.get("http_status") == 429 else self.group_buckets[request.group_id]
+        bucket.strikes += 1
+
+        delay = self._retry_after(result)
+        if delay is None:
+            delay = QQ_THROTTLE_BASE_DELAY * (2 ** (bucket.strikes - 1))
+        delay = min(max(delay, 0.0), QQ_THROTTLE_MAX_DELAY)
+        bucket.block(delay, now)
+
+        self.stats['throttle_events'] += 1
+        self.stats['throttle_delay_total'] += delay
+        scope = "全局" if bucket is self.global_bucket else f"QQ群 {request.group_id}"
+        logger.warning(f"⚠️ {scope} 被限流，冷却 {delay:.1f}秒后重新发送 (retcode={result.get('retcode')})")
+        self._push(request)
+
+    # ------------------------------------------------------------------
+    # 统计 / 关闭
+    # ------------------------------------------------------------------
+    def get_stats(self) -> dict:
+        now = time.monotonic()
+        dispatched = self.stats['dispatched']
+        return {
+            'submitted': self.stats['submitted'],
+            'sent': self.stats['sent'],
+            'failed': self.stats['failed'],
+            'retries': self.stats['retries'],
+            'deferred': self.stats['deferred'],
+            'queued': sum(1 for queue in self._queues.values() for item in queue if not item[2].future.done()),
+            'inflight': len(self._inflight),
+            'throttle_events': self.stats['throttle_events'],
+            'throttle_delay_total': f"{self.stats['throttle_delay_total']:.1f}s",
+            'avg_queue_wait': f"{self.stats['total_queue_wait'] / dispatched:.2f}s" if dispatched else "0.00s",
+            'max_queue_wait': f"{self.stats['max_queue_wait']:.2f}s",
+            'cooling_groups': [
+                group_id for group_id, bucket in self.group_buckets.items() if bucket.blocked_until > now
+            ],
+        }
+
+    async def close(self):
+        """停止调度，排队中的消息返回失败（发件箱中的记录会在下次启动时重新投递）"""
+        tasks = list(self._inflight)
+        if self._dispatcher is not None:
+            tasks.append(self._dispatcher)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._dispatcher = None
+
+        for queue in self._queues.values():
+            for _, _, request in queue:
+                if not request.future.done():
+                    request.future.set_result(False)
+            queue.clear()
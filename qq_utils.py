@@ -1,85 +1,133 @@
 # qq_utils.py
-import aiohttp
 import asyncio
-from typing import List
+from typing import List, Optional
 from logger_config import logger
+from config import (
+    QQ_ACTION_TIMEOUT, QQ_FORWARD_ENABLED, QQ_FORWARD_IMAGE_THRESHOLD, QQ_FORWARD_NODE_NAME, QQ_FORWARD_NODE_UIN
+)
 from config_qq import QQ_BOT_API_URL, QQ_BOT_ACCESS_TOKEN, QQ_GROUP_IDS, QQ_PUSH_ENABLED, MAX_MESSAGE_LENGTH
+from onebot_transport import create_transport, UnsupportedActionError
+from qq_message_splitter import split_message, count_images
+from qq_image_stage import QQImageStage
+from qq_scheduler import QQSendScheduler, QQThrottledError, DEFAULT_PRIORITY
 
 
 class QQMessageSender:
-    """QQ群消息发送器"""
+    """
+    QQ群消息发送器
+
+    通过 OneBot 传输层调用 send_group_msg / send_group_forward_msg：ws:// 地址使用持久 WebSocket 连接，
+    http:// 地址使用共享会话的 HTTP 请求（见 config.QQ_TRANSPORT）。
+    所有发送经 QQSendScheduler 按全局 / 单群令牌桶限流和优先级排队；
+    CQ码中的远程图片经 QQImageStage 替换为本地缓存的缩小图
+    """
 
     def __init__(self):
         self.api_url = QQ_BOT_API_URL
         self.access_token = QQ_BOT_ACCESS_TOKEN
-        self.headers = {}
-
-        if self.access_token:
-            self.headers = {"Authorization": f"Bearer {self.access_token}"}
-
-    async def send_group_message(self, group_id: str, message: str) -> bool:
-        """发送群消息（带重试机制）"""
+        self.transport = create_transport(self.api_url, self.access_token)
+        self.scheduler = QQSendScheduler(self.transport.call)
+        self.image_stage = QQImageStage(api_url=self.api_url)
+        self.forward_supported: Optional[bool] = None  # 首次使用合并转发后确定
+        self._self_id: Optional[str] = QQ_FORWARD_NODE_UIN or None
+
+    @staticmethod
+    def split(message: str) -> List[str]:
+        """按原地址拆分（base64 图片不计入长度），图片在发送时再逐段替换"""
+        return split_message(message, MAX_MESSAGE_LENGTH)
+
+    async def send_group_message(self, group_id: str, message: str, priority: int = DEFAULT_PRIORITY) -> bool:
+        """
+        发送群消息（经调度器限流，带重试机制），返回是否所有分段都已送达
+
+        超长消息按CQ码边界拆分，不再截断；分多段或图片较多时打包为一条合并转发消息，
+        机器人框架不支持合并转发时改为按顺序连续发送各段
+
+        Raises:
+            QQThrottledError: 该群限流冷却时间较长，由发件箱延后重新投递
+        """
+        return not await self.send_group_chunks(group_id, self.split(message), priority)
+
+    async def send_group_chunks(self, group_id: str, chunks: List[str], priority: int = DEFAULT_PRIORITY) -> List[str]:
+        """
+        发送已拆分的消息段，返回未送达的段（保持原顺序），全部送达时为空列表；
+        发件箱重试时只重发这些段，已送达的段不会在群里重复出现
+
+        Raises:
+            QQThrottledError: 该群限流冷却时间较长
+            Exception: 某段发送出错（超时、连接断开等）
+            两种情况下异常的 remaining 都是未送达的段，已送达的段不需要重发
+        """
         if not QQ_PUSH_ENABLED:
             logger.info("QQ推送已禁用，跳过发送")
-            return True
-
-        # 截断过长的消息
-        if len(message) > MAX_MESSAGE_LENGTH:
-            message = message[:MAX_MESSAGE_LENGTH - 3] + "..."
-
-        # 重试机制
-        max_retries = 3
-        for attempt in range(max_retries):
+            return []
+
+        forward = self._should_forward("".join(chunks), chunks)
+        rewritten = await self.image_stage.rewrite_all(chunks)
+
+        if forward:
+            nodes = await self._forward_nodes(rewritten)
+            if nodes:
+                try:
+                    success = await self.scheduler.submit(
+                        group_id, "send_group_forward_msg", {"group_id": group_id, "messages": nodes}, priority
+                    )
+                    self.forward_supported = True
+                    return [] if success else list(chunks)
+                except UnsupportedActionError:
+                    self.forward_supported = False
+                    logger.warning("⚠️ 机器人框架不支持合并转发，改为分段发送")
+
+        # 各段同时提交：同一群内按提交顺序发送，WebSocket 传输下无需等待上一段的响应
+        results = await asyncio.gather(*(
+            self.scheduler.submit(group_id, "send_group_msg", self._message_params(group_id, chunk), priority)
+            for chunk in rewritten
+        ), return_exceptions=True)
+        if len(chunks) > 1:
+            logger.info(f"✂️ QQ群 {group_id} 消息拆分为 {len(chunks)} 段发送")
+
+        remaining = [chunk for chunk, result in zip(chunks, results) if result is not True]
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            # 限流优先：由发件箱延后投递，不计入尝试次数
+            error = next((e for e in errors if isinstance(e, QQThrottledError)), errors[0])
+            error.remaining = remaining
+            raise error
+        return remaining
+
+    @staticmethod
+    def _message_params(group_id: str, message: str) -> dict:
+        return {
+            "group_id": group_id,
+            "message": message,
+            "auto_escape": False  # 允许CQ码
+        }
+
+    def _should_forward(self, message: str, chunks: List[str]) -> bool:
+        if not QQ_FORWARD_ENABLED or self.forward_supported is False:
+            return False
+        return len(chunks) > 1 or count_images(message) >= QQ_FORWARD_IMAGE_THRESHOLD
+
+    async def _forward_nodes(self, chunks: List[str]) -> Optional[List[dict]]:
+        """构造合并转发节点；无法获取机器人QQ号时返回 None"""
+        if self._self_id is None:
             try:
-                async with aiohttp.ClientSession() as session:
-                    payload = {
-                        "group_id": group_id,
-                        "message": message,
-                        "auto_escape": False  # 允许CQ码
-                    }
-
-                    async with session.post(
-                            f"{self.api_url}/send_group_msg",
-                            json=payload,
-                            headers=self.headers,
-                            timeout=10
-                    ) as response:
-
-                        if response.status == 200:
-                            result = await response.json()
-                            if result.get("status") == "ok":
-                                logger.info(f"✅ QQ群 {group_id} 消息发送成功")
-                                return True
-                            else:
-                                logger.error(f"❌ QQ群 {group_id} 第{attempt + 1}次发送失败: {result}")
-                        else:
-                            logger.error(f"❌ QQ群 {group_id} 第{attempt + 1}次API请求失败: {response.status}")
-
-                # 如果不是最后一次尝试，等待后重试
-                if attempt < max_retries - 1:
-                    wait_time = 2 ** attempt  # 指数退避：1秒, 2秒, 4秒...
-                    logger.info(f"等待{wait_time}秒后重试...")
-                    await asyncio.sleep(wait_time)
-
-            except asyncio.TimeoutError:
-                logger.error(f"❌ QQ群 {group_id} 第{attempt + 1}次消息发送超时")
-                if attempt < max_retries - 1:
-                    wait_time = 2 ** attempt
-                    logger.info(f"等待{wait_time}秒后重试...")
-                    await asyncio.sleep(wait_time)
+                result = await self.transport.call("get_login_info", {}, QQ_ACTION_TIMEOUT)
+                if result.get("status") == "ok":
+                    self._self_id = str(result["data"]["user_id"])
             except Exception as e:
-                logger.error(f"❌ QQ群 {group_id} 第{attempt + 1}次消息发送异常: {e}")
-                if attempt < max_retries - 1:
-                    wait_time = 2 ** attempt
-                    logger.info(f"等待{wait_time}秒后重试...")
-                    await asyncio.sleep(wait_time)
+                logger.warning(f"⚠️ 获取机器人QQ号失败，本次不使用合并转发: {e}")
+            if self._self_id is None:
+                return None
 
-        logger.error(f"❌ QQ群 {group_id} 消息发送失败，已重试{max_retries}次")
-        return False
+        return [
+            {"type": "node", "data": {"name": QQ_FORWARD_NODE_NAME, "uin": self._self_id, "content": chunk}}
+            for chunk in chunks
+        ]
 
-    async def send_to_all_groups(self, message: str) -> List[bool]:
+    async def send_to_all_groups(self, message: str, priority: int = DEFAULT_PRIORITY) -> List[bool]:
         """向所有配置的QQ群发送消息"""
-        tasks = [self.send_group_message(group_id, message) for group_id in QQ_GROUP_IDS]
+        tasks = [self.send_group_message(group_id, message, priority) for group_id in QQ_GROUP_IDS]
         results = await asyncio.gather(*tasks, return_exceptions=True)
 
         # 处理结果
@@ -93,6 +141,20 @@ class QQMessageSender:
 
         return results
 
+    def get_stats(self) -> dict:
+        return {
+            'transport': self.transport.get_stats(),
+            'scheduler': self.scheduler.get_stats(),
+            'forward_supported': self.forward_supported,
+            'images': self.image_stage.get_stats(),
+        }
+
+    async def close(self):
+        """停止发送调度并关闭传输层连接"""
+        await self.scheduler.close()
+        await self.transport.close()
+        await self.image_stage.close()
+
 
 # 全局实例
 qq_sender = QQMessageSender()
@@ -7,6 +7,7 @@ from logger_config import logger
 from color_config import ColorConfig
 from email_renderer import EmailRenderer
 from qq_message_generator import QQMessageGenerator
+from tracing import span, traced
 
 
 class CommentRenderer:
@@ -31,24 +32,34 @@ class CommentRenderer:
         soup = BeautifulSoup(html_content, "html.parser")
         return soup.get_text(strip=True)
 
+    @traced("dynamic.fetch")
     async def get_pinned_comment(self, page, dynamic_id):
         """
         抓取置顶评论：
         - pinned_comment_html: 评论 HTML（含文字+表情）
         - comment_images: 评论区上传的图片 URL 列表
         """
-        await page.goto(f"https://t.bilibili.com/{dynamic_id}")
+        with span("dynamic.goto"):
+            await page.goto(f"https://t.bilibili.com/{dynamic_id}")
 
         try:
-            await page.wait_for_selector("bili-comment-thread-renderer", timeout=15000)
+            with span("dynamic.wait_selector"):
+                await page.wait_for_selector("bili-comment-thread-renderer", timeout=15000)
         except:
             return "未找到置顶评论", []
 
         # 模拟滚动加载更多评论
-        for _ in range(5):
-            await page.evaluate("window.scrollBy(0, 1000)")
-            await asyncio.sleep(1)
+        with span("dynamic.scroll"):
+            for _ in range(5):
+                await page.evaluate("window.scrollBy(0, 1000)")
+                await asyncio.sleep(1)
 
+        with span("dynamic.extract"):
+            return await self._extract_pinned_comment(page)
+
+    @staticmethod
+    async def _extract_pinned_comment(page):
+        """从已加载的评论区中提取置顶评论的 HTML 和图片"""
         pinned_comment_html = None
         comment_images = []
 
@@ -2,33 +2,47 @@
 import time
 from datetime import datetime
 from logger_config import logger
-from config import LIVE_FAILURE_THRESHOLD, LIVE_SUCCESS_RATE_THRESHOLD
+from alert_engine import SlidingWindowAlerts
+from config import LIVE_FAILURE_THRESHOLD, LIVE_SUCCESS_RATE_THRESHOLD, LIVE_ALERT_RULES
 
 
 class FailureCounter:
-    """失败计数器（用于自监控）"""
+    """
+    失败计数器（用于自监控）
 
-    def __init__(self, module_name: str, failure_threshold: int = 10, success_rate_threshold: float = 0.8):
+    连续失败次数直接计数；成功率按滑动窗口（见 alert_engine）评估，
+    早期的故障滑出窗口后不再触发告警，长时间正常运行后的故障也能在一个窗口内发现
+    """
+
+    def __init__(self, module_name: str, failure_threshold: int = 10, success_rate_threshold: float = 0.8,
+                 rules: dict = None):
         self.module_name = module_name
         self.failure_threshold = failure_threshold
         self.success_rate_threshold = success_rate_threshold
+        self.rules = rules or {
+            "P2": {"metric": "success_rate", "threshold": success_rate_threshold, "windows": [300, 3600, 86400],
+                   "min_samples": 10},
+        }
 
         self.success_count = 0
         self.failure_count = 0
         self.consecutive_failures = 0
         self.last_reset_time = time.time()
         self.failure_history = []
+        self.alerts = SlidingWindowAlerts(self.rules)
 
     def record_success(self):
         """记录成功"""
         self.success_count += 1
         self.consecutive_failures = 0
         self.last_reset_time = time.time()
+        self.alerts.record(True)
 
     def record_failure(self, error_msg: str = ""):
         """记录失败"""
         self.failure_count += 1
         self.consecutive_failures += 1
+        self.alerts.record(False)
 
         # 记录失败历史（最近10次）
         failure_record = {
@@ -41,19 +55,17 @@ class FailureCounter:
 
     def should_alert(self) -> bool:
         """检查是否需要告警"""
-        total_attempts = self.success_count + self.failure_count
+        # P2告警：任一窗口内成功率低于阈值（样本数不足的窗口不参与判断）
+        self.alerts.evaluate()
 
         # P1告警：连续失败达到阈值
-        if self.consecutive_failures >= self.failure_threshold:
-            return True
+        return self.consecutive_failures >= self.failure_threshold or bool(self.alerts.active)
 
-        # P2告警：成功率低于阈值（至少有10次尝试）
-        if total_attempts >= 10:
-            success_rate = self.success_count / total_attempts
-            if success_rate < self.success_rate_threshold:
-                return True
-
-        return False
+    def alert_reasons(self) -> str:
+        """当前触发的窗口告警说明"""
+        return ", ".join(
+            f"{name}: {detail['window']}成功率 {detail['success_rate']:.2%}" for name, detail in self.alerts.active.items()
+        )
 
     def get_stats(self) -> dict:
         """获取统计信息"""
@@ -68,9 +80,26 @@ class FailureCounter:
             'success_rate': f"{success_rate:.2%}",
             'total_attempts': total_attempts,
             'last_reset': datetime.fromtimestamp(self.last_reset_time).strftime('%Y-%m-%d %H:%M:%S'),
+            'windows': self.alerts.snapshot(),
             'should_alert': self.should_alert()
         }
 
+    def restore(self, store, series: str):
+        """从持久化的指标记录恢复累计计数、连续失败次数和滑动窗口（跨重启）；在日志初始化后调用"""
+        total = store.aggregate(series)
+        self.success_count = total.success
+        self.failure_count = total.failure
+
+        records = store.raw_records(series, time.time() - store.raw.retention)
+        for ts, _, success in records:
+            self.alerts.record(success, ts)
+            self.consecutive_failures = 0 if success else self.consecutive_failures + 1
+        # 重启前已触发的告警恢复为触发状态，不会因重启再次触发
+        self.alerts.evaluate()
+        if total.count:
+            logger.info(f"🔁 {self.module_name} 计数已恢复: 成功{self.success_count} 失败{self.failure_count} "
+                        f"(最近{len(records)}条记录已回放到滑动窗口)")
+
     def reset(self):
         """重置计数器"""
         self.success_count = 0
@@ -78,11 +107,13 @@ class FailureCounter:
         self.consecutive_failures = 0
         self.last_reset_time = time.time()
         self.failure_history = []
+        self.alerts = SlidingWindowAlerts(self.rules)
 
 
 # 创建直播监控的失败计数器实例
 live_failure_counter = FailureCounter(
     'live_monitor',
     failure_threshold=LIVE_FAILURE_THRESHOLD,
-    success_rate_threshold=LIVE_SUCCESS_RATE_THRESHOLD
+    success_rate_threshold=LIVE_SUCCESS_RATE_THRESHOLD,
+    rules=LIVE_ALERT_RULES
 )
@@ -0,0 +1,287 @@
+# smtp_pool.py
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from logger_config import logger
+from config import SMTP_POOL_SIZE, SMTP_TIMEOUT, SMTP_KEEPALIVE_INTERVAL, SMTP_MAX_IDLE_SECONDS
+from config_email import SMTP_SERVER, SMTP_PORT, SMTP_USE_SSL, SMTP_STARTTLS, EMAIL_USER, EMAIL_PASSWORD
+
+# 这些异常只是服务器拒绝了本次请求，连接本身仍可继续使用
+# （注意 SMTPException 是 OSError 的子类，必须先排除它们）
+_REJECTION_ERRORS = (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)
+
+
+def _is_broken_connection(exc: BaseException) -> bool:
+    """判断异常是否意味着连接已不可用，需要丢弃并重建"""
+    return not isinstance(exc, _REJECTION_ERRORS)
+
+
+class SMTPConnectionPool:
+    """
+    SMTP 连接池（线程安全，供 asyncio.to_thread 中的阻塞发送使用）
+
+    - 最多保持 max_size 个已完成 TLS 握手和 AUTH 的连接
+    - 空闲连接定期发送 NOOP 保活，空闲过久则主动关闭
+    - 复用的连接失效时透明重连一次
+    - 记录连接复用率和发送耗时
+    """
+
+    def __init__(self, host: str, port: int, user: str = "", password: str = "",
+                 max_size: int = 2, timeout: float = 30,
+                 use_ssl: Optional[bool] = None, starttls: Optional[bool] = None,
+                 keepalive_interval: float = 60, max_idle_seconds: float = 600):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        # 未指定时 587 端口使用 STARTTLS，其余端口使用隐式 SSL；只有两者都显式为 False 才明文连接
+        if use_ssl is None:
+            use_ssl = not starttls and port != 587
+        self.use_ssl = use_ssl
+        self.starttls = (not use_ssl) if starttls is None else starttls
+        self.keepalive_interval = keepalive_interval
+        self.max_idle_seconds = max_idle_seconds
+
+        self._idle: List[Tuple[smtplib.SMTP, float]] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        self._keepalive_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+        # 统计信息
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.reconnects = 0
+        self.keepalive_noops = 0
+        self.send_count = 0
+        self.send_failures = 0
+        self.total_send_latency = 0.0
+        self.max_send_latency = 0.0
+        self.last_send_latency = 0.0
+
+    # ------------------------------------------------------------------
+    # 连接管理
+    # ------------------------------------------------------------------
+    def _connect(self) -> smtplib.SMTP:
+        """建立新连接并完成握手和登录"""
+        if self.use_ssl:
+            conn = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                conn.starttls()
+                conn.ehlo()
+
+        try:
+            if self.user and self.password:
+                conn.login(self.user, self.password)
+        except Exception:
+            self._close_quietly(conn)
+            raise
+
+        with self._lock:
+            self.connections_created += 1
+        logger.debug(f"📮 新建SMTP连接: {self.host}:{self.port}")
+        return conn
+
+    @staticmethod
+    def _close_quietly(conn: smtplib.SMTP):
+        try:
+            conn.quit()
+        except Exception:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    @staticmethod
+    def _is_alive(conn: smtplib.SMTP) -> bool:
+        """通过 NOOP 确认连接可用"""
+        try:
+            code, _ = conn.noop()
+            return code == 250
+        except Exception:
+            return False
+
+    def _take_idle(self) -> Optional[smtplib.SMTP]:
+        """从空闲队列取出一个可用连接（最近使用的优先）"""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                conn, last_used = self._idle.pop()
+
+            idle_time = time.time() - last_used
+            if idle_time > self.max_idle_seconds:
+                self._close_quietly(conn)
+                continue
+            # 空闲超过保活间隔的连接可能已被服务器断开，先探测一次
+            if idle_time > self.keepalive_interval and not self._is_alive(conn):
+                self._close_quietly(conn)
+                continue
+            return conn
+
+    @contextmanager
+    def connection(self):
+        """
+        借出一个连接，用完自动归还
+
+        Yields:
+            (conn, reused): SMTP 连接以及它是否来自连接池
+        """
+        self._slots.acquire()
+        conn = None
+        broken = False
+        try:
+            conn = self._take_idle()
+            reused = conn is not None
+            if conn is None:
+                conn = self._connect()
+            else:
+                with self._lock:
+                    self.connections_reused += 1
+            yield conn, reused
+        except BaseException as e:
+            broken = _is_broken_connection(e)
+            raise
+        finally:
+            if conn is not None:
+                if not broken:
+                    with self._lock:
+                        if len(self._idle) < self.max_size:
+                            self._idle.append((conn, time.time()))
+                            conn = None
+                if conn is not None:
+                    self._close_quietly(conn)
+            self._slots.release()
+            self._ensure_keepalive_thread()
+
+    # ------------------------------------------------------------------
+    # 发送
+    # ------------------------------------------------------------------
+    def sendmail(self, from_addr: str, to_addrs: List[str], msg: str) -> Dict[str, Tuple[int, bytes]]:
+        """
+        通过连接池发送邮件，返回被拒绝的收件人（与 smtplib.SMTP.sendmail 一致）
+
+        复用的旧连接若已失效，会透明地在新连接上重试一次；
+        新建连接上的失败直接抛出，避免重复投递。
+        """
+        start = time.perf_counter()
+        try:
+            for attempt in range(2):
+                reused = False
+                try:
+                    with self.connection() as (conn, reused):
+                        return conn.sendmail(from_addr, to_addrs, msg)
+                except Exception as e:
+                    if attempt == 0 and reused and _is_broken_connection(e):
+                        with self._lock:
+                            self.reconnects += 1
+                        logger.info(f"🔄 复用的SMTP连接已失效，重新连接: {e}")
+                        continue
+                    raise
+        except Exception:
+            with self._lock:
+                self.send_failures += 1
+            raise
+        finally:
+            self._record_latency(time.perf_counter() - start)
+
+    def _record_latency(self, latency: float):
+        with self._lock:
+            self.send_count += 1
+            self.total_send_latency += latency
+            self.last_send_latency = latency
+            if latency > self.max_send_latency:
+                self.max_send_latency = latency
+
+    # ------------------------------------------------------------------
+    # 保活
+    # ------------------------------------------------------------------
+    def keepalive(self):
+        """对空闲连接执行一次保活：过期的关闭，其余发送 NOOP"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+
+        alive = []
+        now = time.time()
+        for conn, last_used in idle:
+            if now - last_used > self.max_idle_seconds:
+                self._close_quietly(conn)
+                continue
+            if now - last_used >= self.keepalive_interval:
+                if not self._is_alive(conn):
+                    self._close_quietly(conn)
+                    continue
+                with self._lock:
+                    self.keepalive_noops += 1
+            alive.append((conn, last_used))
+
+        with self._lock:
+            self._idle.extend(alive)
+
+    def _keepalive_loop(self):
+        while not self._stop_event.wait(self.keepalive_interval):
+            try:
+                self.keepalive()
+            except Exception as e:
+                logger.error(f"❌ SMTP连接保活失败: {e}")
+
+    def _ensure_keepalive_thread(self):
+        if self._keepalive_thread is not None and self._keepalive_thread.is_alive():
+            return
+        with self._lock:
+            if self._keepalive_thread is not None and self._keepalive_thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._keepalive_thread = threading.Thread(
+                target=self._keepalive_loop, name="smtp-keepalive", daemon=True
+            )
+            self._keepalive_thread.start()
+
+    def close(self):
+        """关闭所有空闲连接并停止保活线程"""
+        self._stop_event.set()
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    # ------------------------------------------------------------------
+    # 统计
+    # ------------------------------------------------------------------
+    def get_stats(self) -> dict:
+        with self._lock:
+            acquisitions = self.connections_created + self.connections_reused
+            reuse_rate = self.connections_reused / acquisitions if acquisitions else 0
+            avg_latency = self.total_send_latency / self.send_count if self.send_count else 0
+            return {
+                'idle_connections': len(self._idle),
+                'connections_created': self.connections_created,
+                'connections_reused': self.connections_reused,
+                'reuse_rate': f"{reuse_rate:.2%}",
+                'reconnects': self.reconnects,
+                'keepalive_noops': self.keepalive_noops,
+                'send_count': self.send_count,
+                'send_failures': self.send_failures,
+                'avg_send_latency': f"{avg_latency:.3f}s",
+                'max_send_latency': f"{self.max_send_latency:.3f}s",
+                'last_send_latency': f"{self.last_send_latency:.3f}s",
+            }
+
+
+# 全局实例
+smtp_pool = SMTPConnectionPool(
+    SMTP_SERVER, SMTP_PORT, EMAIL_USER, EMAIL_PASSWORD,
+    max_size=SMTP_POOL_SIZE,
+    timeout=SMTP_TIMEOUT,
+    use_ssl=SMTP_USE_SSL,
+    starttls=SMTP_STARTTLS,
+    keepalive_interval=SMTP_KEEPALIVE_INTERVAL,
+    max_idle_seconds=SMTP_MAX_IDLE_SECONDS,
+)
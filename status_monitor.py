@@ -1,12 +1,12 @@
 # status_monitor.py
-import asyncio
 import json
 import time
 from datetime import datetime
 from pathlib import Path
 
 from logger_config import logger
-from email_utils import send_email
+from notification_outbox import enqueue_email, PRIORITY_HIGH
+from email_templates import render_no_update_alert
 from config_email import STATUS_MONITOR_EMAILS
 from config import (
     UP_NAME,
@@ -169,58 +169,26 @@ class StatusMonitor:
 
             subject = f"【{UP_NAME}监控提醒】长时间未检测到置顶评论更新"
 
-            content = f"""
-<!DOCTYPE html>
-<html>
-<head>
-<meta charset="UTF-8">
-<title>监控提醒</title>
-<style>
-body {{ font-family: Arial, sans-serif; margin: 20px; }}
-.alert {{ background-color: #fff3cd; border: 1px solid #ffeaa7; padding: 15px; border-radius: 5px; }}
-.info {{ background-color: #d1ecf1; border: 1px solid #bee5eb; padding: 10px; margin-top: 10px; border-radius: 5px; }}
-</style>
-</head>
-<body>
-
-<div class="alert">
-<h2>⚠️ 监控系统提醒</h2>
-<p>已超过 <strong>{hours_int} 小时</strong> 未检测到动态置顶评论更新。</p>
-</div>
-
-<div class="info">
-<h3>📊 监控信息</h3>
-<p>最后更新时间：{datetime.fromtimestamp(self.status_data["last_change_time"]).strftime("%Y-%m-%d %H:%M:%S")}</p>
-<p>累计变化次数：{self.status_data["total_changes"]}</p>
-<p>系统运行时长：{self._format_runtime()}</p>
-<p>当前系统时间：{current_time_str}</p>
-</div>
-
-<div class="info">
-<h3>🔍 建议操作</h3>
-<ol>
-<li>确认 UP 主近期是否确实无更新</li>
-<li>检查动态链接是否仍有效</li>
-<li>如已人工确认无异常，可忽略本提醒</li>
-<li>如修改配置或修复问题，请重启程序</li>
-</ol>
-</div>
-
-</body>
-</html>
-"""
-
-            success = await asyncio.to_thread(
-                send_email,
+            content = render_no_update_alert(
+                hours=hours_int,
+                last_update_time=datetime.fromtimestamp(self.status_data["last_change_time"]).strftime("%Y-%m-%d %H:%M:%S"),
+                total_changes=self.status_data["total_changes"],
+                runtime=self._format_runtime(),
+                current_time=current_time_str,
+            )
+
+            # 写入发件箱即视为成功，投递失败由发件箱负责重试
+            success = enqueue_email(
                 subject=subject,
                 content=content,
                 to_emails=STATUS_MONITOR_EMAILS,
+                priority=PRIORITY_HIGH,
             )
 
             if success:
-                logger.info("✅ 无更新提醒邮件发送成功")
+                logger.info("📥 无更新提醒邮件已入队")
             else:
-                logger.error("❌ 无更新提醒邮件发送失败")
+                logger.error("❌ 无更新提醒邮件入队失败")
 
             return success
 
@@ -0,0 +1,196 @@
+# task_supervisor.py
+import asyncio
+import functools
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from logger_config import logger
+from config import (
+    TASK_RESTART_BASE_DELAY, TASK_RESTART_MAX_DELAY, TASK_RESTART_RESET_AFTER, TASK_HUNG_SECONDS,
+    TASK_LEAK_THRESHOLD, TASK_AUDIT_INTERVAL, TASK_SHUTDOWN_TIMEOUT
+)
+
+KIND_ONESHOT = "oneshot"  # 一次性后台任务（告警、报告发送等），完成后从注册表移除
+KIND_SERVICE = "service"  # 长期运行的服务任务，异常退出后按退避时间重启
+
+
+def _await_chain(coro) -> List[str]:
+    """沿 cr_await 展开协程当前挂起位置的调用链（由外到内）"""
+    lines = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        lines.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}")
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return lines
+
+
+class _TaskRecord:
+    __slots__ = ('name', 'kind', 'task', 'started', 'state', 'restarts', 'last_error', 'hung_reported')
+
+    def __init__(self, name: str, kind: str):
+        self.name = name
+        self.kind = kind
+        self.task: Optional[asyncio.Task] = None
+        self.started = time.time()
+        self.state = "running"  # running / backoff（服务任务等待重启）
+        self.restarts = 0
+        self.last_error = ""
+        self.hung_reported = False
+
+
+class TaskSupervisor:
+    """
+    后台任务注册与监督
+
+    - spawn()：一次性任务，持有引用直到完成（避免未被引用的任务在执行中被回收），异常写入日志
+    - supervise()：长期运行的服务，协程因异常退出时按指数退避重启；正常返回或被取消时结束
+    - 定期巡检：一次性任务运行超过 TASK_HUNG_SECONDS 秒，或同时存在的数量超过 TASK_LEAK_THRESHOLD 时告警
+    - dump()：列出全部任务的名称、类型、状态、已运行时间和当前挂起位置（await 调用链）
+    """
+
+    def __init__(self):
+        self._records: Dict[asyncio.Task, _TaskRecord] = {}
+        self._audit_task: Optional[asyncio.Task] = None
+        self.stats = {'spawned': 0, 'failed': 0, 'restarts': 0, 'hung': 0}
+
+    # ------------------------------------------------------------------
+    # 启动任务
+    # ------------------------------------------------------------------
+    def spawn(self, coro: Awaitable, name: str) -> asyncio.Task:
+        record = _TaskRecord(name, KIND_ONESHOT)
+        task = record.task = asyncio.create_task(coro, name=name)
+        self._records[task] = record
+        self.stats['spawned'] += 1
+        task.add_done_callback(self._on_oneshot_done)
+        return task
+
+    def _on_oneshot_done(self, task: asyncio.Task):
+        record = self._records.pop(task, None)
+        if task.cancelled() or record is None:
+            return
+        error = task.exception()
+        if error is not None:
+            self.stats['failed'] += 1
+            logger.error(f"❌ 后台任务 {record.name} 失败: {error!r}")
+
+    def supervise(self, factory: Callable[[], Awaitable], name: str) -> asyncio.Task:
+        """factory 每次调用返回一个新的协程；返回的任务被取消时服务停止"""
+        record = _TaskRecord(name, KIND_SERVICE)
+        task = record.task = asyncio.create_task(self._run_service(factory, record), name=name)
+        self._records[task] = record
+        task.add_done_callback(functools.partial(self._on_service_done, record))
+        return task
+
+    async def _run_service(self, factory: Callable[[], Awaitable], record: _TaskRecord):
+        delay = TASK_RESTART_BASE_DELAY
+        while True:
+            run_started = time.time()
+            record.state = "running"
+            try:
+                await factory()
+                return
+            except Exception as e:
+                self.stats['failed'] += 1
+                record.last_error = repr(e)
+                # 稳定运行一段时间后再崩溃，退避时间从头计算
+                if time.time() - run_started > TASK_RESTART_RESET_AFTER:
+                    delay = TASK_RESTART_BASE_DELAY
+                logger.error(f"❌ 服务任务 {record.name} 异常退出: {e!r}，{delay:.0f} 秒后重启")
+            record.state = "backoff"
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, TASK_RESTART_MAX_DELAY)
+            record.restarts += 1
+            self.stats['restarts'] += 1
+            logger.info(f"🔁 重启服务任务 {record.name}（第 {record.restarts} 次）")
+
+    def _on_service_done(self, record: _TaskRecord, task: asyncio.Task):
+        self._records.pop(task, None)
+        record.state = "cancelled" if task.cancelled() else "done"
+
+    # ------------------------------------------------------------------
+    # 巡检与查询
+    # ------------------------------------------------------------------
+    def start(self):
+        """在事件循环中调用，启动定期巡检"""
+        if self._audit_task is None:
+            self._audit_task = self.supervise(self._audit_loop, "task_supervisor.audit")
+
+    async def _audit_loop(self):
+        while True:
+            await asyncio.sleep(TASK_AUDIT_INTERVAL)
+            self.audit()
+
+    def audit(self):
+        now = time.time()
+        oneshots = [record for record in self._records.values() if record.kind == KIND_ONESHOT]
+        for record in oneshots:
+            age = now - record.started
+            if age > TASK_HUNG_SECONDS and not record.hung_reported:
+                record.hung_reported = True
+                self.stats['hung'] += 1
+                stack = " -> ".join(_await_chain(record.task.get_coro())) or "未知"
+                logger.warning(f"⚠️ 后台任务 {record.name} 已运行 {age:.0f} 秒，可能已挂起: {stack}")
+        if len(oneshots) > TASK_LEAK_THRESHOLD:
+            counts: Dict[str, int] = {}
+            for record in oneshots:
+                counts[record.name] = counts.get(record.name, 0) + 1
+            top = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:5]
+            logger.warning(f"⚠️ 未完成的后台任务过多: {len(oneshots)} 个 ({', '.join(f'{n}×{c}' for n, c in top)})")
+
+    def dump(self, with_stacks: bool = True) -> List[dict]:
+        now = time.time()
+        rows = []
+        for record in sorted(self._records.values(), key=lambda r: r.started):
+            row = {
+                'name': record.name,
+                'kind': record.kind,
+                'state': record.state,
+                'age': round(now - record.started, 1),
+                'restarts': record.restarts,
+            }
+            if record.last_error:
+                row['last_error'] = record.last_error
+            if with_stacks:
+                row['stack'] = _await_chain(record.task.get_coro())
+            rows.append(row)
+        return rows
+
+    def counts(self) -> Dict[tuple, int]:
+        """(类型, 状态) -> 任务数"""
+        counts: Dict[tuple, int] = {}
+        for record in self._records.values():
+            key = (record.kind, record.state)
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    async def drain(self, timeout: float = TASK_SHUTDOWN_TIMEOUT):
+        """等待进行中的一次性任务（如告警发送）最多 timeout 秒，服务任务不受影响，由各组件自行停止"""
+        oneshots = [task for task, record in self._records.items() if record.kind == KIND_ONESHOT]
+        if oneshots:
+            logger.info(f"⏳ 等待 {len(oneshots)} 个后台任务完成...")
+            await asyncio.wait(oneshots, timeout=timeout)
+
+    async def shutdown(self, timeout: float = TASK_SHUTDOWN_TIMEOUT):
+        """等待进行中的一次性任务最多 timeout 秒，然后取消所有剩余任务"""
+        await self.drain(timeout)
+        remaining = list(self._records)
+        if remaining:
+            names = ", ".join(self._records[task].name for task in remaining)
+            for task in remaining:
+                task.cancel()
+            await asyncio.gather(*remaining, return_exceptions=True)
+            logger.info(f"⏹️ 已取消 {len(remaining)} 个后台任务: {names}")
+        self._audit_task = None
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            'active': {f"{kind}/{state}": count for (kind, state), count in self.counts().items()},
+        }
+
+
+# 全局实例
+task_supervisor = TaskSupervisor()
@@ -0,0 +1,41 @@
+# tests/conftest.py
+import os
+import shutil
+import ssl
+import subprocess
+import sys
+
+import pytest
+
+# 项目模块位于仓库根目录（追加到末尾，不覆盖 PYTHONPATH 中已有的同名模块）
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+from smtp_stub import StubSMTPServer  # noqa: E402
+
+
+@pytest.fixture
+def smtp_server():
+    server = StubSMTPServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture(scope="session")
+def tls_contexts(tmp_path_factory):
+    """自签名证书（127.0.0.1），返回 (服务端上下文, 信任该证书的客户端上下文)"""
+    openssl = shutil.which("openssl")
+    if openssl is None:
+        pytest.skip("需要 openssl 命令生成测试证书")
+    directory = tmp_path_factory.mktemp("tls")
+    cert, key = directory / "cert.pem", directory / "key.pem"
+    subprocess.run(
+        [openssl, "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-keyout", str(key), "-out", str(cert), "-subj", "/CN=127.0.0.1",
+         "-addext", "subjectAltName=IP:127.0.0.1"],
+        check=True, capture_output=True
+    )
+    server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    server_context.load_cert_chain(cert, key)
+    return server_context, ssl.create_default_context(cafile=str(cert))
@@ -0,0 +1,198 @@
+# tests/smtp_stub.py
+"""
+测试用的本地 SMTP 服务器
+
+在独立线程的事件循环中运行，同步（smtplib）和异步客户端都可以连接。
+支持 EHLO（PIPELINING / AUTH / STARTTLS）、AUTH PLAIN / LOGIN、MAIL / RCPT / DATA、NOOP、RSET、QUIT，
+可以按地址拒绝收件人、延迟 DATA 的响应，以及主动断开所有连接（模拟服务器超时断开空闲连接）。
+"""
+import asyncio
+import base64
+import threading
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+
+class ReceivedMessage(NamedTuple):
+    sender: str
+    recipients: List[str]
+    data: bytes
+    tls: bool
+
+
+class StubSMTPServer:
+    def __init__(self, ssl_context=None, starttls_context=None, credentials: Optional[Tuple[str, str]] = None,
+                 auth_mechanisms: Tuple[str, ...] = ("PLAIN", "LOGIN"), pipelining: bool = True):
+        self.ssl_context = ssl_context  # 隐式 TLS（相当于 465 端口）
+        self.starttls_context = starttls_context  # 提供 STARTTLS（相当于 587 端口）
+        self.credentials = credentials
+        self.auth_mechanisms = auth_mechanisms
+        self.pipelining = pipelining
+        self.refuse: Dict[str, Tuple[int, str]] = {}  # 收件人 -> (状态码, 消息)
+        self.data_delay = 0.0  # 收到邮件内容后延迟多少秒再响应
+        self.slow_recipients: Set[str] = set()  # 只延迟发给这些收件人的邮件（为空时全部延迟）
+
+        self.connections = 0
+        self.commands: List[str] = []
+        self.auth: List[Tuple[str, str]] = []  # (机制, 用户名)
+        self.messages: List[ReceivedMessage] = []
+        self.data_received = threading.Event()
+
+        self.port = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+        self._writers: Set[asyncio.StreamWriter] = set()
+        self._sessions: Set[asyncio.Task] = set()
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # 启停
+    # ------------------------------------------------------------------
+    def start(self) -> "StubSMTPServer":
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle, "127.0.0.1", 0, ssl=self.ssl_context)
+            )
+            self.port = self._server.sockets[0].getsockname()[1]
+            ready.set()
+            self._loop.run_forever()
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="smtp-stub", daemon=True)
+        self._thread.start()
+        ready.wait(5)
+        return self
+
+    def stop(self):
+        async def shutdown():
+            self._server.close()
+            self._close_writers()
+            for session in self._sessions:
+                session.cancel()
+            await asyncio.gather(*self._sessions, return_exceptions=True)
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(5)
+
+    def drop_connections(self):
+        """关闭当前所有客户端连接（服务器继续接受新连接）"""
+        async def drop():
+            self._close_writers()
+
+        asyncio.run_coroutine_threadsafe(drop(), self._loop).result(5)
+
+    def _close_writers(self):
+        for writer in list(self._writers):
+            writer.close()
+        self._writers.clear()
+
+    def count(self, command: str) -> int:
+        return sum(1 for line in self.commands if line.upper().startswith(command))
+
+    # ------------------------------------------------------------------
+    # 会话
+    # ------------------------------------------------------------------
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        self._writers.add(writer)
+        self._sessions.add(asyncio.current_task())
+        tls = self.ssl_context is not None
+        sender, recipients = "", []
+
+        async def reply(line: str):
+            writer.write(line.encode("utf-8") + b"\r\n")
+            await writer.drain()
+
+        try:
+            await reply("220 stub ESMTP")
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode("utf-8").rstrip("\r\n")
+                self.commands.append(command)
+                verb = command.split(" ", 1)[0].upper()
+
+                if verb in ("EHLO", "HELO"):
+                    extensions = ["stub"]
+                    if self.pipelining:
+                        extensions.append("PIPELINING")
+                    if self.auth_mechanisms:
+                        extensions.append("AUTH " + " ".join(self.auth_mechanisms))
+                    if self.starttls_context is not None and not tls:
+                        extensions.append("STARTTLS")
+                    for extension in extensions[:-1]:
+                        writer.write(f"250-{extension}\r\n".encode("utf-8"))
+                    await reply(f"250 {extensions[-1]}")
+                elif verb == "STARTTLS":
+                    await reply("220 ready to start TLS")
+                    await writer.start_tls(self.starttls_context)
+                    tls = True
+                elif verb == "AUTH":
+                    await self._auth(command, reader, reply)
+                elif verb == "MAIL":
+                    sender, recipients = command.split(":", 1)[1].strip().strip("<>"), []
+                    await reply("250 sender ok")
+                elif verb == "RCPT":
+                    address = command.split(":", 1)[1].strip().strip("<>")
+                    if address in self.refuse:
+                        code, message = self.refuse[address]
+                        await reply(f"{code} {message}")
+                    else:
+                        recipients.append(address)
+                        await reply("250 recipient ok")
+                elif verb == "DATA":
+                    if not recipients:
+                        await reply("554 no valid recipients")
+                        continue
+                    await reply("354 end data with <CR><LF>.<CR><LF>")
+                    data = []
+                    while True:
+                        data_line = await reader.readline()
+                        if data_line in (b".\r\n", b""):
+                            break
+                        data.append(data_line)
+                    self.data_received.set()
+                    if self.data_delay and (not self.slow_recipients or self.slow_recipients & set(recipients)):
+                        await asyncio.sleep(self.data_delay)
+                    self.messages.append(ReceivedMessage(sender, recipients, b"".join(data), tls))
+                    await reply("250 queued")
+                elif verb == "NOOP":
+                    await reply("250 ok")
+                elif verb == "RSET":
+                    sender, recipients = "", []
+                    await reply("250 ok")
+                elif verb == "QUIT":
+                    await reply("221 bye")
+                    break
+                else:
+                    await reply("502 command not implemented")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            self._sessions.discard(asyncio.current_task())
+            writer.close()
+
+    async def _auth(self, command: str, reader: asyncio.StreamReader, reply):
+        parts = command.split()
+        mechanism = parts[1].upper() if len(parts) > 1 else ""
+        if mechanism == "PLAIN" and len(parts) > 2:
+            _, user, password = base64.b64decode(parts[2]).decode("utf-8").split("\0")
+        elif mechanism == "LOGIN":
+            await reply("334 VXNlcm5hbWU6")
+            user = base64.b64decode(await reader.readline()).decode("utf-8")
+            await reply("334 UGFzc3dvcmQ6")
+            password = base64.b64decode(await reader.readline()).decode("utf-8")
+        else:
+            await reply("504 unrecognized authentication type")
+            return
+
+        if self.credentials is not None and (user, password) != self.credentials:
+            await reply("535 authentication failed")
+            return
+        self.auth.append((mechanism, user))
+        await reply("235 authentication successful")
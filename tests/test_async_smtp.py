@@ -0,0 +1,199 @@
+# tests/test_async_smtp.py
+import asyncio
+import socket
+
+import pytest
+
+import email_utils
+from async_smtp import AsyncSMTPClient, AsyncSMTPAuthenticationError, AsyncSMTPRecipientsRefused
+from smtp_pool import SMTPConnectionPool
+from smtp_stub import StubSMTPServer
+
+MESSAGE = b"Subject: test\r\n\r\nhello\r\n.leading dot\r\n"
+PLAINTEXT = {"use_ssl": False, "starttls": False}  # 本地桩服务器不加密，需显式关闭 SSL
+
+
+@pytest.fixture
+def make_server():
+    servers = []
+
+    def make(**kwargs) -> StubSMTPServer:
+        server = StubSMTPServer(**kwargs).start()
+        servers.append(server)
+        return server
+
+    yield make
+    for server in servers:
+        server.stop()
+
+
+def _send(client: AsyncSMTPClient, *batches):
+    async def run():
+        try:
+            return [await client.sendmail("from@example.com", batch, MESSAGE) for batch in batches]
+        finally:
+            await client.close()
+
+    return asyncio.run(run())
+
+
+def _closed_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# ----------------------------------------------------------------------
+# TLS 与认证
+# ----------------------------------------------------------------------
+def test_implicit_ssl(make_server, tls_contexts):
+    server_context, client_context = tls_contexts
+    server = make_server(ssl_context=server_context, credentials=("user", "secret"))
+    client = AsyncSMTPClient("127.0.0.1", server.port, "user", "secret", use_ssl=True, ssl_context=client_context)
+
+    assert _send(client, ["to@example.com"]) == [{}]
+    assert server.messages[0].tls
+    assert server.messages[0].data == b"Subject: test\r\n\r\nhello\r\n..leading dot\r\n"
+
+
+def test_starttls_before_auth(make_server, tls_contexts):
+    server_context, client_context = tls_contexts
+    server = make_server(starttls_context=server_context, credentials=("user", "secret"))
+    client = AsyncSMTPClient("127.0.0.1", server.port, "user", "secret", starttls=True, ssl_context=client_context)
+
+    assert _send(client, ["to@example.com"]) == [{}]
+    verbs = [command.split()[0].upper() for command in server.commands]
+    assert verbs.index("STARTTLS") < verbs.index("AUTH")
+    assert server.messages[0].tls
+
+
+def test_auth_plain(make_server):
+    server = make_server(credentials=("user", "secret"))
+    _send(AsyncSMTPClient("127.0.0.1", server.port, "user", "secret", **PLAINTEXT), ["to@example.com"])
+    assert server.auth == [("PLAIN", "user")]
+
+
+def test_auth_login_when_plain_is_not_offered(make_server):
+    server = make_server(credentials=("user", "secret"), auth_mechanisms=("LOGIN",))
+    _send(AsyncSMTPClient("127.0.0.1", server.port, "user", "secret", **PLAINTEXT), ["to@example.com"])
+    assert server.auth == [("LOGIN", "user")]
+
+
+def test_auth_failure(make_server):
+    server = make_server(credentials=("user", "secret"))
+    client = AsyncSMTPClient("127.0.0.1", server.port, "user", "wrong", **PLAINTEXT)
+
+    with pytest.raises(AsyncSMTPAuthenticationError):
+        _send(client, ["to@example.com"])
+    assert server.messages == []
+
+
+# ----------------------------------------------------------------------
+# 收件人部分被拒绝
+# ----------------------------------------------------------------------
+@pytest.mark.parametrize("pipelining", [True, False])
+def test_partial_refusal(make_server, pipelining):
+    server = make_server(pipelining=pipelining)
+    server.refuse["bad@example.com"] = (550, "no such user")
+    server.refuse["busy@example.com"] = (451, "try again later")
+    client = AsyncSMTPClient("127.0.0.1", server.port, **PLAINTEXT)
+
+    [refused] = _send(client, ["to@example.com", "bad@example.com", "busy@example.com"])
+
+    assert refused == {"bad@example.com": (550, "no such user"), "busy@example.com": (451, "try again later")}
+    assert server.messages[0].recipients == ["to@example.com"]
+
+
+def test_all_recipients_refused_keeps_connection(make_server):
+    server = make_server()
+    server.refuse["bad@example.com"] = (550, "no such user")
+    client = AsyncSMTPClient("127.0.0.1", server.port, **PLAINTEXT)
+
+    async def run():
+        with pytest.raises(AsyncSMTPRecipientsRefused) as excinfo:
+            await client.sendmail("from@example.com", ["bad@example.com"], MESSAGE)
+        assert excinfo.value.refused == {"bad@example.com": (550, "no such user")}
+        # 流水线中的 DATA 被拒绝后连接已 RSET，可以继续使用
+        assert await client.sendmail("from@example.com", ["to@example.com"], MESSAGE) == {}
+        await client.close()
+
+    asyncio.run(run())
+    assert server.connections == 1
+    assert len(server.messages) == 1
+
+
+# ----------------------------------------------------------------------
+# 取消与重连
+# ----------------------------------------------------------------------
+def test_cancelled_send_discards_connection(make_server):
+    server = make_server()
+    server.data_delay = 2
+    client = AsyncSMTPClient("127.0.0.1", server.port, **PLAINTEXT)
+
+    async def run():
+        task = asyncio.create_task(client.sendmail("from@example.com", ["to@example.com"], MESSAGE))
+        assert await asyncio.to_thread(server.data_received.wait, 5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert client.get_stats()['idle_connections'] == 0
+
+        server.data_delay = 0
+        assert await client.sendmail("from@example.com", ["to@example.com"], MESSAGE) == {}
+        await client.close()
+
+    asyncio.run(run())
+    stats = client.get_stats()
+    assert stats['cancelled_sends'] == 1
+    assert stats['connections_created'] == 2
+    assert server.connections == 2
+
+
+def test_reconnects_after_server_drop(make_server):
+    server = make_server()
+    client = AsyncSMTPClient("127.0.0.1", server.port, **PLAINTEXT)
+
+    async def run():
+        await client.sendmail("from@example.com", ["to@example.com"], MESSAGE)
+        server.drop_connections()
+        await asyncio.sleep(0.05)
+        assert await client.sendmail("from@example.com", ["to@example.com"], MESSAGE) == {}
+        await client.close()
+
+    asyncio.run(run())
+    assert client.get_stats()['reconnects'] == 1
+    assert len(server.messages) == 2
+
+
+# ----------------------------------------------------------------------
+# 连接失败时回退到阻塞连接池
+# ----------------------------------------------------------------------
+def test_connect_error_falls_back_to_blocking_pool(make_server, monkeypatch):
+    server = make_server()
+    pool = SMTPConnectionPool("127.0.0.1", server.port, timeout=5, **PLAINTEXT)
+    monkeypatch.setattr(email_utils, "EMAIL_ASYNC_TRANSPORT_ENABLED", True)
+    monkeypatch.setattr(email_utils, "EMAIL_INLINE_IMAGES_ENABLED", False)
+    client = AsyncSMTPClient("127.0.0.1", _closed_port(), timeout=2, **PLAINTEXT)
+    monkeypatch.setattr(email_utils, "async_smtp_client", client)
+    monkeypatch.setattr(email_utils, "smtp_pool", pool)
+
+    try:
+        report = asyncio.run(email_utils.send_email_report_async("主题", "<p>hello</p>", ["to@example.com"]))
+    finally:
+        pool.close()
+
+    assert report.ok
+    assert report.delivered == ["to@example.com"]
+    assert server.messages[0].recipients == ["to@example.com"]
+    assert email_utils.async_smtp_client.get_stats()['send_failures'] == 1
+
+
+def test_plain_server_is_not_used_without_explicit_opt_out(make_server):
+    # 非 465 / 587 端口默认也走 SSL，不会静默退化为明文发送凭据
+    server = make_server(credentials=("user", "secret"))
+    client = AsyncSMTPClient("127.0.0.1", server.port, "user", "secret", timeout=2)
+
+    assert client.use_ssl and not client.starttls
+    with pytest.raises(Exception):
+        _send(client, ["to@example.com"])
+    assert server.auth == []
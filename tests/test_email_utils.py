@@ -0,0 +1,65 @@
+# tests/test_email_utils.py
+import asyncio
+import time
+
+import pytest
+
+import email_utils
+import notification_outbox
+from async_smtp import AsyncSMTPClient
+from notification_outbox import PartialDelivery
+
+
+@pytest.fixture
+def email_transport(smtp_server, monkeypatch):
+    monkeypatch.setattr(email_utils, "EMAIL_ASYNC_TRANSPORT_ENABLED", True)
+    monkeypatch.setattr(email_utils, "EMAIL_INLINE_IMAGES_ENABLED", False)
+    monkeypatch.setattr(email_utils, "EMAIL_BCC_BATCH_SIZE", 1)
+    monkeypatch.setattr(email_utils, "EMAIL_SEND_DEADLINE", 0.5)
+    client = AsyncSMTPClient("127.0.0.1", smtp_server.port, timeout=5, use_ssl=False, starttls=False)
+    monkeypatch.setattr(email_utils, "async_smtp_client", client)
+    return smtp_server
+
+
+def test_slow_batch_fails_alone_at_the_deadline(email_transport):
+    email_transport.data_delay = 3
+    email_transport.slow_recipients = {"slow@example.com"}
+
+    started = time.monotonic()
+    report = asyncio.run(email_utils.send_email_report_async(
+        "主题", "<p>hello</p>", ["fast@example.com", "slow@example.com"]
+    ))
+
+    assert time.monotonic() - started < 2
+    assert report.delivered == ["fast@example.com"]
+    assert list(report.failed) == ["slow@example.com"]
+    assert "超时" in report.failed["slow@example.com"]
+
+
+def test_deadline_turns_into_partial_delivery(email_transport):
+    email_transport.data_delay = 3
+    email_transport.slow_recipients = {"slow@example.com"}
+    payload = {"subject": "主题", "content": "<p>hello</p>", "to_emails": ["fast@example.com", "slow@example.com"]}
+
+    result = asyncio.run(notification_outbox._deliver_email(payload))
+
+    # 重试只发给超时的那一批，已送达的收件人不会重复收到
+    assert isinstance(result, PartialDelivery)
+    assert result.payload["to_emails"] == ["slow@example.com"]
+
+
+def test_blocking_send_skips_batches_after_the_deadline(smtp_server, monkeypatch):
+    from smtp_pool import SMTPConnectionPool
+
+    pool = SMTPConnectionPool("127.0.0.1", smtp_server.port, timeout=5, use_ssl=False, starttls=False)
+    monkeypatch.setattr(email_utils, "smtp_pool", pool)
+    monkeypatch.setattr(email_utils, "EMAIL_BCC_BATCH_SIZE", 1)
+    try:
+        report = email_utils.send_email_report("主题", "<p>hello</p>", ["a@example.com", "b@example.com"],
+                                               deadline=time.monotonic() - 1)
+    finally:
+        pool.close()
+
+    assert report.delivered == []
+    assert sorted(report.failed) == ["a@example.com", "b@example.com"]
+    assert smtp_server.messages == []
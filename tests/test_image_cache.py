@@ -0,0 +1,68 @@
+# tests/test_image_cache.py
+import asyncio
+import json
+import os
+
+import image_cache
+from image_cache import ImageCache
+
+JPEG = b"\xff\xd8\xff" + b"x" * 100
+
+
+def _add(cache: ImageCache, url: str, content: bytes) -> str:
+    """模拟一次下载完成：文件已写入，在事件循环中登记"""
+    name = f"{content[-1]:064x}.jpg"
+    (cache.cache_dir / name).write_bytes(content)
+    return cache._store(url, name, len(content))
+
+
+def test_index_is_written_in_batches_off_the_loop(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_cache, "IMAGE_CACHE_FLUSH_DELAY", 0.1)
+    cache = ImageCache(tmp_path)
+    index_file = tmp_path / "index.json"
+    written = []
+    write_disk = cache._write_disk
+
+    def recording_write(*args):
+        written.append(args)
+        write_disk(*args)
+
+    monkeypatch.setattr(cache, "_write_disk", recording_write)
+
+    async def run():
+        _add(cache, "https://i0.hdslb.com/a.jpg", JPEG + b"a")
+        _add(cache, "https://i0.hdslb.com/b.jpg", JPEG + b"b")
+        assert not index_file.exists()  # 登记时不写盘
+        await asyncio.sleep(0.3)
+        assert len(written) == 1  # 两次登记合并为一次写入
+        await cache.close()
+
+    asyncio.run(run())
+    assert set(json.loads(index_file.read_text(encoding="utf-8"))) == {
+        "https://i0.hdslb.com/a.jpg", "https://i0.hdslb.com/b.jpg"
+    }
+
+
+def test_eviction_and_touch_are_applied_on_close(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_cache, "IMAGE_CACHE_FLUSH_DELAY", 60)
+    cache = ImageCache(tmp_path, max_bytes=len(JPEG) * 2 + 2)
+
+    async def run():
+        first = _add(cache, "https://i0.hdslb.com/a.jpg", JPEG + b"a")
+        second = _add(cache, "https://i0.hdslb.com/b.jpg", JPEG + b"b")
+        os.utime(tmp_path / first, (0, 0))
+        assert await cache.get("https://i0.hdslb.com/a.jpg") is not None
+        assert (tmp_path / first).stat().st_mtime == 0  # 命中时不在事件循环中 utime
+        third = _add(cache, "https://i0.hdslb.com/c.jpg", JPEG + b"c")
+        assert (tmp_path / second).exists()  # 已淘汰，但尚未删除
+        await cache.close()
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert (tmp_path / first).stat().st_mtime > 0
+    assert not (tmp_path / second).exists()
+    assert (tmp_path / third).exists()
+    assert cache.get_stats()['evictions'] == 1
+    assert set(json.loads((tmp_path / "index.json").read_text(encoding="utf-8"))) == {
+        "https://i0.hdslb.com/a.jpg", "https://i0.hdslb.com/c.jpg"
+    }
@@ -0,0 +1,26 @@
+# tests/test_metrics_server.py
+import time
+from types import SimpleNamespace
+
+import metrics_server
+from metrics_server import MetricsServer
+
+
+def _server(last_cycle_completed: float, last_health_check: float) -> MetricsServer:
+    monitor = SimpleNamespace(
+        loop_count=3, last_cycle_completed=last_cycle_completed,
+        health_checker=SimpleNamespace(last_health_check=last_health_check),
+    )
+    return MetricsServer(SimpleNamespace(monitor=monitor))
+
+
+def test_cycle_health_uses_completion_time(monkeypatch):
+    monkeypatch.setattr(metrics_server, "HEALTH_CYCLE_STALE_SECONDS", 60)
+    now = time.time()
+
+    # 一轮开始后卡住：开始时间和浏览器探测仍在刷新，但已很久没有完成一轮
+    stuck = _server(last_cycle_completed=now - 600, last_health_check=now)._cycle_health(now)
+    assert stuck['ok'] is False
+    assert stuck['last_cycle_age'] == 600
+
+    assert _server(last_cycle_completed=now - 5, last_health_check=now - 600)._cycle_health(now)['ok'] is True
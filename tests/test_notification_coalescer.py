@@ -0,0 +1,73 @@
+# tests/test_notification_coalescer.py
+import asyncio
+
+import pytest
+
+from notification_coalescer import NotificationCoalescer
+from notification_outbox import OutboxStore
+
+RULES = {"comment_change": {"window": 0.2, "max_delay": 0.5}}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = OutboxStore(tmp_path / "outbox.db")
+    yield store
+    store.close()
+
+
+def _recorder():
+    emitted = []
+
+    async def emit(first, last, count):
+        emitted.append((first["n"], last["n"], count))
+
+    return emitted, emit
+
+
+def test_pending_event_is_persisted_until_emitted(store):
+    emitted, emit = _recorder()
+    coalescer = NotificationCoalescer(RULES, [], store)
+    coalescer.register(["comment_change"], emit)
+
+    async def run():
+        await coalescer.start()
+        await coalescer.submit("comment_change", "comment:1", {"n": 1}, emit)
+        await coalescer.submit("comment_change", "comment:1", {"n": 2}, emit)
+        await coalescer.submit("comment_change", "comment:1", {"n": 3}, emit)
+        assert [row["count"] for row in store.load_pending()] == [2]
+        await asyncio.sleep(0.4)
+
+    asyncio.run(run())
+    assert emitted == [(1, 1, 1), (2, 3, 2)]
+    assert store.load_pending() == []
+
+
+def test_pending_event_survives_a_crash(store):
+    emitted, emit = _recorder()
+    crashed = NotificationCoalescer(RULES, [], store)
+
+    async def before_crash():
+        await crashed.start()
+        await crashed.submit("comment_change", "comment:1", {"n": 1}, emit)
+        await crashed.submit("comment_change", "comment:1", {"n": 2}, emit)
+
+    # 窗口结束前进程退出：挂起的定时任务随事件循环一起消失，没有 flush_all
+    asyncio.run(before_crash())
+    assert emitted == [(1, 1, 1)]
+
+    restarted = NotificationCoalescer(RULES, [], store)
+
+    async def after_restart():
+        await restarted.start()
+        assert restarted.get_stats()['pending'] == 1
+        # emit 注册之前不会发出（也不会从磁盘删除）
+        await restarted.flush_all()
+        assert len(store.load_pending()) == 1
+        restarted.register(["comment_change"], emit)
+        await asyncio.sleep(0.4)
+
+    asyncio.run(after_restart())
+    assert emitted == [(1, 1, 1), (2, 2, 1)]
+    assert store.load_pending() == []
+    assert restarted.get_stats()['restored'] == 1
@@ -0,0 +1,221 @@
+# tests/test_notification_outbox.py
+import asyncio
+import sqlite3
+
+import pytest
+
+import notification_outbox
+from notification_outbox import NotificationOutbox
+from task_supervisor import task_supervisor, KIND_SERVICE
+
+
+@pytest.fixture
+def outbox(tmp_path, monkeypatch):
+    monkeypatch.setattr(notification_outbox, "OUTBOX_WORKER_ERROR_DELAY", 0.01)
+    outbox = NotificationOutbox(tmp_path / "outbox.db")
+    yield outbox
+    outbox.store.close()
+
+
+async def _wait_until(predicate, timeout: float = 5):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "等待超时"
+        await asyncio.sleep(0.01)
+
+
+def test_worker_survives_database_errors(outbox, monkeypatch):
+    delivered = []
+
+    async def handler(payload):
+        delivered.append(payload["n"])
+        return True
+
+    outbox.register_handler("test", handler, timeout=5)
+    claim = outbox.store.claim
+    failures = iter([sqlite3.OperationalError("database is locked")] * 2)
+
+    def flaky_claim(channel):
+        error = next(failures, None)
+        if error is not None:
+            raise error
+        return claim(channel)
+
+    monkeypatch.setattr(outbox.store, "claim", flaky_claim)
+
+    async def run():
+        outbox.enqueue("test", {"n": 1})
+        await outbox.start()
+        await _wait_until(lambda: delivered == [1])
+        assert not outbox._workers[0].done()
+        await outbox.stop()
+
+    asyncio.run(run())
+    assert outbox.store.counts() == {"done": 1}
+
+
+def test_workers_are_supervised_services(outbox):
+    async def handler(payload):
+        return True
+
+    outbox.register_handler("test", handler, timeout=5)
+
+    def services():
+        return {row['name'] for row in task_supervisor.dump(with_stacks=False)
+                if row['kind'] == KIND_SERVICE and row['name'].startswith("outbox.")}
+
+    async def run():
+        await outbox.start()
+        running = services()
+        await outbox.stop()
+        return running, services()
+
+    running, stopped = asyncio.run(run())
+    assert running == {"outbox.test.0", "outbox.maintenance"}
+    assert stopped == set()
+
+
+# ----------------------------------------------------------------------
+# QQ 限流：冷却较长时退回发件箱延后投递，不计入尝试次数
+# ----------------------------------------------------------------------
+GROUP_ID = "10001"
+OK = {"status": "ok", "retcode": 0, "data": {"message_id": 1}}
+
+
+@pytest.fixture
+def qq_outbox(outbox, monkeypatch):
+    import qq_scheduler
+    import qq_utils
+    from qq_scheduler import QQSendScheduler
+
+    monkeypatch.setattr(qq_utils, "QQ_PUSH_ENABLED", True)
+    monkeypatch.setattr(qq_utils, "QQ_FORWARD_ENABLED", False)
+    monkeypatch.setattr(qq_scheduler, "QQ_THROTTLE_BASE_DELAY", 0.05)
+    monkeypatch.setattr(qq_scheduler, "QQ_THROTTLE_DEFER_AFTER", 0.15)
+    monkeypatch.setattr(qq_scheduler, "QQ_GROUP_BURST", 10)
+
+    responses = []
+    sent = []
+
+    async def send_func(action, params):
+        sent.append(params["message"])
+        return responses.pop(0) if responses else OK
+
+    sender = qq_utils.QQMessageSender()
+    sender.scheduler = QQSendScheduler(send_func)
+    monkeypatch.setattr(notification_outbox, "qq_sender", sender)
+    # 通道超时小于全部冷却时间之和：不延后投递时会超时并计入尝试次数
+    outbox.register_handler(notification_outbox.CHANNEL_QQ, notification_outbox._deliver_qq, timeout=1)
+    return outbox, responses, sent
+
+
+def _deliver_one(outbox):
+    async def run():
+        outbox.enqueue(notification_outbox.CHANNEL_QQ, {"group_id": GROUP_ID, "message": "开播啦"})
+        await outbox.start()
+        await _wait_until(lambda: outbox.store.counts().get("done") or outbox.store.counts().get("dead"), 10)
+        await outbox.stop()
+
+    asyncio.run(run())
+    return outbox.store.conn.execute("SELECT status, attempts FROM outbox").fetchone()
+
+
+def test_retry_after_throttling_defers_without_counting_attempts(qq_outbox):
+    outbox, responses, sent = qq_outbox
+    # 限流次数超过 OUTBOX_MAX_ATTEMPTS，计入尝试次数时会进入死信
+    responses.extend([{"status": "failed", "retcode": 100, "retry_after": 0.2}] * 6)
+
+    row = _deliver_one(outbox)
+
+    assert (row["status"], row["attempts"]) == ("done", 1)
+    assert len(sent) == 7
+    stats = outbox.get_stats()['channels']['qq']
+    assert stats['deferred'] == 6
+    assert stats['dead'] == 0 and stats['retries'] == 0
+
+
+def test_retcode_throttling_backs_off_then_defers(qq_outbox):
+    outbox, responses, sent = qq_outbox
+    # 无 retry_after：冷却 0.05、0.1 秒后在调度器内重发，第三次冷却 0.2 秒超过阈值，退回发件箱
+    responses.extend([{"status": "failed", "retcode": 429}] * 3)
+
+    row = _deliver_one(outbox)
+
+    assert (row["status"], row["attempts"]) == ("done", 1)
+    assert len(sent) == 4
+    assert outbox.get_stats()['channels']['qq']['deferred'] == 1
+    assert notification_outbox.qq_sender.scheduler.get_stats()['throttle_events'] == 3
+
+
+def _long_message(monkeypatch, lines):
+    import qq_utils
+
+    monkeypatch.setattr(qq_utils, "MAX_MESSAGE_LENGTH", 8)
+    return "".join(f"第{n}段内容\n" for n in range(1, lines + 1))
+
+
+def test_partial_chunk_failure_resends_only_undelivered_chunks(qq_outbox, monkeypatch):
+    import qq_scheduler
+
+    outbox, responses, sent = qq_outbox
+    monkeypatch.setattr(qq_scheduler, "QQ_SEND_MAX_RETRIES", 1)
+    monkeypatch.setattr(notification_outbox, "OUTBOX_RETRY_BASE_DELAY", 0.05)
+    message = _long_message(monkeypatch, 3)
+    # 第 2 段失败，第 1、3 段成功
+    responses.extend([OK, {"status": "failed", "retcode": 100}, OK])
+
+    async def run():
+        outbox.enqueue(notification_outbox.CHANNEL_QQ, {"group_id": GROUP_ID, "message": message})
+        await outbox.start()
+        await _wait_until(lambda: outbox.store.counts().get("done"), 10)
+        await outbox.stop()
+
+    asyncio.run(run())
+    assert sent == ["第1段内容", "第2段内容", "第3段内容", "第2段内容"]
+    assert outbox.get_stats()['channels']['qq']['partial'] == 1
+
+
+def test_throttled_chunks_keep_progress(qq_outbox, monkeypatch):
+    outbox, responses, sent = qq_outbox
+    message = _long_message(monkeypatch, 3)
+    # 第 2 段被限流且冷却较长：该段退回发件箱延后投递，已送达的第 1、3 段不重发
+    responses.extend([OK, {"status": "failed", "retcode": 100, "retry_after": 0.2}, OK])
+
+    async def run():
+        outbox.enqueue(notification_outbox.CHANNEL_QQ, {"group_id": GROUP_ID, "message": message})
+        await outbox.start()
+        await _wait_until(lambda: outbox.store.counts().get("done"), 10)
+        await outbox.stop()
+
+    asyncio.run(run())
+    assert sent == ["第1段内容", "第2段内容", "第3段内容", "第2段内容"]
+    assert outbox.get_stats()['channels']['qq']['deferred'] == 1
+
+
+def test_chunk_error_resends_only_the_failed_chunk(qq_outbox, monkeypatch):
+    outbox, responses, sent = qq_outbox
+    monkeypatch.setattr(notification_outbox, "OUTBOX_RETRY_BASE_DELAY", 0.05)
+    message = _long_message(monkeypatch, 3)
+    scheduler = notification_outbox.qq_sender.scheduler
+    submit = scheduler.submit
+    failures = ["第2段内容"]
+
+    async def flaky_submit(group_id, action, params, priority):
+        # 第 2 段第一次提交时出错（不是限流）：只重发第 2 段
+        if params["message"] in failures:
+            failures.remove(params["message"])
+            sent.append(params["message"])
+            raise ConnectionError("WebSocket 连接已断开")
+        return await submit(group_id, action, params, priority)
+
+    monkeypatch.setattr(scheduler, "submit", flaky_submit)
+
+    async def run():
+        outbox.enqueue(notification_outbox.CHANNEL_QQ, {"group_id": GROUP_ID, "message": message})
+        await outbox.start()
+        await _wait_until(lambda: outbox.store.counts().get("done"), 10)
+        await outbox.stop()
+
+    asyncio.run(run())
+    assert sorted(sent) == ["第1段内容", "第2段内容", "第2段内容", "第3段内容"]
+    assert outbox.get_stats()['channels']['qq']['partial'] == 1
@@ -0,0 +1,64 @@
+# tests/test_onebot_transport.py
+import asyncio
+import json
+
+import pytest
+from aiohttp import web
+
+from onebot_transport import OneBotWebSocketTransport, is_unsupported_action
+
+
+def test_only_retcode_1404_means_unsupported():
+    assert is_unsupported_action({"status": "failed", "retcode": 1404})
+    # HTTP 404 可能来自反向代理或地址错误，不能据此永久关闭合并转发
+    assert not is_unsupported_action({"status": "failed", "retcode": 404, "http_status": 404})
+    assert not is_unsupported_action({"status": "ok", "retcode": 1404})
+
+
+async def _serve_onebot():
+    """最小的 OneBot 正向 WebSocket 服务：按 echo 返回 ok"""
+    async def handle(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        async for msg in ws:
+            data = json.loads(msg.data)
+            await ws.send_str(json.dumps({
+                "status": "ok", "retcode": 0, "data": {"action": data["action"]}, "echo": data["echo"]
+            }))
+        return ws
+
+    app = web.Application()
+    app.router.add_get("/", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, runner.addresses[0][1]
+
+
+def test_websocket_call_round_trip():
+    async def run():
+        runner, port = await _serve_onebot()
+        transport = OneBotWebSocketTransport(f"ws://127.0.0.1:{port}/")
+        try:
+            results = await asyncio.gather(*(transport.call("send_group_msg", {"n": n}) for n in range(3)))
+        finally:
+            await transport.close()
+            await runner.cleanup()
+        assert [result["data"]["action"] for result in results] == ["send_group_msg"] * 3
+        assert transport.actions_sent == 3
+
+    asyncio.run(run())
+
+
+def test_call_raises_connection_error_when_connection_is_gone(monkeypatch):
+    transport = OneBotWebSocketTransport("ws://127.0.0.1:1/")
+
+    async def connected_then_dropped():
+        transport.ws = None  # 连接在 _ensure_connected 返回后立即断开
+
+    monkeypatch.setattr(transport, "_ensure_connected", connected_then_dropped)
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(transport.call("send_group_msg", {}))
+    assert transport._pending == {}
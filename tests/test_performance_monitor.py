@@ -0,0 +1,24 @@
+# tests/test_performance_monitor.py
+import asyncio
+import threading
+
+import performance_monitor
+from performance_monitor import PerformanceMonitor
+
+
+def test_report_reads_trends_off_the_event_loop(monkeypatch):
+    monitor = PerformanceMonitor()
+    threads = []
+    sent = []
+
+    def trend_rows():
+        threads.append(threading.current_thread())
+        return [{'window': "24小时", 'cycles': 10, 'success_rate': 0.9, 'avg_duration': 1.0, 'max_duration': 2.0}]
+
+    monkeypatch.setattr(monitor, "_trend_rows", trend_rows)
+    monkeypatch.setattr(performance_monitor, "enqueue_email", lambda **kwargs: sent.append(kwargs) or True)
+
+    asyncio.run(monitor._send_report(10))
+
+    assert threads and threads[0] is not threading.main_thread()
+    assert len(sent) == 1 and "24小时" in sent[0]['content']
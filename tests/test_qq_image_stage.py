@@ -0,0 +1,63 @@
+# tests/test_qq_image_stage.py
+import asyncio
+
+import pytest
+
+import qq_image_stage
+from image_cache import CachedImage
+from qq_image_stage import QQImageStage, _resolve_delivery
+
+
+def test_auto_delivery(monkeypatch):
+    monkeypatch.setattr(qq_image_stage, "Image", object())
+    assert _resolve_delivery("auto", "ws://127.0.0.1:8080/onebot/v11/ws") == "file"
+    assert _resolve_delivery("auto", "ws://bot.example.com:8080/onebot/v11/ws") == "base64"
+
+
+def test_auto_delivery_without_pillow_keeps_remote_urls(monkeypatch):
+    monkeypatch.setattr(qq_image_stage, "Image", None)
+    # 图片无法缩小，远程机器人不内联原图
+    assert _resolve_delivery("auto", "ws://bot.example.com:8080/onebot/v11/ws") == "url"
+    assert _resolve_delivery("auto", "ws://127.0.0.1:8080/onebot/v11/ws") == "file"
+    assert _resolve_delivery("base64", "ws://bot.example.com:8080/onebot/v11/ws") == "base64"
+
+
+class _FakeCache:
+    def __init__(self, images):
+        self.images = images
+
+    async def get_many(self, urls):
+        return {url: self.images[url] for url in urls if url in self.images}
+
+
+@pytest.fixture
+def images(tmp_path):
+    small, large = tmp_path / "small.jpg", tmp_path / "large.jpg"
+    small.write_bytes(b"\xff\xd8\xff" + b"s" * 100)
+    large.write_bytes(b"\xff\xd8\xff" + b"l" * 4096)
+    return {
+        "https://i0.hdslb.com/small.jpg": CachedImage("small", small, "jpeg", small.stat().st_size),
+        "https://i0.hdslb.com/large.jpg": CachedImage("large", large, "jpeg", large.stat().st_size),
+    }
+
+
+def test_base64_skips_images_over_the_limit(images):
+    stage = QQImageStage(cache=_FakeCache(images), delivery="base64")
+    stage.base64_max_bytes = 1024
+    message = "[CQ:image,file=https://i0.hdslb.com/small.jpg][CQ:image,file=https://i0.hdslb.com/large.jpg]"
+
+    result = asyncio.run(stage.rewrite(message))
+
+    assert "[CQ:image,file=base64://" in result
+    assert "[CQ:image,file=https://i0.hdslb.com/large.jpg]" in result
+    assert stage.stats == {'rewritten': 1, 'kept_remote': 1, 'too_large': 1}
+
+
+def test_file_delivery_has_no_size_limit(images):
+    stage = QQImageStage(cache=_FakeCache(images), delivery="file")
+    stage.base64_max_bytes = 1024
+    message = "[CQ:image,file=https://i0.hdslb.com/large.jpg]"
+
+    result = asyncio.run(stage.rewrite(message))
+
+    assert result.startswith("[CQ:image,file=file://")
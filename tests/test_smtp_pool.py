@@ -0,0 +1,114 @@
+# tests/test_smtp_pool.py
+import smtplib
+import time
+
+import pytest
+
+from smtp_pool import SMTPConnectionPool
+
+MESSAGE = "Subject: test\r\n\r\nhello\r\n"
+
+
+@pytest.fixture
+def pool(smtp_server):
+    pool = SMTPConnectionPool("127.0.0.1", smtp_server.port, "user", "secret", max_size=2, timeout=5,
+                              use_ssl=False, starttls=False)
+    yield pool
+    pool.close()
+
+
+def test_connection_is_reused(pool, smtp_server):
+    for _ in range(3):
+        assert pool.sendmail("from@example.com", ["to@example.com"], MESSAGE) == {}
+
+    assert smtp_server.connections == 1
+    assert smtp_server.count("AUTH") == 1  # 复用的连接不再重新登录
+    assert len(smtp_server.messages) == 3
+    stats = pool.get_stats()
+    assert stats['connections_created'] == 1
+    assert stats['connections_reused'] == 2
+    assert stats['idle_connections'] == 1
+
+
+def test_keepalive_sends_noop_to_idle_connections(smtp_server):
+    pool = SMTPConnectionPool("127.0.0.1", smtp_server.port, timeout=5, keepalive_interval=0.2,
+                              use_ssl=False, starttls=False)
+    try:
+        pool.sendmail("from@example.com", ["to@example.com"], MESSAGE)
+        time.sleep(0.3)
+        pool.keepalive()
+
+        assert smtp_server.count("NOOP") >= 1
+        assert pool.get_stats()['keepalive_noops'] >= 1
+        assert pool.get_stats()['idle_connections'] == 1
+    finally:
+        pool.close()
+
+
+def test_keepalive_discards_connections_closed_by_server(smtp_server):
+    pool = SMTPConnectionPool("127.0.0.1", smtp_server.port, timeout=5, keepalive_interval=0.2,
+                              use_ssl=False, starttls=False)
+    try:
+        pool.sendmail("from@example.com", ["to@example.com"], MESSAGE)
+        smtp_server.drop_connections()
+        time.sleep(0.3)
+        pool.keepalive()
+
+        assert pool.get_stats()['idle_connections'] == 0
+    finally:
+        pool.close()
+
+
+def test_reconnects_transparently_after_server_drop(pool, smtp_server):
+    pool.sendmail("from@example.com", ["to@example.com"], MESSAGE)
+    smtp_server.drop_connections()
+
+    assert pool.sendmail("from@example.com", ["to@example.com"], MESSAGE) == {}
+
+    assert smtp_server.connections == 2
+    assert len(smtp_server.messages) == 2
+    stats = pool.get_stats()
+    assert stats['reconnects'] == 1
+    assert stats['send_failures'] == 0
+
+
+def test_refused_recipients_keep_connection(pool, smtp_server):
+    smtp_server.refuse["bad@example.com"] = (550, "no such user")
+
+    refused = pool.sendmail("from@example.com", ["to@example.com", "bad@example.com"], MESSAGE)
+
+    assert refused == {"bad@example.com": (550, b"no such user")}
+    assert smtp_server.messages[0].recipients == ["to@example.com"]
+    assert pool.get_stats()['idle_connections'] == 1
+
+
+def test_get_stats(pool, smtp_server):
+    pool.sendmail("from@example.com", ["to@example.com"], MESSAGE)
+    pool.sendmail("from@example.com", ["to@example.com"], MESSAGE)
+    smtp_server.refuse["to@example.com"] = (550, "no such user")
+    with pytest.raises(smtplib.SMTPRecipientsRefused):
+        pool.sendmail("from@example.com", ["to@example.com"], MESSAGE)
+
+    stats = pool.get_stats()
+    assert stats['send_count'] == 3
+    assert stats['send_failures'] == 1
+    assert stats['reuse_rate'] == "66.67%"
+    assert stats['reconnects'] == 0
+    assert stats['keepalive_noops'] == 0
+    for key in ('avg_send_latency', 'max_send_latency', 'last_send_latency'):
+        assert stats[key].endswith("s")
+
+
+@pytest.mark.parametrize("port, options, expected", [
+    (465, {}, (True, False)),
+    (2465, {}, (True, False)),
+    (25, {}, (True, False)),
+    (587, {}, (False, True)),
+    (25, {"use_ssl": False}, (False, True)),
+    (2587, {"starttls": True}, (False, True)),
+    (25, {"use_ssl": False, "starttls": False}, (False, False)),
+])
+def test_encryption_defaults_to_ssl_unless_disabled_explicitly(port, options, expected):
+    pool = SMTPConnectionPool("127.0.0.1", port, **options)
+
+    assert (pool.use_ssl, pool.starttls) == expected
@@ -0,0 +1,146 @@
+# tracing.py
+import functools
+import inspect
+import time
+from typing import Callable, Dict, Optional
+
+from config import TRACING_ENABLED
+from metrics import STAGE_DURATION
+from event_log import emit_stage
+
+
+class _Span:
+    """计时区间：退出时把耗时记入所属 Tracer（异常退出同样记录）"""
+    __slots__ = ('tracer', 'name', 'start')
+
+    def __init__(self, tracer: "Tracer", name: str):
+        self.tracer = tracer
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullSpan:
+    """关闭追踪时返回的空区间（单例，不计时、不分配对象）"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _StageStats:
+    __slots__ = ('count', 'total', 'max', 'window_count', 'window_total', 'window_max')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        # 自上次 drain_summary() 以来的统计，用于定期性能摘要
+        self.window_count = 0
+        self.window_total = 0.0
+        self.window_max = 0.0
+
+    def add(self, duration: float):
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+        self.window_count += 1
+        self.window_total += duration
+        if duration > self.window_max:
+            self.window_max = duration
+
+
+class Tracer:
+    """
+    分阶段耗时追踪
+
+    - span(name) 作为 with 语句计时一个代码块，traced(name) 作为装饰器计时整个函数（支持协程函数）
+    - 各阶段的次数 / 总耗时 / 最大值在内存中聚合，同时记入 metrics.STAGE_DURATION 直方图由 /metrics 导出，
+      并作为 stage 事件写入结构化事件日志
+    - 关闭时 span() 返回共享的空区间，traced() 直接返回原函数，几乎没有额外开销
+    - 阶段名以 . 分层（如 dynamic.goto），异步区间记录的是挂起在内的实际经过时间
+    """
+
+    def __init__(self, enabled: bool = TRACING_ENABLED):
+        self.enabled = enabled
+        self._stages: Dict[str, _StageStats] = {}
+
+    def span(self, name: str):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def traced(self, name: Optional[str] = None) -> Callable:
+        def decorator(func):
+            if not self.enabled:
+                return func
+            stage = name or func.__qualname__
+
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    start = time.perf_counter()
+                    try:
+                        return await func(*args, **kwargs)
+                    finally:
+                        self.record(stage, time.perf_counter() - start)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(stage, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def record(self, name: str, duration: float):
+        stats = self._stages.get(name)
+        if stats is None:
+            stats = self._stages[name] = _StageStats()
+        stats.add(duration)
+        STAGE_DURATION.observe(duration, name)
+        emit_stage(name, duration)
+
+    def drain_summary(self) -> str:
+        """自上次调用以来各阶段的 平均/最大 耗时（按总耗时降序），并开始新的统计区间"""
+        parts = []
+        for name, stats in sorted(self._stages.items(), key=lambda item: item[1].window_total, reverse=True):
+            if stats.window_count:
+                parts.append(f"{name} {stats.window_total / stats.window_count * 1000:.0f}/"
+                             f"{stats.window_max * 1000:.0f}ms×{stats.window_count}")
+            stats.window_count = 0
+            stats.window_total = stats.window_max = 0.0
+        return ", ".join(parts)
+
+    def get_stats(self) -> dict:
+        return {
+            name: {
+                'count': stats.count,
+                'avg': f"{stats.total / stats.count * 1000:.1f}ms" if stats.count else "0.0ms",
+                'max': f"{stats.max * 1000:.1f}ms",
+            }
+            for name, stats in self._stages.items()
+        }
+
+
+# 全局实例
+tracer = Tracer()
+span = tracer.span
+traced = tracer.traced